@@ -0,0 +1,261 @@
+import sys
+import argparse
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+import uuid
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Local stand-in for the Field ID API and its OAuth token endpoint, for benchmarking. Implements
+#   POST /oauth/token
+#   GET  /boundaries, /boundaries/{id}, /boundary-references, /boundary-references/{id}
+#   POST /boundaries, /field-searches
+# with generated but deterministic data: the same boundary ID always gives the same feature and
+# ETag. Listings hold `boundaries` records whatever the filter, in pages of at most
+# `max_page_size` records if that is set. Every response can be delayed (latency plus random
+# jitter), a fraction can fail with 503, and requests beyond a rate limit are refused with 429, as
+# the real API would. Registrations including a feature without a geometry are rejected with 422.
+
+class MockSettings(object):
+
+    def __init__(self, latency=0.0, jitter=0.0, token_latency=0.0, error_rate=0.0, rate_limit=None, boundaries=1000, max_page_size=None, seed=0):
+        self.latency = latency              # seconds added to every API response
+        self.jitter = jitter                # up to this many further seconds, uniformly distributed
+        self.token_latency = token_latency  # seconds added to every token response
+        self.error_rate = error_rate        # fraction of API requests failing with 503
+        self.rate_limit = rate_limit        # API requests per second before responding 429
+        self.boundaries = boundaries        # number of records in each listing
+        self.max_page_size = max_page_size  # largest page a listing returns, whatever the limit
+        self.random = random.Random(seed)
+
+class MockStats(object):
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = {}
+            self.status_codes = {}
+            self.bytes_received = 0
+            self.bytes_sent = 0
+
+    def record(self, endpoint, status_code, received, sent):
+        with self._lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+            self.status_codes[status_code] = self.status_codes.get(status_code, 0) + 1
+            self.bytes_received += received
+            self.bytes_sent += sent
+
+    def summary(self):
+        with self._lock:
+            return {
+                'requests': dict(self.requests),
+                'status_codes': {str(code): n for code, n in sorted(self.status_codes.items())},
+                'bytes_received': self.bytes_received,
+                'bytes_sent': self.bytes_sent,
+            }
+
+class MockServer(ThreadingHTTPServer):
+
+    daemon_threads = True
+
+    def __init__(self, address, settings=None):
+        super().__init__(address, MockHandler)
+        self.settings = settings or MockSettings()
+        self.stats = MockStats()
+        self._bucket_lock = threading.Lock()
+        self._bucket_tokens = None
+        self._bucket_time = time.monotonic()
+
+    @property
+    def url(self):
+        return "http://{}:{}/".format(*self.server_address[:2])
+
+    def start(self):
+
+        # Serves in a background thread; returns self so it can be used as a context manager
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def retry_after(self):
+
+        # Token bucket allowing rate_limit requests per second, with a burst of the same size.
+        # Returns None if the request is allowed, otherwise the seconds until it would be.
+        rate = self.settings.rate_limit
+        if not rate:
+            return None
+        with self._bucket_lock:
+            now = time.monotonic()
+            if self._bucket_tokens is None:
+                self._bucket_tokens = rate
+            self._bucket_tokens = min(rate, self._bucket_tokens + (now - self._bucket_time) * rate)
+            self._bucket_time = now
+            if self._bucket_tokens >= 1:
+                self._bucket_tokens -= 1
+                return None
+            return (1 - self._bucket_tokens) / rate
+
+class MockHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    # Headers and body are written separately, which with Nagle's algorithm would stall every
+    # response on the client's delayed ACK
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def _handle(self, method):
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        parts = url.path.strip('/').split('/')
+        endpoint = parts[0] + ('/{id}' if len(parts) > 1 else '')
+        settings = self.server.settings
+
+        if url.path.strip('/') == 'oauth/token':
+            endpoint = 'oauth/token'
+            time.sleep(settings.token_latency)
+            return self._send(endpoint, body, 200, {'access_token': uuid.uuid4().hex, 'expires_in': 86400, 'token_type': 'Bearer'})
+
+        delay = self.server.retry_after()
+        if delay is not None:
+            return self._send(endpoint, body, 429, {'error': 'Too many requests'}, {'Retry-After': '{:.3f}'.format(delay)})
+
+        with self.server._bucket_lock:
+            failed = settings.random.random() < settings.error_rate
+            jitter = settings.random.random() * settings.jitter
+        time.sleep(settings.latency + jitter)
+        if failed:
+            return self._send(endpoint, body, 503, {'error': 'Service unavailable'}, {'Retry-After': '0'})
+
+        if method == 'GET' and endpoint in ('boundaries/{id}', 'boundary-references/{id}'):
+            feature = boundary(parts[1]) if parts[0] == 'boundaries' else boundary_reference(parts[1])
+            etag = '"' + hashlib.md5(parts[1].encode()).hexdigest() + '"'
+            if self.headers.get('If-None-Match') == etag:
+                return self._send(endpoint, body, 304, None, {'ETag': etag})
+            return self._send(endpoint, body, 200, feature, {'ETag': etag})
+
+        if method == 'GET' and endpoint in ('boundaries', 'boundary-references'):
+            limit = int(query.get('limit', 5))
+            if settings.max_page_size:
+                limit = min(limit, settings.max_page_size)
+            offset = int(query.get('offset', 0))
+            make = boundary if endpoint == 'boundaries' else boundary_reference
+            features = [make(_record_id(n)) for n in range(offset, min(offset + limit, settings.boundaries))]
+            return self._send(endpoint, body, 200, {'type': 'FeatureCollection', 'features': features})
+
+        if method == 'POST' and endpoint == 'field-searches':
+            feature = boundary(hashlib.md5(body).hexdigest())
+            return self._send(endpoint, body, 200, {'type': 'FeatureCollection', 'features': [feature]})
+
+        if method == 'POST' and endpoint == 'boundaries':
+            submitted = json.loads(body)
+            if isinstance(submitted, dict):
+                submitted = submitted.get('features', [submitted])
+            if not all(feature.get('geometry') for feature in submitted):
+                return self._send(endpoint, body, 422, {'error': 'Every feature needs a geometry'})
+            features = [{'type': 'Feature', 'id': str(uuid.uuid4()), 'properties': {}, 'geometry': None} for _ in submitted]
+            return self._send(endpoint, body, 201, {'type': 'FeatureCollection', 'features': features})
+
+        self._send(endpoint, body, 404, {'error': 'Not found'})
+
+    def _send(self, endpoint, request_body, status_code, obj, headers={}):
+        content = json.dumps(obj).encode() if obj is not None else b''
+
+        # Recorded before anything is sent, so that a response has always been counted by the
+        # time the client has it
+        self.server.stats.record(endpoint, status_code, len(request_body), len(content))
+        self.send_response(status_code)
+        if content:
+            self.send_header('Content-Type', 'application/geo+json')
+        self.send_header('Content-Length', str(len(content)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(content)
+
+def boundary(boundary_id):
+
+    # A small square field somewhere in western Europe, placed by the hash of its ID
+    digest = hashlib.md5(boundary_id.encode()).digest()
+    x = -5 + digest[0] / 255 * 20
+    y = 40 + digest[1] / 255 * 15
+    size = 0.001 + digest[2] / 255 * 0.004
+    ring = [[x, y], [x + size, y], [x + size, y + size], [x, y + size], [x, y]]
+    area = (size * 111320 * math.cos(math.radians(y))) * (size * 110574)
+    return {
+        'type': 'Feature',
+        'id': boundary_id,
+        'properties': {
+            'centroid': [x + size / 2, y + size / 2],
+            'representative_point': [x + size / 2, y + size / 2],
+            'area': {'value': round(area, 6), 'unit': 'm2'},
+            'perimeter': {'value': round(4 * math.sqrt(area), 6), 'unit': 'm'},
+            'boundary_references': [{'id': boundary_id + '-ref-' + str(n)} for n in range(2)],
+        },
+        'geometry': {'type': 'Polygon', 'coordinates': [ring]},
+    }
+
+def boundary_reference(reference_id):
+    return {
+        'type': 'Feature',
+        'id': reference_id,
+        'properties': {'source_name': 'benchmark', 'source_id': reference_id},
+        'geometry': None,
+    }
+
+def _record_id(n):
+    return str(uuid.UUID(int=n))
+
+def main(argv):
+
+    argParser = argparse.ArgumentParser()
+    argParser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    argParser.add_argument("--port", type=int, default=8765, help="Port to listen on")
+    argParser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every API response")
+    argParser.add_argument("--jitter", type=float, default=0.0, help="Up to this many further seconds added at random")
+    argParser.add_argument("--token-latency", type=float, default=0.0, help="Seconds added to every token response")
+    argParser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of API requests failing with 503")
+    argParser.add_argument("--rate-limit", type=float, required=False, help="API requests per second allowed before responding 429")
+    argParser.add_argument("--boundaries", type=int, default=1000, help="Number of records in each listing")
+    argParser.add_argument("--max-page-size", type=int, required=False, help="Largest page a listing returns, whatever the limit requested")
+
+    args = argParser.parse_args()
+    settings = MockSettings(latency=args.latency, jitter=args.jitter, token_latency=args.token_latency,
+                            error_rate=args.error_rate, rate_limit=args.rate_limit, boundaries=args.boundaries,
+                            max_page_size=args.max_page_size)
+    server = MockServer((args.host, args.port), settings)
+    print("Mock Field ID API listening on %s" % server.url, file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+   main(sys.argv[1:])
@@ -0,0 +1,244 @@
+import sys
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import tempfile
+import time
+import yaml
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from mock_api import MockServer, MockSettings, _record_id
+
+from field_id.api_client import APIClient, APIConfiguration
+from field_id.output import open_writer
+
+# Benchmark harness: runs each script and client method against a local mock API (see
+# mock_api.py) at each input size, and reports throughput, latency, peak memory and bytes
+# transferred. Every case runs in a child process of its own so that its peak RSS can be measured,
+# and reports its requests and latencies through the client's --metrics output.
+#
+#   python3 benchmarks/run.py --sizes 100,1000 --latency 0.01 -o local/bench.json
+#   python3 benchmarks/run.py --compare local/bench.json
+#
+# With --compare, results are checked against a previous run; a drop in throughput or rise in
+# p99 latency beyond --tolerance is reported as a regression and the harness exits with status 1.
+
+CONCURRENCY = 8
+
+def _script(name, *args):
+    return lambda ctx: [sys.executable, os.path.join(REPO_DIR, name), '-c', ctx['config'], '--metrics', ctx['metrics']] + [
+        arg(ctx) if callable(arg) else arg for arg in args]
+
+def _client(name):
+    return lambda ctx: [sys.executable, os.path.abspath(__file__), '--client-case', name, '--size', str(ctx['size']),
+                        '--config', ctx['config'], '--metrics', ctx['metrics'], '--output', ctx['output']]
+
+CASES = {
+    'get-boundary.py': _script('get-boundary.py', '-i', lambda ctx: ctx['ids'], '-o', lambda ctx: ctx['output'],
+                               '--format', 'ndjson', '-n', str(CONCURRENCY)),
+    'get-boundaries-by-fieldid.py': _script('get-boundaries-by-fieldid.py', '-i', lambda ctx: ctx['field_ids'],
+                                            '-o', lambda ctx: ctx['output'], '--format', 'ndjson', '-n', str(CONCURRENCY)),
+    'get-boundaries-overlapping-boundaryid.py': _script('get-boundaries-overlapping-boundaryid.py', '-b', _record_id(0),
+                                                        '-o', lambda ctx: ctx['output'], '--format', 'ndjson',
+                                                        '--page-size', '100', '-n', str(CONCURRENCY)),
+    'search-fields-with-geometry.py': _script('search-fields-with-geometry.py', '-i', lambda ctx: ctx['features'], '-b',
+                                              '-o', lambda ctx: ctx['output'], '-n', str(CONCURRENCY)),
+    'register-boundaries.py': _script('register-boundaries.py', '-i', lambda ctx: ctx['features'], '-s', 'benchmark',
+                                      '-b', '100', '--concurrency', str(CONCURRENCY), '-r', lambda ctx: ctx['output']),
+    'sync-boundaries.py': _script('sync-boundaries.py', '-d', lambda ctx: ctx['database'], '--full', '--resource', 'boundaries',
+                                  '--page-size', '100'),
+    'APIClient.get_boundaries_by_ids': _client('APIClient.get_boundaries_by_ids'),
+    'APIClient.iter_boundaries': _client('APIClient.iter_boundaries'),
+    'APIClient.iter_boundaries.stream': _client('APIClient.iter_boundaries.stream'),
+    'APIClient.field_search': _client('APIClient.field_search'),
+    'AsyncAPIClient.get_boundaries_by_ids': _client('AsyncAPIClient.get_boundaries_by_ids'),
+}
+
+def main(argv):
+
+    argParser = argparse.ArgumentParser()
+    argParser.add_argument("--sizes", default="100,1000", help="Comma-separated input sizes to run each case at")
+    argParser.add_argument("--cases", required=False, help="Comma-separated cases to run; defaults to all of: " + ", ".join(CASES))
+    argParser.add_argument("--latency", type=float, default=0.01, help="Seconds the mock API adds to every response")
+    argParser.add_argument("--jitter", type=float, default=0.005, help="Up to this many further seconds added at random")
+    argParser.add_argument("--token-latency", type=float, default=0.05, help="Seconds the mock token endpoint adds to every response")
+    argParser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of API requests failing with 503")
+    argParser.add_argument("--rate-limit", type=float, required=False, help="API requests per second the mock allows before responding 429")
+    argParser.add_argument("--adaptive", action="store_true", help="Run the client with adaptive rate and concurrency control (the `adaptive` config setting)")
+    argParser.add_argument("-o", "--outputfile", required=False, help="Path to write the results to as JSON, e.g. as a baseline for --compare")
+    argParser.add_argument("--compare", required=False, help="Path to the results of a previous run to compare against")
+    argParser.add_argument("--tolerance", type=float, default=0.1, help="Relative change in throughput or p99 latency reported as a regression")
+
+    # Used by the harness itself to run a client method case in a child process
+    argParser.add_argument("--client-case", help=argparse.SUPPRESS)
+    argParser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    argParser.add_argument("--config", help=argparse.SUPPRESS)
+    argParser.add_argument("--metrics", help=argparse.SUPPRESS)
+    argParser.add_argument("--output", help=argparse.SUPPRESS)
+
+    args = argParser.parse_args()
+
+    if args.client_case:
+        return run_client_case(args.client_case, args.size, args.config, args.metrics, args.output)
+
+    cases = args.cases.split(',') if args.cases else list(CASES)
+    unknown = [case for case in cases if case not in CASES]
+    if unknown:
+        argParser.error("Unknown case(s): %s" % ", ".join(unknown))
+    sizes = [int(size) for size in args.sizes.split(',')]
+
+    settings = MockSettings(latency=args.latency, jitter=args.jitter, token_latency=args.token_latency,
+                            error_rate=args.error_rate, rate_limit=args.rate_limit)
+    results = []
+    with MockServer(('127.0.0.1', 0), settings) as server, tempfile.TemporaryDirectory() as tmp_dir:
+        print("%-42s %7s %8s %9s %9s %9s %10s %12s" % ('case', 'size', 'requests', 'req/s', 'p50 ms', 'p99 ms', 'peak MB', 'bytes in'))
+        for case in cases:
+            for size in sizes:
+                result = run_case(server, tmp_dir, case, size, args.adaptive)
+                results.append(result)
+                print("%-42s %7d %8d %9.1f %9s %9s %10.1f %12d%s" % (
+                    case, size, result['requests'], result['requests_per_second'],
+                    _ms(result['p50']), _ms(result['p99']), result['peak_rss'] / 1e6, result['bytes_received'],
+                    ' FAILED' if result['exit_code'] else ''))
+
+    if args.outputfile:
+        with open(args.outputfile, 'w') as f:
+            json.dump({'settings': {name: value for name, value in vars(settings).items() if name != 'random'}, 'results': results}, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)['results']
+        if compare(baseline, results, args.tolerance):
+            sys.exit(1)
+
+def run_case(server, tmp_dir, case, size, adaptive=False):
+    ctx = prepare_inputs(tmp_dir, case, size)
+    ctx['config'] = write_config(tmp_dir, server, adaptive)
+    server.settings.boundaries = size
+    server.stats.reset()
+
+    start = time.monotonic()
+    child = subprocess.Popen(CASES[case](ctx), cwd=REPO_DIR, stdout=subprocess.DEVNULL, stderr=open(ctx['log'], 'w'))
+    _, status, rusage = os.wait4(child.pid, 0)
+    elapsed = time.monotonic() - start
+    exit_code = os.waitstatus_to_exitcode(status)
+
+    # A failed run still reports the requests it made, but its figures aren't comparable
+    if exit_code:
+        with open(ctx['log'], 'r') as f:
+            print(f.read()[-2000:], file=sys.stderr)
+    if not os.path.exists(ctx['metrics']):
+        raise RuntimeError("Benchmark case %s failed with exit status %d before reporting metrics" % (case, exit_code))
+
+    with open(ctx['metrics'], 'r') as f:
+        metrics = json.load(f)
+    return {
+        'case': case,
+        'size': size,
+        'exit_code': exit_code,
+        'elapsed': elapsed,
+        'requests': metrics['requests'],
+        'requests_per_second': metrics['requests'] / elapsed,
+        'p50': metrics['latency']['p50'],
+        'p99': metrics['latency']['p99'],
+        'peak_rss': rusage.ru_maxrss * 1024,
+        'bytes_sent': metrics['bytes_sent'],
+        'bytes_received': metrics['bytes_received'],
+        'server': server.stats.summary(),
+    }
+
+def prepare_inputs(tmp_dir, case, size):
+    case_dir = os.path.join(tmp_dir, '%s-%d' % (case, size))
+    os.makedirs(case_dir, exist_ok=True)
+    ctx = {name: os.path.join(case_dir, name) for name in ('ids', 'field_ids', 'features.ndjson', 'output', 'database', 'metrics', 'log')}
+    ctx['features'] = ctx.pop('features.ndjson')
+    ctx['size'] = size
+
+    ids = [_record_id(n) for n in range(size)]
+    with open(ctx['ids'], 'w') as f:
+        f.write('\n'.join(ids))
+    with open(ctx['field_ids'], 'w') as f:
+        f.write('\n'.join('{:04X}.{:04X}'.format(n // 65536, n % 65536) for n in range(size)))
+    with open(ctx['features'], 'w') as f:
+        for n in range(size):
+            x, y = (n % 1000) * 0.01, 45 + (n // 1000) * 0.01
+            f.write(json.dumps({'type': 'Feature', 'properties': {},
+                                'geometry': {'type': 'Polygon', 'coordinates': [[[x, y], [x + 0.005, y], [x + 0.005, y + 0.005], [x, y + 0.005], [x, y]]]}}) + '\n')
+    if os.path.exists(ctx['database']):
+        os.remove(ctx['database'])
+    return ctx
+
+def write_config(tmp_dir, server, adaptive=False):
+    path = os.path.join(tmp_dir, 'config.yaml')
+    with open(path, 'w') as f:
+        yaml.safe_dump({
+            'base_url': server.url,
+            'token_url': server.url + 'oauth/token',
+            'audience': server.url,
+            'client_id': 'benchmark',
+            'client_secret': 'benchmark',
+            'concurrency': CONCURRENCY,
+            'adaptive': adaptive,
+        }, f)
+    return path
+
+def run_client_case(case, size, config_fn, metrics_fn, output_fn):
+    with open(config_fn, 'r') as f:
+        config = APIConfiguration.from_dict(yaml.safe_load(f))
+    ids = [_record_id(n) for n in range(size)]
+
+    if case.startswith('AsyncAPIClient.'):
+        from field_id.async_api_client import AsyncAPIClient
+
+        async def run():
+            async with AsyncAPIClient(config=config) as api_client:
+                await api_client.get_boundaries_by_ids(ids, concurrency=CONCURRENCY)
+                api_client.metrics.write(metrics_fn)
+        return asyncio.run(run())
+
+    with APIClient(config=config) as api_client:
+        if case == 'APIClient.get_boundaries_by_ids':
+            for response in api_client.get_boundaries_by_ids(ids, concurrency=CONCURRENCY):
+                response.json()
+        elif case == 'APIClient.iter_boundaries':
+            with open_writer(output_fn, 'ndjson') as writer:
+                for feature in api_client.iter_boundaries(page_size=100):
+                    writer.write(feature)
+        elif case == 'APIClient.iter_boundaries.stream':
+            with open_writer(output_fn, 'ndjson') as writer:
+                for feature in api_client.iter_boundaries(page_size=100, stream=True):
+                    writer.write(feature)
+        elif case == 'APIClient.field_search':
+            for n in range(size):
+                api_client.field_search(payload={'type': 'Point', 'coordinates': [n * 0.001, 45]}).json()
+        api_client.metrics.write(metrics_fn)
+
+def compare(baseline, results, tolerance):
+
+    # Prints the change in each case run both times; returns whether any regressed
+    previous = {(r['case'], r['size']): r for r in baseline}
+    regressed = False
+    print()
+    print("%-42s %7s %12s %12s" % ('case', 'size', 'req/s', 'p99'))
+    for result in results:
+        before = previous.get((result['case'], result['size']))
+        if not before or before.get('exit_code'):
+            continue
+        throughput = result['requests_per_second'] / before['requests_per_second'] - 1
+        p99 = result['p99'] / before['p99'] - 1 if result['p99'] and before['p99'] else 0.0
+        flag = ''
+        if throughput < -tolerance or p99 > tolerance or result['exit_code']:
+            flag = 'REGRESSION'
+            regressed = True
+        print("%-42s %7d %+11.1f%% %+11.1f%% %s" % (result['case'], result['size'], throughput * 100, p99 * 100, flag))
+    return regressed
+
+def _ms(seconds):
+    return '-' if seconds is None else '%.1f' % (seconds * 1000)
+
+if __name__ == "__main__":
+   main(sys.argv[1:])
@@ -0,0 +1,24 @@
+import sys
+import argparse
+import time
+
+from field_id.geojson_stream import iter_features
+from field_id.spatial_index import NODE_CAPACITY, SpatialIndex
+
+def main(argv):
+
+    argParser = argparse.ArgumentParser()
+    argParser.add_argument("-i", "--inputfile", required=True, nargs="+", help="Boundary export(s) to index, as written by get-boundary.py or the other get-boundaries scripts (GeoJSON, JSON array, NDJSON or GeoJSONSeq, optionally gzipped)")
+    argParser.add_argument("-x", "--index", required=True, help="Directory to write the spatial index to")
+    argParser.add_argument("--node-capacity", type=int, default=NODE_CAPACITY, help="Number of children per node of the index tree")
+
+    args = argParser.parse_args()
+    print("args=%s" % args, file=sys.stderr)
+
+    start = time.time()
+    features = (feature for input_fn in args.inputfile for feature in iter_features(input_fn))
+    index = SpatialIndex.build(features, args.index, node_capacity=args.node_capacity)
+    print("Indexed %d boundaries in %.2fs" % (len(index), time.time() - start), file=sys.stderr)
+
+if __name__ == "__main__":
+   main(sys.argv[1:])
@@ -1,15 +1,31 @@
 import requests
 import re
-import datetime
+import time
+import logging
+import threading
+import itertools
+import collections
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from urllib.parse import quote
+from requests.adapters import HTTPAdapter
+
+from field_id.cache import ResponseCache
+from field_id.fast_json import RawJSON, loads
+from field_id.ids import batch_ids
+from field_id.metrics import ClientMetrics, Hooks, endpoint_name
+from field_id.rate_limit import AdaptiveRateLimiter, ConcurrencyController, RateLimiter, parse_retry_after
+from field_id.token import TokenManager
+
+logger = logging.getLogger(__name__)
+
+# Bytes read at a time from streamed responses
+STREAM_CHUNK_SIZE = 65536
 
 class APIClient(object):
 
     def __init__(self, config):
 
-        # OAuth access token cache
-        self._access_token = None
-        self._access_token_expiry = None
-
         self.config = config
 
         # requests lib 'verify' param is either boolean or a custom CA cert path so has 3 states:
@@ -21,11 +37,110 @@ class APIClient(object):
         else:
             self.tls_verify = config.tls_verify
 
-    def _request(self, method, url, body=None, params={}, headers={}):
+        self._pool_lock = threading.Lock()
+        self.session = self._create_session()
 
+        # Request rate and number of requests in flight, shared by every method. Adaptive ones
+        # follow the API's responses (see field_id.rate_limit); the counts are kept either way.
+        if config.adaptive:
+            self.rate_limiter = AdaptiveRateLimiter(config.rate_limit, max_rate=config.rate_limit)
+            self.concurrency = ConcurrencyController(config.concurrency, max_limit=config.max_concurrency)
+        else:
+            self.rate_limiter = RateLimiter(config.rate_limit)
+            self.concurrency = ConcurrencyController()
+
+        # GETs currently in flight, so concurrent callers asking for the same resource share one
+        # request, and counts of the calls saved by this and by de-duplicating bulk requests
+        self._in_flight = {}
+        self._in_flight_lock = threading.Lock()
+        self.saved_calls = {'duplicates': 0, 'in_flight': 0}
+
+        # Cache for GETs of individual boundaries and boundary references
+        self.cache = None
+        if config.cache_size or config.cache_path:
+            self.cache = ResponseCache(memory_size=config.cache_size,
+                                       path=config.cache_path,
+                                       disk_size=config.cache_disk_size,
+                                       ttl=config.cache_ttl)
+
+        # Hooks called on every request, response, retry, token refresh and cache lookup; the
+        # client's own metrics are recorded through them
+        self.hooks = Hooks()
+        self.metrics = ClientMetrics()
+        self.metrics.attach(self.hooks)
+        self.metrics.track('concurrency', self.concurrency.stats)
+        if config.adaptive:
+            self.metrics.track('rate_limiter', self.rate_limiter.stats)
+
+        # OAuth access tokens, shared by all threads using the client
+        self.tokens = TokenManager(config, self.session, tls_verify=self.tls_verify, hooks=self.hooks)
+
+    def _create_session(self):
+
+        # One pooled session per client so that connections (and their TLS handshakes) are
+        # reused across calls. pool_connections is the number of per-host pools to keep,
+        # pool_maxsize the number of connections kept alive within each host's pool.
+        session = requests.Session()
+
+        # Adaptive concurrency may have up to max_concurrency requests in flight, each needing a
+        # connection of its own
+        pool_maxsize = self.config.pool_maxsize
+        if self.config.adaptive:
+            pool_maxsize = max(pool_maxsize, self.config.max_concurrency)
+        self._mount_pool(session, pool_maxsize)
+
+        if not self.config.keep_alive:
+            session.headers['Connection'] = 'close'
+
+        return session
+
+    def _mount_pool(self, session, pool_maxsize):
+        adapter = HTTPAdapter(pool_connections=self.config.pool_connections,
+                              pool_maxsize=pool_maxsize,
+                              pool_block=self.config.pool_block)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        self._pool_maxsize = pool_maxsize
+
+    def _grow_pool(self, size):
+
+        # Each worker of a bulk run needs a connection of its own; with more workers than the
+        # pool keeps, every request beyond it would open a connection and then discard it.
+        # Requests in flight finish on the connections of the pool being replaced.
+        with self._pool_lock:
+            if size > self._pool_maxsize:
+                logger.debug("Growing the connection pool from %d to %d connections", self._pool_maxsize, size)
+                self._mount_pool(self.session, size)
+
+    def close(self):
+        self.tokens.close()
+        self.session.close()
+        if self.cache:
+            self.cache.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _request(self, method, url, body=None, params={}, headers={}, stream=False):
+
+        # With stream, the body is left to be read (and the response closed) by the caller
+
+        headers = dict(headers)
         headers['Authorization'] = "Bearer "+self.access_token()
 
-        print(method, url, params)
+        logger.debug("%s %s %s", method, url, params)
+        endpoint = endpoint_name(self.base_url(), url)
+
+        kwargs = {
+            'headers': headers,
+            'params': params,
+            'timeout': self.config.timeout,
+            'verify': self.tls_verify,
+            'stream': stream,
+        }
 
         if body:
             if 'Content-Type' not in headers:
@@ -33,31 +148,129 @@ class APIClient(object):
 
             # application/json, application/geo+json etc
             if re.search('json', headers['Content-Type'], re.IGNORECASE):
-                return requests.request(method=method,
-                                        url=url,
-                                        json=body,
-                                        headers=headers,
-                                        params=params,
-                                        timeout=self.config.timeout,
-                                        verify=self.tls_verify)
-            
+                kwargs['json'] = body
+            else:
+                kwargs['data'] = body
+
+        retryable = method.upper() in self.config.retry_methods
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire()
+            self.concurrency.acquire()
+            self.hooks.emit('request', method=method, url=url, endpoint=endpoint, attempt=attempt)
+            start = time.monotonic()
+            try:
+                response = self.session.request(method=method, url=url, **kwargs)
+                received = int(response.headers.get('Content-Length') or 0) if stream else len(response.content)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                elapsed = time.monotonic() - start
+                self.concurrency.release(endpoint, elapsed, error=e)
+                self.hooks.emit('error', method=method, url=url, endpoint=endpoint, attempt=attempt,
+                                elapsed=elapsed, error=e)
+                if not retryable or attempt >= self.config.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+            except BaseException:
+                self.concurrency.release(endpoint)
+                raise
+            else:
+                elapsed = time.monotonic() - start
+                self.concurrency.release(endpoint, elapsed, response.status_code)
+                self.rate_limiter.feedback(response.status_code, response.headers)
+                self.hooks.emit('response', method=method, url=url, endpoint=endpoint, attempt=attempt,
+                                status_code=response.status_code, elapsed=elapsed,
+                                bytes_sent=_body_size(response.request.body), bytes_received=received)
+                if attempt >= self.config.max_retries or not retryable_response(self.config, method, response.status_code, response.headers):
+                    return response
+                delay = self._retry_after(response)
+                if delay is None:
+                    delay = self._backoff(attempt)
+                # Release the connection back to the pool before sleeping
+                response.close()
+
+            attempt += 1
+            logger.warning("Retrying %s %s in %.1fs (attempt %d of %d)", method, url, delay, attempt, self.config.max_retries)
+            self.hooks.emit('retry', method=method, url=url, endpoint=endpoint, attempt=attempt, delay=delay)
+            time.sleep(delay)
+
+    def _backoff(self, attempt):
+        return min(self.config.retry_backoff_factor * (2 ** attempt), self.config.retry_backoff_max)
+
+    def _retry_after(self, response):
+        return parse_retry_after(response.headers.get('Retry-After'), self.config.retry_backoff_max)
+
+    def _coalesce(self, key, fn):
+
+        # Runs fn, unless another thread is already running it for the same key, in which case
+        # that thread's result is shared
+        with self._in_flight_lock:
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self._in_flight[key] = Future()
             else:
-                return requests.request(method=method,
-                                        url=url,
-                                        data=body,
-                                        headers=headers,
-                                        params=params,
-                                        timeout=self.config.timeout,
-                                        verify=self.tls_verify)
+                self.saved_calls['in_flight'] += 1
+
+        if not owner:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
         else:
-            return requests.request(method=method,
-                                    url=url,
-                                    headers=headers,
-                                    params=params,
-                                    timeout=self.config.timeout,
-                                    verify=self.tls_verify)
+            future.set_result(result)
+            return result
+        finally:
+            with self._in_flight_lock:
+                del self._in_flight[key]
+
+    def _cached_get(self, url, headers={}):
+
+        # Keyed by client ID as well as URL, since what is visible depends on the credentials
+        key = self.config.client_id + " " + url
+        return self._coalesce(key, lambda: self._cached_get_uncoalesced(key, url, headers))
+
+    def _cached_get_uncoalesced(self, key, url, headers):
+        if not self.cache:
+            return self._request(method="GET", url=url, body=None, headers=headers)
+
+        entry = self.cache.get(key)
+        if entry and self.cache.is_fresh(entry):
+            self.cache.record('hits')
+            self.hooks.emit('cache', url=url, result='hit')
+            return self._cached_response(url, entry)
+
+        if entry and entry.etag:
+            headers = dict(headers)
+            headers['If-None-Match'] = entry.etag
+
+        response = self._request(method="GET", url=url, body=None, headers=headers)
 
-                
+        if response.status_code == 304 and entry:
+            self.cache.record('revalidations')
+            self.hooks.emit('cache', url=url, result='revalidated')
+            return self._cached_response(url, self.cache.refresh(key, entry))
+
+        self.cache.record('misses')
+        self.hooks.emit('cache', url=url, result='miss')
+        if response.status_code == 200:
+            self.cache.put(key, response.headers.get('ETag'), response.content)
+        return response
+
+    def _cached_response(self, url, entry):
+        response = requests.Response()
+        response.status_code = 200
+        response.reason = 'OK'
+        response.url = url
+        response.encoding = 'utf-8'
+        response.headers['Content-Type'] = 'application/geo+json'
+        response.headers['X-Cache'] = 'HIT'
+        if entry.etag:
+            response.headers['ETag'] = entry.etag
+        response._content = entry.content
+        return response
 
     def field_search(self, payload={}, limit=5, offset=None):
         url = self.base_url() + "field-searches"
@@ -72,7 +285,7 @@ class APIClient(object):
 
         return response
 
-    def get_boundaries(self, args={}, limit=5, offset=None):
+    def get_boundaries(self, args={}, limit=5, offset=None, stream=False):
         url = self.base_url() + "boundaries"
 
         args['limit'] = limit
@@ -83,7 +296,7 @@ class APIClient(object):
             "Accept": "application/geo+json",
         }
 
-        response = self._request(method="GET", url=url, body=None, headers=headers, params=args)
+        response = self._request(method="GET", url=url, body=None, headers=headers, params=args, stream=stream)
 
         return response
 
@@ -96,11 +309,11 @@ class APIClient(object):
             "Accept": "application/geo+json",
         }
 
-        response = self._request(method="GET", url=url, body=None, headers=headers)
+        response = self._cached_get(url=url, headers=headers)
 
         return response
     
-    def get_boundary_references(self, args={}, limit=5, offset=None):
+    def get_boundary_references(self, args={}, limit=5, offset=None, stream=False):
         url = self.base_url() + "boundary-references"
 
         args['limit'] = limit
@@ -111,7 +324,7 @@ class APIClient(object):
             "Accept": "application/geo+json",
         }
 
-        response = self._request(method="GET", url=url, body=None, headers=headers, params=args)
+        response = self._request(method="GET", url=url, body=None, headers=headers, params=args, stream=stream)
 
         return response
 
@@ -124,10 +337,197 @@ class APIClient(object):
             "Accept": "application/geo+json",
         }
 
-        response = self._request(method="GET", url=url, body=None, headers=headers)
+        response = self._cached_get(url=url, headers=headers)
 
         return response
 
+    def iter_boundaries(self, args={}, page_size=50, stream=False):
+        return self._paginate(self.get_boundaries, args, page_size, stream)
+
+    def iter_boundary_references(self, args={}, page_size=50, stream=False):
+        return self._paginate(self.get_boundary_references, args, page_size, stream)
+
+    def _paginate(self, fn, args, page_size, stream=False):
+        if stream:
+            return self._paginate_stream(fn, args, page_size)
+        return self._paginate_decoded(fn, args, page_size)
+
+    def _paginate_decoded(self, fn, args, page_size):
+
+        # Generator yielding the features of each page in turn. The next page is requested in the
+        # background while the caller consumes the current one, so at most two pages are held
+        # in memory at any time. A page shorter than the first marks the end of the result set:
+        # the API may return fewer than page_size features per page, so a short first page is
+        # followed by one more request to tell a capped page from the last one.
+        def fetch(offset):
+            response = fn(args=dict(args), limit=page_size, offset=offset)
+            response.raise_for_status()
+            return loads(response.content)['features']
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            offset = 0
+            page = fetch(offset)
+            full = len(page)
+            while page:
+                offset += len(page)
+                pending = executor.submit(fetch, offset) if len(page) >= full else None
+
+                for feature in page:
+                    yield feature
+
+                page = pending.result() if pending else None
+
+    def _paginate_stream(self, fn, args, page_size):
+
+        # As _paginate_decoded, but each page is parsed as its body arrives and its features are
+        # yielded as RawJSON, undecoded, so memory is bounded by a single feature rather than a
+        # page. Pages are requested one after another.
+
+        # Imported here as it needs numpy, which the client otherwise does without
+        from field_id.geojson_stream import iter_raw_features
+
+        offset = 0
+        full = None
+        while True:
+            count = 0
+            with fn(args=dict(args), limit=page_size, offset=offset, stream=True) as response:
+                response.raise_for_status()
+                for data in iter_raw_features(response.iter_content(STREAM_CHUNK_SIZE)):
+                    count += 1
+                    yield RawJSON(data)
+            if count == 0 or count < (full or count):
+                return
+            full = full or count
+            offset += count
+
+    def iter_boundaries_by_field_ids(self, field_ids, page_size=50, concurrency=None, stream=False):
+        return self._iter_by_filter('field_relationships.field_id', field_ids, page_size, concurrency, stream)
+
+    def iter_boundaries_by_related_boundary_ids(self, boundary_ids, page_size=50, concurrency=None, stream=False):
+        return self._iter_by_filter('boundary_relationships.boundary_id', boundary_ids, page_size, concurrency, stream)
+
+    def _iter_by_filter(self, param, values, page_size=50, concurrency=None, stream=False):
+
+        # Yields the boundaries matching any of a list of values for a filter that takes them
+        # comma-separated, however long the list. Values are split into batches whose request
+        # URLs stay within max_url_length, which are paged through concurrently. Boundaries are
+        # yielded batch by batch, ordered within each batch by the first value (in input order)
+        # they relate to, and only once even if they match values in several batches.
+        #
+        # With stream, batches are paged through one after another and features are yielded as
+        # RawJSON as they arrive, in the order the API returns them, so that neither a batch nor
+        # a feature is ever held decoded: only their IDs are read, to drop repeats.
+        overhead = len(self.base_url() + "boundaries?" + quote(param, safe='') + "=&limit=" + str(page_size) + "&offset=") + 10
+        batches = batch_ids(values, self.config.max_url_length - overhead)
+
+        if stream:
+            from field_id.geojson_stream import raw_member
+            features = itertools.chain.from_iterable(
+                self._paginate_stream(self.get_boundaries, {param: ','.join(batch)}, page_size) for batch in batches)
+            identify = lambda feature: raw_member(feature.data, 'id')
+        else:
+            def fetch(batch):
+                features = list(self._paginate_decoded(self.get_boundaries, {param: ','.join(batch)}, page_size))
+                return _order_by_relationship(features, param, batch)
+
+            features = itertools.chain.from_iterable(self._bulk_iter(fetch, batches, concurrency))
+            identify = lambda feature: feature.get('id')
+
+        seen = set()
+        for feature in features:
+            boundary_id = identify(feature)
+            if boundary_id is not None:
+                if boundary_id in seen:
+                    continue
+                seen.add(boundary_id)
+            yield feature
+
+    def get_boundaries_by_ids(self, boundary_ids, concurrency=None):
+        return self._bulk(self.get_boundary, boundary_ids, concurrency)
+
+    def get_boundary_references_by_ids(self, boundary_reference_ids, concurrency=None):
+        return self._bulk(self.get_boundary_reference, boundary_reference_ids, concurrency)
+
+    def iter_boundaries_by_ids(self, boundary_ids, concurrency=None):
+        return self._bulk_iter(self.get_boundary, boundary_ids, concurrency)
+
+    def expand_references(self, boundaries, concurrency=None):
+
+        # Copies all the properties of each boundary reference listed by the given boundaries
+        # into that listing (properties.boundary_references), not only the Varda-defined ones
+        # the boundary carries. References the API returns an error for are logged and left as
+        # they were. Returns the number of those.
+        refs = [ref for boundary in boundaries for ref in boundary['properties']['boundary_references']]
+        responses = self.get_boundary_references_by_ids([ref['id'] for ref in refs], concurrency=concurrency)
+        failed = 0
+        for ref, response in zip(refs, responses):
+            if not response.ok:
+                logger.warning("Failed to expand boundary reference %s: %s %s", ref['id'], response.status_code, response.reason)
+                failed += 1
+                continue
+            ref.update(response.json()['properties'])
+        return failed
+
+    def _bulk(self, fn, ids, concurrency=None):
+
+        # Each distinct ID is only requested once; duplicates share the response
+        ids = list(ids)
+        unique_ids = list(dict.fromkeys(ids))
+        with self._in_flight_lock:
+            self.saved_calls['duplicates'] += len(ids) - len(unique_ids)
+
+        responses = dict(zip(unique_ids, self._bulk_iter(fn, unique_ids, concurrency)))
+        return [responses[i] for i in ids]
+
+    def _bulk_iter(self, fn, ids, concurrency=None):
+
+        # Runs fn over ids on a bounded thread pool, yielding the responses in input order.
+        # Requests share the client's connection pool and rate limiter. Only a small window of
+        # requests runs ahead of the caller, so ids may be a lazy iterable of any length.
+        concurrency = self.workers(concurrency)
+
+        # Fetch the token up front so the workers don't all race to refresh it
+        self.access_token()
+
+        if concurrency <= 1:
+            for i in ids:
+                yield fn(i)
+            return
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            # Requests in the window are indexed by ID so that duplicates within it share one
+            window = collections.deque()
+            pending = {}
+            for i in ids:
+                if i in pending:
+                    future = pending[i]
+                    with self._in_flight_lock:
+                        self.saved_calls['duplicates'] += 1
+                else:
+                    future = pending[i] = executor.submit(fn, i)
+                window.append((i, future))
+
+                if len(window) >= concurrency * 2:
+                    yield self._pop_window(window, pending)
+            while window:
+                yield self._pop_window(window, pending)
+
+    def workers(self, concurrency=None):
+
+        # Number of threads the bulk methods use: as requested, otherwise the configured
+        # concurrency or, when that is adaptive, its upper bound (the controller then decides how
+        # many of them have a request in flight). The connection pool is grown to match.
+        if not concurrency:
+            concurrency = self.config.max_concurrency if self.config.adaptive else self.config.concurrency
+        self._grow_pool(concurrency)
+        return concurrency
+
+    def _pop_window(self, window, pending):
+        i, future = window.popleft()
+        if pending.get(i) is future and not any(j == i for j, _ in window):
+            del pending[i]
+        return future.result()
+
     def register_boundaries(self, payload={}, dry_run=False):
         url = self.base_url() + "boundaries"
 
@@ -144,40 +544,52 @@ class APIClient(object):
         return response
 
     def access_token(self):
-        
-        # Refresh token if necessary
-        if self._access_token and self._access_token_expiry >= datetime.datetime.now():
-            return self._access_token
+        return self.tokens.get()
 
-        # Refresh token 
-        payload = "grant_type=client_credentials&client_id={}&client_secret={}&audience={}".format(self.config.client_id, self.config.client_secret, self.config.audience)
+    def base_url(self):
+        url = self.config.base_url
+        if not url.endswith("/"):
+            url += "/"
+        return url
 
-        headers = { 'Content-Type': "application/x-www-form-urlencoded" }
+def batches(iterable, size):
 
-        print("Fetching token from "+self.config.token_url+" using client ID "+self.config.client_id)
-        start = datetime.datetime.now()
-        res = requests.post(self.config.token_url, data=payload, headers=headers)
-        res.raise_for_status()
-        data = res.json()
+    # Groups an iterable of any length into lists of up to size items
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
 
-        if 'access_token' not in data or 'expires_in' not in data:
-            raise APIException(status=401, reason="Malformed token response")
+def _order_by_relationship(features, param, values):
 
-        try:
-            expires_seconds = int(data['expires_in'])
-        except ValueError:
-            raise APIException(status=401, reason="Malformed token response")
+    # Stable sort of features by the position in values of the first value they relate to, e.g.
+    # for field_relationships.field_id, of the field IDs in properties.field_relationships.
+    # Features not listing a relationship keep their place after the others.
+    relationship, key = param.split('.', 1)
+    positions = {value: n for n, value in enumerate(values)}
 
-        self._access_token = data['access_token']
-        self._access_token_expiry = start + datetime.timedelta(seconds=expires_seconds - self.config.token_expiry_buffer)
+    def position(feature):
+        related = (feature.get('properties') or {}).get(relationship) or []
+        matches = [positions[r[key]] for r in related if isinstance(r, dict) and r.get(key) in positions]
+        return min(matches) if matches else len(values)
 
-        return self._access_token
+    return sorted(features, key=position)
 
-    def base_url(self):
-        url = self.config.base_url
-        if not url.endswith("/"):
-            url += "/"
-        return url
+def retryable_response(config, method, status_code, headers):
+
+    # Idempotent methods are retried on any of retry_status_codes. A 429, or a 503 with a
+    # Retry-After, means the server did not process the request, so those are retried whatever
+    # the method.
+    if status_code not in config.retry_status_codes:
+        return False
+    return method.upper() in config.retry_methods or status_code == 429 or (status_code == 503 and 'Retry-After' in headers)
+
+def _body_size(body):
+    if body is None:
+        return 0
+    return len(body.encode('utf-8') if isinstance(body, str) else body)
 
 class APIConfiguration(object):
 
@@ -188,9 +600,29 @@ class APIConfiguration(object):
                  client_id="",           # OAuth credentials
                  client_secret="",       # OAuth credentials
                  token_expiry_buffer=10, # Buffer (in seconds) used to refresh token before it expires
+                 token_refresh_ahead=300, # Seconds before expiry to fetch the next token in the background; 0 to only fetch on demand
+                 token_cache_path=None,  # Path to a file sharing tokens between processes using the same credentials
                  timeout=10,             # Client-side request timeout
                  tls_verify=True,        # Set to false to skip TLS cert verification.
-                 tls_ca_cert=None        # Set to customize the CA certificate for server certificate verification.
+                 tls_ca_cert=None,       # Set to customize the CA certificate for server certificate verification.
+                 pool_connections=10,    # Number of per-host connection pools to cache
+                 pool_maxsize=10,        # Maximum number of connections kept alive per host
+                 pool_block=False,       # Block when a host's pool is exhausted rather than opening extra, unpooled connections
+                 keep_alive=True,        # Set to false to close the connection after each request
+                 max_retries=3,          # Number of retries for transient failures (connection errors and retry_status_codes)
+                 retry_backoff_factor=0.5,  # Exponential backoff: factor * 2^attempt seconds between retries
+                 retry_backoff_max=60,      # Upper bound (in seconds) on any single retry delay, including Retry-After
+                 retry_status_codes=(429, 500, 502, 503, 504), # HTTP statuses that are retried
+                 retry_methods=('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'), # Idempotent methods that are safe to retry; others are only retried on 429, or 503 with Retry-After
+                 concurrency=1,          # Number of parallel requests used by the bulk fetch methods
+                 rate_limit=None,        # Maximum number of requests started per second; None for no limit
+                 adaptive=False,         # Adapt the request rate and concurrency to 429/503 responses, rate-limit headers and latency
+                 max_concurrency=32,     # Most requests in flight when adaptive; bulk methods then run this many workers
+                 max_url_length=2000,    # Longest request URL built when filtering by a list of IDs; longer lists are split into batches
+                 cache_size=1024,        # Number of boundaries/boundary references cached in memory; 0 to disable
+                 cache_path=None,        # Path to a SQLite file caching boundaries/boundary references between runs
+                 cache_disk_size=100000, # Maximum number of entries kept in the SQLite cache
+                 cache_ttl=86400         # Seconds after which cached entries are revalidated with the API; None to never revalidate
                  ):
 
         self.base_url = base_url
@@ -199,9 +631,29 @@ class APIConfiguration(object):
         self.client_id = client_id
         self.client_secret = client_secret
         self.token_expiry_buffer = token_expiry_buffer
+        self.token_refresh_ahead = token_refresh_ahead
+        self.token_cache_path = token_cache_path
         self.timeout = timeout
         self.tls_verify = tls_verify
         self.tls_ca_cert = tls_ca_cert
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.keep_alive = keep_alive
+        self.max_retries = max_retries
+        self.retry_backoff_factor = retry_backoff_factor
+        self.retry_backoff_max = retry_backoff_max
+        self.retry_status_codes = retry_status_codes
+        self.retry_methods = retry_methods
+        self.concurrency = concurrency
+        self.rate_limit = rate_limit
+        self.adaptive = adaptive
+        self.max_concurrency = max_concurrency
+        self.max_url_length = max_url_length
+        self.cache_size = cache_size
+        self.cache_path = cache_path
+        self.cache_disk_size = cache_disk_size
+        self.cache_ttl = cache_ttl
 
     def from_dict(conf):
         c = APIConfiguration()
@@ -0,0 +1,268 @@
+import aiohttp
+import asyncio
+import re
+import ssl
+import time
+import logging
+import datetime
+
+from field_id.api_client import APIException, retryable_response
+from field_id.metrics import ClientMetrics, Hooks, endpoint_name
+from field_id.rate_limit import AsyncRateLimiter, parse_retry_after
+
+logger = logging.getLogger(__name__)
+
+class AsyncAPIClient(object):
+
+    # asyncio counterpart of APIClient, sharing its APIConfiguration. Must be created and used
+    # within a running event loop, and closed (or used as an async context manager) when done:
+    #
+    #   async with AsyncAPIClient(config) as client:
+    #       response = await client.get_boundary(boundary_id)
+    #       feature = await response.json()
+    #
+    # Methods return aiohttp responses whose body has already been read, so json()/text() can be
+    # awaited after the connection has been released back to the pool.
+
+    def __init__(self, config):
+
+        # OAuth access token cache
+        self._access_token = None
+        self._access_token_expiry = None
+        self._token_lock = asyncio.Lock()
+
+        self.config = config
+
+        # aiohttp 'ssl' param is either boolean or an SSLContext
+        if config.tls_verify and config.tls_ca_cert:
+            self.ssl = ssl.create_default_context(cafile=config.tls_ca_cert)
+        else:
+            self.ssl = bool(config.tls_verify)
+
+        self.session = self._create_session()
+        self.rate_limiter = AsyncRateLimiter(config.rate_limit)
+
+        # Same hooks and metrics as APIClient
+        self.hooks = Hooks()
+        self.metrics = ClientMetrics()
+        self.metrics.attach(self.hooks)
+
+    def _create_session(self):
+
+        # limit_per_host mirrors pool_maxsize; the overall limit allows that many connections to
+        # each of pool_connections hosts
+        connector = aiohttp.TCPConnector(limit=self.config.pool_connections * self.config.pool_maxsize,
+                                         limit_per_host=self.config.pool_maxsize,
+                                         force_close=not self.config.keep_alive)
+        timeout = aiohttp.ClientTimeout(total=self.config.timeout)
+        return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+    async def close(self):
+        await self.session.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def _request(self, method, url, body=None, params={}, headers={}):
+
+        headers = dict(headers)
+        headers['Authorization'] = "Bearer "+await self.access_token()
+
+        logger.debug("%s %s %s", method, url, params)
+        endpoint = endpoint_name(self.base_url(), url)
+
+        kwargs = {
+            'headers': headers,
+            'params': params,
+            'ssl': self.ssl,
+        }
+
+        if body:
+            if 'Content-Type' not in headers:
+                headers['Content-Type'] = 'application/json'
+
+            # application/json, application/geo+json etc
+            if re.search('json', headers['Content-Type'], re.IGNORECASE):
+                # pass the body as data so aiohttp doesn't override our Content-Type
+                kwargs['data'] = aiohttp.JsonPayload(body, content_type=headers['Content-Type'])
+            else:
+                kwargs['data'] = body
+
+        data = kwargs.get('data')
+        bytes_sent = data.size if isinstance(data, aiohttp.Payload) else len(data or b'')
+
+        retryable = method.upper() in self.config.retry_methods
+        attempt = 0
+        while True:
+            await self.rate_limiter.acquire()
+            self.hooks.emit('request', method=method, url=url, endpoint=endpoint, attempt=attempt)
+            start = time.monotonic()
+            try:
+                async with self.session.request(method, url, **kwargs) as response:
+                    content = await response.read()
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                self.hooks.emit('error', method=method, url=url, endpoint=endpoint, attempt=attempt,
+                                elapsed=time.monotonic() - start, error=e)
+                if not retryable or attempt >= self.config.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+            else:
+                self.hooks.emit('response', method=method, url=url, endpoint=endpoint, attempt=attempt,
+                                status_code=response.status, elapsed=time.monotonic() - start,
+                                bytes_sent=bytes_sent, bytes_received=len(content))
+                if attempt >= self.config.max_retries or not retryable_response(self.config, method, response.status, response.headers):
+                    return response
+                delay = parse_retry_after(response.headers.get('Retry-After'), self.config.retry_backoff_max)
+                if delay is None:
+                    delay = self._backoff(attempt)
+
+            attempt += 1
+            logger.warning("Retrying %s %s in %.1fs (attempt %d of %d)", method, url, delay, attempt, self.config.max_retries)
+            self.hooks.emit('retry', method=method, url=url, endpoint=endpoint, attempt=attempt, delay=delay)
+            await asyncio.sleep(delay)
+
+    def _backoff(self, attempt):
+        return min(self.config.retry_backoff_factor * (2 ** attempt), self.config.retry_backoff_max)
+
+    async def field_search(self, payload={}, limit=5, offset=None):
+        url = self.base_url() + "field-searches"
+
+        querystring = {"limit":limit}
+
+        headers = {
+            "Content-Type": "application/geo+json",
+        }
+
+        return await self._request(method="POST", url=url, body=payload, headers=headers, params=querystring)
+
+    async def get_boundaries(self, args={}, limit=5, offset=None):
+        url = self.base_url() + "boundaries"
+
+        args = dict(args)
+        args['limit'] = limit
+        if offset:
+            args['offset'] = offset
+
+        headers = {
+            "Accept": "application/geo+json",
+        }
+
+        return await self._request(method="GET", url=url, body=None, headers=headers, params=args)
+
+    async def get_boundary(self, boundary_id):
+        if not boundary_id:
+            raise ValueError("Boundary ID is required")
+        url = self.base_url() + "boundaries/" + boundary_id
+
+        headers = {
+            "Accept": "application/geo+json",
+        }
+
+        return await self._request(method="GET", url=url, body=None, headers=headers)
+
+    async def get_boundary_references(self, args={}, limit=5, offset=None):
+        url = self.base_url() + "boundary-references"
+
+        args = dict(args)
+        args['limit'] = limit
+        if offset:
+            args['offset'] = offset
+
+        headers = {
+            "Accept": "application/geo+json",
+        }
+
+        return await self._request(method="GET", url=url, body=None, headers=headers, params=args)
+
+    async def get_boundary_reference(self, boundary_reference_id):
+        if not boundary_reference_id:
+            raise ValueError("Boundary Reference ID is required")
+        url = self.base_url() + "boundary-references/" + boundary_reference_id
+
+        headers = {
+            "Accept": "application/geo+json",
+        }
+
+        return await self._request(method="GET", url=url, body=None, headers=headers)
+
+    async def get_boundaries_by_ids(self, boundary_ids, concurrency=None):
+        return await self._bulk(self.get_boundary, boundary_ids, concurrency)
+
+    async def get_boundary_references_by_ids(self, boundary_reference_ids, concurrency=None):
+        return await self._bulk(self.get_boundary_reference, boundary_reference_ids, concurrency)
+
+    async def _bulk(self, fn, ids, concurrency=None):
+
+        # Runs fn over ids with at most `concurrency` requests in flight, returning the responses
+        # in input order
+        semaphore = asyncio.Semaphore(concurrency or self.config.concurrency)
+
+        async def run(i):
+            async with semaphore:
+                return await fn(i)
+
+        return await asyncio.gather(*[run(i) for i in ids])
+
+    async def register_boundaries(self, payload={}, dry_run=False):
+        url = self.base_url() + "boundaries"
+
+        args = {}
+        if dry_run:
+            args['dry_run'] = 'true'
+
+        headers = {
+            "Accept": "application/geo+json, application/json"
+        }
+
+        return await self._request(method="POST", url=url, body=payload, headers=headers, params=args)
+
+    async def access_token(self):
+
+        # Fast path: no locking while the cached token is valid
+        if self._token_is_valid():
+            return self._access_token
+
+        # Only one coroutine refreshes the token; the others wait on the lock and then find the
+        # fresh token already cached
+        async with self._token_lock:
+            if self._token_is_valid():
+                return self._access_token
+
+            payload = {
+                'grant_type': 'client_credentials',
+                'client_id': self.config.client_id,
+                'client_secret': self.config.client_secret,
+                'audience': self.config.audience,
+            }
+
+            logger.info("Fetching token from %s using client ID %s", self.config.token_url, self.config.client_id)
+            start = datetime.datetime.now()
+            async with self.session.post(self.config.token_url, data=payload, ssl=self.ssl) as res:
+                self.hooks.emit('token', url=self.config.token_url, elapsed=(datetime.datetime.now() - start).total_seconds(), status_code=res.status)
+                res.raise_for_status()
+                data = await res.json(content_type=None)
+
+            if 'access_token' not in data or 'expires_in' not in data:
+                raise APIException(status=401, reason="Malformed token response")
+
+            try:
+                expires_seconds = int(data['expires_in'])
+            except ValueError:
+                raise APIException(status=401, reason="Malformed token response")
+
+            self._access_token = data['access_token']
+            self._access_token_expiry = start + datetime.timedelta(seconds=expires_seconds - self.config.token_expiry_buffer)
+
+            return self._access_token
+
+    def _token_is_valid(self):
+        return self._access_token and self._access_token_expiry >= datetime.datetime.now()
+
+    def base_url(self):
+        url = self.config.base_url
+        if not url.endswith("/"):
+            url += "/"
+        return url
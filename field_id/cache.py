@@ -0,0 +1,120 @@
+import collections
+import sqlite3
+import threading
+import time
+
+# Cache of GET responses, keyed by client ID and URL so that cached documents are never shared
+# between credentials with different visibility. Entries are (etag, content, stored_at) tuples.
+#
+# Two tiers are consulted in turn: an in-process LRU of at most memory_size entries, and an
+# optional SQLite file of at most disk_size entries shared between runs. Entries older than ttl
+# seconds are stale; stale entries with an ETag are revalidated with If-None-Match rather than
+# downloaded again.
+
+# Number of writes between checks of the on-disk store's size
+DISK_EVICTION_INTERVAL = 100
+
+CacheEntry = collections.namedtuple('CacheEntry', ['etag', 'content', 'stored_at'])
+
+class ResponseCache(object):
+
+    def __init__(self, memory_size=1024, path=None, disk_size=100000, ttl=86400):
+        self.memory_size = memory_size
+        self.disk_size = disk_size
+        self.ttl = ttl
+
+        self._lock = threading.Lock()
+        self._memory = collections.OrderedDict()
+        self._db = None
+        self._puts = 0
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, etag TEXT, content BLOB, stored_at REAL)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_stored_at ON responses (stored_at)")
+            self._db.commit()
+
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = 0
+
+    def get(self, key):
+
+        # Returns the entry for key (fresh or stale), or None
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry:
+                self._memory.move_to_end(key)
+                return entry
+
+            if self._db:
+                row = self._db.execute("SELECT etag, content, stored_at FROM responses WHERE key = ?", (key,)).fetchone()
+                if row:
+                    entry = CacheEntry(row[0], bytes(row[1]), row[2])
+                    self._remember(key, entry)
+                    return entry
+
+        return None
+
+    def is_fresh(self, entry):
+        return not self.ttl or time.time() - entry.stored_at < self.ttl
+
+    def put(self, key, etag, content):
+        entry = CacheEntry(etag, content, time.time())
+        with self._lock:
+            self._remember(key, entry)
+            if self._db:
+                self._db.execute("INSERT OR REPLACE INTO responses (key, etag, content, stored_at) VALUES (?, ?, ?, ?)",
+                                 (key, etag, content, entry.stored_at))
+                # Counting rows is a table scan, so only enforce the size limit periodically
+                self._puts += 1
+                if self._puts % DISK_EVICTION_INTERVAL == 0:
+                    self._evict_disk()
+                self._db.commit()
+        return entry
+
+    def refresh(self, key, entry):
+
+        # Marks a revalidated entry as fresh again
+        return self.put(key, entry.etag, entry.content)
+
+    def _remember(self, key, entry):
+        if not self.memory_size:
+            return
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def _evict_disk(self):
+        count = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        if count > self.disk_size:
+            excess = count - self.disk_size
+            self._db.execute("DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY stored_at LIMIT ?)", (excess,))
+            self.evictions += excess
+
+    def record(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def close(self):
+        if self._db:
+            self._db.close()
+            self._db = None
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'revalidations': self.revalidations,
+            'evictions': self.evictions,
+            'memory_entries': len(self._memory),
+        }
@@ -0,0 +1,297 @@
+import sys
+import argparse
+import atexit
+import contextlib
+import importlib.util
+import io
+import json
+import logging
+import os
+import shlex
+import signal
+import threading
+import time
+
+# Single entry point for the API scripts, and a long-running mode sharing one client between
+# commands:
+#
+#   python3 -m field_id get-boundary -c local/config.yaml -b 0b1f...
+#   python3 -m field_id serve -c local/config.yaml [--socket local/field-id.sock]
+#   python3 -m field_id send --socket local/field-id.sock get-boundary -b 0b1f... -o local/b.ndjson
+#
+# Each command takes the same options as its script, less the connection options (-c,
+# --log-level, --metrics), which `serve` takes once for every command it runs. Only the modules
+# of the command being run are imported, so `send` starts in milliseconds, and the server's
+# client keeps its access token, pooled connections and cache from one command to the next.
+#
+# `serve` reads one command per line from STDIN, or from each connection to --socket, either as a
+# shell-style command line or as a JSON array of arguments; a JSON object of the form
+# {"id": ..., "args": [...]} has its id echoed back. Each command is answered with one line of
+# JSON: {"id", "command", "exit_code", "elapsed", "output", "errors"}, output and errors being what
+# the command printed to STDOUT and STDERR (so large results are better written to a file with
+# -o). The command `metrics` returns the client's request metrics so far. Commands on different
+# socket connections run concurrently.
+
+logger = logging.getLogger(__name__)
+
+# Command name and the script implementing it. Each script defines add_arguments(argParser) for
+# its own options and run(argParser, args, api_client).
+COMMANDS = {
+    'get-boundary': 'get-boundary.py',
+    'get-boundaries-by-fieldid': 'get-boundaries-by-fieldid.py',
+    'get-boundaries-overlapping-boundaryid': 'get-boundaries-overlapping-boundaryid.py',
+    'search-fields-with-geometry': 'search-fields-with-geometry.py',
+    'register-boundaries': 'register-boundaries.py',
+    'sync-boundaries': 'sync-boundaries.py',
+}
+
+SCRIPT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LOG_LEVELS = ["DEBUG", "INFO", "WARNING", "ERROR"]
+
+USAGE = """usage: python3 -m field_id <command> [options]
+
+commands:
+  {}
+  serve       run commands read from STDIN or a Unix socket, sharing one client
+  send        send a command to a running `serve --socket`
+
+Run `python3 -m field_id <command> -h` for the options of each command."""
+
+def main(argv):
+    if not argv or argv[0] in ('-h', '--help'):
+        print(USAGE.format("\n  ".join(COMMANDS)))
+        return 0
+
+    name, argv = argv[0], argv[1:]
+    if name == 'serve':
+        return serve(argv)
+    if name == 'send':
+        return send(argv)
+    if name not in COMMANDS:
+        print("Unknown command %s; should be one of %s, serve or send" % (name, ", ".join(COMMANDS)), file=sys.stderr)
+        return 2
+
+    module, argParser = command_parser(name)
+    args = argParser.parse_args(argv)
+    configure_logging(args.log_level)
+    api_client = create_client(args.configfile, args.metrics)
+    return module.run(argParser, args, api_client)
+
+def add_common_arguments(argParser):
+    argParser.add_argument("-c", "--configfile", required=True, help="Path to config YAML file containing credentials")
+    argParser.add_argument("--log-level", choices=LOG_LEVELS, default="INFO", help="Logging level; DEBUG logs every request")
+    argParser.add_argument("--metrics", required=False, help="Path to write request metrics to at the end of the run: Prometheus text format if it ends with .prom, JSON otherwise")
+
+def configure_logging(level):
+    logging.basicConfig(level=level, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+def read_config(file_path):
+    import yaml
+    from field_id.api_client import APIConfiguration
+
+    with open(file_path, "r") as f:
+        return APIConfiguration.from_dict(yaml.safe_load(f))
+
+def create_client(config_fn, metrics_fn=None):
+    from field_id.api_client import APIClient
+
+    api_client = APIClient(config=read_config(config_fn))
+
+    # Summarise the requests made however the run ends
+    atexit.register(api_client.metrics.report, metrics_fn)
+    return api_client
+
+_commands = {}
+_commands_lock = threading.Lock()
+
+def load_command(name):
+
+    # The script behind a command, loaded as a module the first time it is needed
+    with _commands_lock:
+        if name not in _commands:
+            path = os.path.join(SCRIPT_DIR, COMMANDS[name])
+            spec = importlib.util.spec_from_file_location("field_id_" + name.replace('-', '_'), path)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            _commands[name] = module
+        return _commands[name]
+
+def command_parser(name, common=True):
+    module = load_command(name)
+    argParser = argparse.ArgumentParser(prog="field_id " + name)
+    module.add_arguments(argParser)
+    if common:
+        add_common_arguments(argParser)
+    return module, argParser
+
+def serve(argv):
+
+    argParser = argparse.ArgumentParser(prog="field_id serve")
+    add_common_arguments(argParser)
+    argParser.add_argument("-s", "--socket", required=False, help="Path of a Unix socket to accept commands on; commands are read from STDIN by default")
+
+    args = argParser.parse_args(argv)
+    configure_logging(args.log_level)
+
+    server = CommandServer(create_client(args.configfile, args.metrics))
+    if args.socket:
+        server.serve_socket(args.socket)
+    else:
+        server.serve_stream(sys.stdin, server.stdout.stream)
+    return 0
+
+def send(argv):
+
+    argParser = argparse.ArgumentParser(prog="field_id send")
+    argParser.add_argument("-s", "--socket", required=True, help="Path of the Unix socket of a running `field_id serve`")
+    argParser.add_argument("command", nargs=argparse.REMAINDER, help="Command and its options, as they would be given to `python3 -m field_id`")
+
+    args = argParser.parse_args(argv)
+    if not args.command:
+        argParser.error("a command is required")
+
+    import socket
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(args.socket)
+        sock.sendall((json.dumps(args.command) + "\n").encode('utf-8'))
+        with sock.makefile('rb') as f:
+            response = json.loads(f.readline())
+
+    sys.stdout.write(response.get('output', ''))
+    sys.stderr.write(response.get('errors', ''))
+    if 'metrics' in response:
+        print(json.dumps(response['metrics'], indent=2))
+    if 'error' in response:
+        print(response['error'], file=sys.stderr)
+    return response['exit_code']
+
+class CommandServer(object):
+
+    # Runs commands against one shared APIClient. While serving, sys.stdout and sys.stderr are
+    # replaced so that what each command prints is captured for its response, whichever thread
+    # it runs in.
+
+    def __init__(self, api_client):
+        self.api_client = api_client
+        self.stdout = sys.stdout = _ThreadOutput(sys.stdout)
+        self.stderr = sys.stderr = _ThreadOutput(sys.stderr)
+
+    def serve_stream(self, requests, responses):
+        for line in requests:
+            if line.strip():
+                responses.write(json.dumps(self.execute(line)) + "\n")
+                responses.flush()
+
+    def serve_socket(self, path):
+        import socketserver
+
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    line = line.decode('utf-8')
+                    if line.strip():
+                        self.wfile.write((json.dumps(server.execute(line)) + "\n").encode('utf-8'))
+
+        # A socket left behind by a previous server is replaced; the new one is only accessible
+        # to its owner
+        if os.path.exists(path):
+            os.remove(path)
+        umask = os.umask(0o177)
+        try:
+            listener = socketserver.ThreadingUnixStreamServer(path, Handler)
+        finally:
+            os.umask(umask)
+        listener.daemon_threads = True
+
+        # Stopping the server with a signal still removes its socket
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+        logger.info("Accepting commands on %s", path)
+        try:
+            listener.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            listener.server_close()
+            os.remove(path)
+
+    def execute(self, line):
+        start = time.monotonic()
+        response = {}
+        try:
+            request_id, argv = _parse_request(line)
+        except ValueError as e:
+            return {'exit_code': 2, 'error': "Malformed command: %s" % e}
+        if request_id is not None:
+            response['id'] = request_id
+
+        name = argv[0] if argv else None
+        response['command'] = name
+        if name == 'metrics':
+            response.update(exit_code=0, metrics=self.api_client.metrics.summary())
+            return response
+        if name not in COMMANDS:
+            response.update(exit_code=2, error="Unknown command %s; should be one of %s or metrics" % (name, ", ".join(COMMANDS)))
+            return response
+
+        with self.stdout.capture() as output, self.stderr.capture() as errors:
+            try:
+                module, argParser = command_parser(name, common=False)
+                args = argParser.parse_args(argv[1:])
+                exit_code = module.run(argParser, args, self.api_client) or 0
+            except SystemExit as e:
+                # argparse errors and scripts exiting with a status
+                if e.code is None or isinstance(e.code, int):
+                    exit_code = e.code or 0
+                else:
+                    print(e.code, file=sys.stderr)
+                    exit_code = 1
+            except Exception as e:
+                logger.exception("Command %s failed", name)
+                exit_code = 1
+                response['error'] = "%s: %s" % (type(e).__name__, e)
+
+        logger.info("%s finished with exit status %d in %.3fs", name, exit_code, time.monotonic() - start)
+        response.update(exit_code=exit_code, elapsed=time.monotonic() - start,
+                        output=output.getvalue().decode('utf-8', 'replace'),
+                        errors=errors.getvalue().decode('utf-8', 'replace'))
+        return response
+
+class _ThreadOutput(object):
+
+    # Stands in for a standard stream: writes from a thread capturing its output go to that
+    # thread's buffer, everything else to the original stream
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._local = threading.local()
+
+    def __getattr__(self, name):
+        return getattr(getattr(self._local, 'target', None) or self.stream, name)
+
+    @contextlib.contextmanager
+    def capture(self):
+        raw = io.BytesIO()
+        target = self._local.target = io.TextIOWrapper(raw, encoding='utf-8', write_through=True)
+        try:
+            yield raw
+        finally:
+            self._local.target = None
+            target.flush()
+            target.detach()
+
+def _parse_request(line):
+
+    # A JSON array of arguments, a JSON object with "args" (and optionally "id"), or a shell-style
+    # command line
+    line = line.strip()
+    if line.startswith('{'):
+        request = json.loads(line)
+        return request.get('id'), [str(arg) for arg in request.get('args', [])]
+    if line.startswith('['):
+        return None, [str(arg) for arg in json.loads(line)]
+    return None, shlex.split(line)
@@ -0,0 +1,166 @@
+import json
+import struct
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.ipc
+import pyarrow.parquet
+
+from field_id.fast_json import RawJSON
+
+# Columnar writers for boundary features: GeoParquet (1.0) or Arrow IPC files, one row per
+# feature. The properties the API reports for every boundary are flattened into typed columns;
+# the complete properties object is kept as JSON text so nothing is lost, and the geometry is
+# stored as WKB. Rows are buffered and written a row group (or record batch) at a time, so
+# memory use is bounded by row_group_size rather than the size of the output.
+#
+# Requires pyarrow, which is only imported when a columnar format is used.
+
+ROW_GROUP_SIZE = 10000
+
+COMPRESSION = 'zstd'
+
+SCHEMA = pa.schema([
+    ('id', pa.string()),
+    ('area_m2', pa.float64()),
+    ('perimeter_m', pa.float64()),
+    ('centroid_x', pa.float64()),
+    ('centroid_y', pa.float64()),
+    ('representative_point_x', pa.float64()),
+    ('representative_point_y', pa.float64()),
+    ('reference_ids', pa.list_(pa.string())),
+    ('properties', pa.string()),
+    ('geometry', pa.binary()),
+])
+
+# GeoParquet file metadata. The CRS is omitted, meaning OGC:CRS84 (WGS84 longitude/latitude).
+GEO_METADATA = {
+    'version': '1.0.0',
+    'primary_column': 'geometry',
+    'columns': {
+        'geometry': {'encoding': 'WKB', 'geometry_types': []},
+    },
+}
+
+WKB_TYPES = {
+    'Point': 1,
+    'LineString': 2,
+    'Polygon': 3,
+    'MultiPoint': 4,
+    'MultiLineString': 5,
+    'MultiPolygon': 6,
+    'GeometryCollection': 7,
+}
+
+class ColumnarWriter(object):
+
+    def __init__(self, fh, format='parquet', row_group_size=ROW_GROUP_SIZE):
+
+        # fh is a binary file object (or path) to write to
+        self.fh = fh
+        self.format = format
+        self.row_group_size = row_group_size
+        self.count = 0
+        self._rows = []
+
+        if format == 'parquet':
+            schema = SCHEMA.with_metadata({'geo': json.dumps(GEO_METADATA)})
+            self._writer = pa.parquet.ParquetWriter(fh, schema, compression=COMPRESSION)
+        elif format == 'arrow':
+            options = pa.ipc.IpcWriteOptions(compression=COMPRESSION)
+            self._writer = pa.ipc.new_file(fh, SCHEMA, options=options)
+        else:
+            raise ValueError("Columnar format "+format+" should be one of parquet, arrow")
+
+    def write(self, feature):
+        if isinstance(feature, RawJSON):
+            feature = feature.value
+        self._rows.append(flatten_feature(feature))
+        self.count += 1
+        if len(self._rows) >= self.row_group_size:
+            self._write_rows()
+
+    def flush(self):
+
+        # Rows are only written out in whole row groups, so a flush does not force a partial one
+        pass
+
+    def close(self):
+        if self._rows:
+            self._write_rows()
+        self._writer.close()
+        if hasattr(self.fh, 'close'):
+            self.fh.close()
+
+    def _write_rows(self):
+        columns = list(zip(*self._rows))
+        batch = pa.RecordBatch.from_arrays([pa.array(column, type=field.type) for column, field in zip(columns, SCHEMA)], schema=SCHEMA)
+        self._writer.write_batch(batch)
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def flatten_feature(feature):
+
+    # One row of SCHEMA, as a tuple, for a boundary feature
+    properties = feature.get('properties') or {}
+    centroid = _point(properties.get('centroid'))
+    representative_point = _point(properties.get('representative_point'))
+    references = properties.get('boundary_references')
+    geometry = feature.get('geometry')
+
+    return (
+        None if feature.get('id') is None else str(feature['id']),
+        _value(properties.get('area')),
+        _value(properties.get('perimeter')),
+        centroid[0],
+        centroid[1],
+        representative_point[0],
+        representative_point[1],
+        [str(ref['id']) for ref in references if isinstance(ref, dict) and 'id' in ref] if isinstance(references, list) else None,
+        json.dumps(properties, separators=(',', ':')),
+        to_wkb(geometry) if geometry else None,
+    )
+
+def to_wkb(geometry):
+
+    # Little-endian WKB for a GeoJSON geometry. Only the first two dimensions of each position are kept.
+    geometry_type = geometry['type']
+    header = struct.pack('<BI', 1, WKB_TYPES[geometry_type])
+
+    if geometry_type == 'GeometryCollection':
+        parts = geometry.get('geometries', [])
+        return header + struct.pack('<I', len(parts)) + b''.join(to_wkb(part) for part in parts)
+
+    coordinates = geometry['coordinates']
+    if geometry_type == 'Point':
+        return header + _positions([coordinates], count=False)
+    if geometry_type == 'LineString':
+        return header + _positions(coordinates)
+    if geometry_type == 'Polygon':
+        return header + _rings(coordinates)
+
+    part_type = geometry_type[len('Multi'):]
+    parts = [to_wkb({'type': part_type, 'coordinates': part}) for part in coordinates]
+    return header + struct.pack('<I', len(parts)) + b''.join(parts)
+
+def _rings(rings):
+    return struct.pack('<I', len(rings)) + b''.join(_positions(ring) for ring in rings)
+
+def _positions(positions, count=True):
+    array = np.array([position[:2] for position in positions], dtype='<f8').reshape(-1, 2)
+    return (struct.pack('<I', len(array)) if count else b'') + array.tobytes()
+
+def _value(measure):
+    if isinstance(measure, dict):
+        measure = measure.get('value')
+    return float(measure) if isinstance(measure, (int, float)) else None
+
+def _point(position):
+    if isinstance(position, list) and len(position) >= 2:
+        return float(position[0]), float(position[1])
+    return None, None
@@ -0,0 +1,65 @@
+import json
+
+try:
+    import orjson
+except ImportError:
+    # The standard library encoder and decoder are used instead
+    orjson = None
+
+# JSON encoding and decoding for the hot paths: API pages and script output. orjson is used when
+# installed (pip install orjson), being several times faster than the json module for the large
+# coordinate arrays of boundaries; output is the same compact JSON either way.
+
+BACKEND = 'orjson' if orjson else 'json'
+
+_UNSET = object()
+
+def loads(data):
+    if orjson:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def dumps(obj):
+
+    # Compact JSON text. orjson leaves non-ASCII characters unescaped and rejects a few things
+    # the json module accepts (e.g. non-string keys), which are left to the json module.
+    if orjson:
+        try:
+            return orjson.dumps(obj).decode('utf-8')
+        except TypeError:
+            pass
+    return json.dumps(obj, separators=(',', ':'))
+
+class RawJSON(object):
+
+    # A JSON value kept as the bytes it was received as. The output writers copy it to their
+    # output as it is, without decoding and re-encoding it; it is only decoded, once, if its
+    # content is looked at (value, get, []). Changes made to the decoded value are not written
+    # out, so code modifying a feature should write its value rather than the RawJSON.
+
+    __slots__ = ('data', '_value')
+
+    def __init__(self, data):
+        self.data = data
+        self._value = _UNSET
+
+    @property
+    def value(self):
+        if self._value is _UNSET:
+            self._value = loads(self.data)
+        return self._value
+
+    def get(self, key, default=None):
+        return self.value.get(key, default)
+
+    def __getitem__(self, key):
+        return self.value[key]
+
+    def text(self):
+
+        # As a single line: a raw newline can only be whitespace between tokens, as JSON strings
+        # must escape them
+        data = self.data
+        if b'\n' in data or b'\r' in data:
+            data = data.replace(b'\r', b' ').replace(b'\n', b' ')
+        return data.decode('utf-8')
@@ -0,0 +1,335 @@
+import functools
+import gzip
+import json
+import re
+import numpy as np
+
+# Incremental readers for GeoJSON inputs too large to load in one go. Both yield one Feature (or
+# other GeoJSON object) at a time, so memory use is bounded by the largest single feature.
+#
+# - FeatureCollection documents are parsed lazily: each element of the top-level "features"
+#   array is decoded and yielded as soon as it has been read. A document without a "features"
+#   array (a single Feature or geometry) is yielded whole. A top-level JSON array of features
+#   (as written by get-boundary.py) is streamed the same way.
+# - Newline-delimited GeoJSON (GeoJSONSeq, RFC 8142), with or without the leading record
+#   separator, is read one record per line.
+#
+# Files ending in .gz are decompressed on the fly.
+#
+# iter_raw_features splits a FeatureCollection arriving as a stream of bytes (e.g. an API
+# response) into the raw bytes of each feature, without decoding them at all, and raw_member
+# picks a single member (such as the "id") out of those bytes.
+
+RECORD_SEPARATOR = '\x1e'
+
+SEQ_EXTENSIONS = ('.geojsons', '.geojsonl', '.geojsonseq', '.ndjson', '.jsonl')
+
+READ_SIZE = 65536
+
+def iter_features(file_path, object_hook=None):
+    if file_path.lower().endswith('.gz'):
+        f = gzip.open(file_path, 'rt')
+        file_path = file_path[:-3]
+    else:
+        f = open(file_path, 'r')
+
+    with f:
+        if is_geojson_seq(file_path, f):
+            yield from iter_geojson_seq(f, object_hook)
+        else:
+            yield from iter_feature_collection(f, object_hook)
+
+def is_geojson_seq(file_path, f):
+
+    # GeoJSONSeq is recognised by file extension or by a leading record separator
+    if file_path.lower().endswith(SEQ_EXTENSIONS):
+        return True
+    first = f.read(1)
+    f.seek(0)
+    return first == RECORD_SEPARATOR
+
+def iter_geojson_seq(f, object_hook=None):
+    decoder = json.JSONDecoder(object_hook=object_hook)
+    for n, line in enumerate(f, start=1):
+        line = line.strip().lstrip(RECORD_SEPARATOR).strip()
+        if not line:
+            continue
+        try:
+            yield decoder.decode(line)
+        except json.JSONDecodeError as e:
+            raise ValueError("Invalid GeoJSON text on line {}: {}".format(n, e))
+
+def iter_feature_collection(f, object_hook=None):
+    reader = _Reader(f, json.JSONDecoder(object_hook=object_hook))
+
+    if reader.consume('['):
+        yield from _iter_array(reader)
+        return
+
+    reader.expect('{')
+    members = {}
+    streamed = False
+
+    if not reader.consume('}'):
+        while True:
+            key = reader.decode()
+            reader.expect(':')
+
+            if key == 'features' and reader.consume('['):
+                streamed = True
+                yield from _iter_array(reader)
+            else:
+                members[key] = reader.decode()
+
+            if reader.consume('}'):
+                break
+            reader.expect(',')
+
+    # Not a FeatureCollection: the whole document is a single GeoJSON object
+    if not streamed:
+        yield object_hook(members) if object_hook else members
+
+def _iter_array(reader):
+
+    # Yields the elements of an array whose opening bracket has already been consumed
+    if reader.consume(']'):
+        return
+    while True:
+        yield reader.decode()
+        if reader.consume(']'):
+            return
+        reader.expect(',')
+
+class _Reader(object):
+
+    # Buffered reader decoding one JSON value at a time with JSONDecoder.raw_decode. When a value
+    # runs past the end of the buffer, the read size doubles before retrying, so decoding stays
+    # linear in the size of the value.
+
+    def __init__(self, f, decoder):
+        self.f = f
+        self.decoder = decoder
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        self.read_size = READ_SIZE
+
+    def _fill(self):
+        chunk = self.f.read(self.read_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def _skip_whitespace(self):
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buffer) or not self._fill():
+                return
+
+    def consume(self, char):
+        self._skip_whitespace()
+        if self.pos < len(self.buffer) and self.buffer[self.pos] == char:
+            self.pos += 1
+            return True
+        return False
+
+    def expect(self, char):
+        if not self.consume(char):
+            found = self.buffer[self.pos:self.pos + 1] or 'end of file'
+            raise ValueError("Invalid GeoJSON: expected '{}' but found '{}'".format(char, found))
+
+    def decode(self):
+        self._skip_whitespace()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError as e:
+                if self.eof:
+                    raise ValueError("Invalid GeoJSON: {}".format(e))
+                self.read_size = max(self.read_size, len(self.buffer) - self.pos)
+                self._fill()
+                continue
+
+            # A number at the very end of the buffer may have been truncated
+            if end == len(self.buffer) and not self.eof and self._fill():
+                continue
+
+            self.pos = end
+            self.read_size = READ_SIZE
+            return value
+
+def iter_raw_features(chunks):
+
+    # Yields the bytes of each element of the "features" array of a FeatureCollection, or of a
+    # top-level JSON array, read as an iterable of byte chunks (e.g. response.iter_content())
+    splitter = _FeatureSplitter()
+    for chunk in chunks:
+        yield from splitter.feed(chunk)
+    splitter.close()
+
+# Bytes of interest to _FeatureSplitter
+_QUOTE, _BACKSLASH = ord('"'), ord('\\')
+_OPENERS = (ord('{'), ord('['))
+_CLOSERS = (ord('}'), ord(']'))
+
+# Bytes of the previous chunk kept to recognise a "features" key split across chunks
+_LOOKBEHIND = 64
+
+# A string, number or literal JSON value, for raw_member
+_SCALAR = re.compile(rb'"(?:[^"\\]|\\.)*"|-?[0-9]+(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?(?=[\s,}\]])|true|false|null')
+
+class _FeatureSplitter(object):
+
+    # Finds the boundaries of the features in each chunk with array operations rather than by
+    # decoding: the nesting depth after every byte is the running sum of the brackets outside
+    # strings, and a feature ends where the depth drops back to that of the features array.
+    # Only the string, escape and depth state is carried from one chunk to the next, along with
+    # the part of a feature read so far.
+
+    def __init__(self):
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.array_depth = None   # depth within the features array; 0 once it has ended
+        self.started = False      # whether anything but whitespace has been read
+        self.pending = None       # bytes of a feature continuing into the next chunk
+        self.tail = b''
+
+    def feed(self, chunk):
+        if not chunk:
+            return
+        a = np.frombuffer(chunk, dtype=np.uint8)
+        quotes, self.escape = _unescaped_quotes(a, self.escape)
+        quote_count, openers, closers, depth = _scan(a, quotes, self.in_string, self.depth)
+        self.depth = int(depth[-1])
+        self.in_string = bool((quote_count[-1] + self.in_string) & 1)
+
+        start = 0
+        if self.array_depth is None:
+            start = self._find_array(chunk, a, openers, depth)
+            if start is None:
+                self.tail = (self.tail + chunk)[-_LOOKBEHIND:]
+                return
+        if not self.array_depth:
+            return
+
+        # Features open at the depth of the array and close back to it; the array closes to the
+        # depth of its parent
+        level = self.array_depth
+        starts = np.flatnonzero(openers[start:] & (depth[start:] == level + 1)) + start
+        ends = np.flatnonzero(closers[start:] & (depth[start:] == level)) + start
+        array_end = np.flatnonzero(closers[start:] & (depth[start:] == level - 1))
+
+        limit = len(chunk)
+        if len(array_end):
+            limit = array_end[0] + start
+            self.array_depth = 0
+        starts = starts[starts < limit]
+        ends = ends[ends < limit]
+
+        e = 0
+        if self.pending is not None:
+            if not len(ends):
+                self.pending += chunk[start:limit]
+                return
+            yield bytes(self.pending + chunk[:ends[0] + 1])
+            self.pending = None
+            e = 1
+        for s in starts:
+            if e < len(ends):
+                yield chunk[s:ends[e] + 1]
+                e += 1
+            else:
+                self.pending = bytearray(chunk[s:limit])
+
+    def _find_array(self, chunk, a, openers, depth):
+
+        # Position just after the opening bracket of the features array, or of the document if
+        # it is an array, recording its depth; None if it is not in this chunk
+        if not self.started:
+            content = np.flatnonzero(~np.isin(a, (0x20, 0x09, 0x0a, 0x0d)))
+            if len(content):
+                self.started = True
+                if a[content[0]] == ord('['):
+                    self.array_depth = 1
+                    return content[0] + 1
+
+        for p in np.flatnonzero(openers & (a == ord('[')) & (depth == 2)):
+            before = (self.tail + chunk[:p]).rstrip()
+            if before.endswith(b':') and before[:-1].rstrip().endswith(b'"features"'):
+                self.array_depth = 2
+                return p + 1
+        return None
+
+    def close(self):
+        if self.array_depth is None:
+            raise ValueError("Invalid GeoJSON: no features array found")
+        if self.array_depth or self.pending is not None:
+            raise ValueError("Invalid GeoJSON: the features array is incomplete")
+
+def _unescaped_quotes(a, escape):
+
+    # Quotes not escaped by a backslash, and whether the byte after a ends up escaped. escape says
+    # whether the first byte is. Backslashes are rare outside long text properties, so escapes
+    # are resolved one backslash at a time.
+    quotes = a == _QUOTE
+    backslashes = np.flatnonzero(a == _BACKSLASH)
+    if len(backslashes) or escape:
+        escaped = np.zeros(len(a), dtype=bool)
+        escaped[0] = escape
+        escape = False
+        for p in backslashes:
+            if escaped[p]:
+                continue
+            if p + 1 < len(a):
+                escaped[p + 1] = True
+            else:
+                escape = True
+        quotes &= ~escaped
+    return quotes, escape
+
+def _scan(a, quotes, in_string=False, depth=0):
+
+    # Running count of quotes, the brackets outside strings, and the depth after each byte
+    quote_count = np.cumsum(quotes)
+    outside = ((quote_count + in_string) & 1) == 0
+    openers = outside & ((a == _OPENERS[0]) | (a == _OPENERS[1]))
+    closers = outside & ((a == _CLOSERS[0]) | (a == _CLOSERS[1]))
+    return quote_count, openers, closers, depth + np.cumsum(openers.astype(np.int32) - closers)
+
+def _is_top_level(data, p):
+
+    # Whether the quote at p opens a key directly within the top-level object. Commonly nothing
+    # but the object's own brace precedes it, with no escapes, which is settled without numpy.
+    prefix = data[:p]
+    if b'\\' not in prefix and prefix.count(b'{') + prefix.count(b'[') == 1 and prefix.lstrip().startswith(b'{'):
+        return prefix.count(b'"') % 2 == 0
+
+    a = np.frombuffer(data, dtype=np.uint8, count=p + 1)
+    quotes, _ = _unescaped_quotes(a, False)
+    quote_count, _, _, depth = _scan(a, quotes)
+    return bool(quotes[p] and quote_count[p] & 1 and depth[p] == 1)
+
+@functools.lru_cache(maxsize=16)
+def _member_pattern(key):
+    return re.compile(b'"' + re.escape(json.dumps(key)[1:-1].encode('utf-8')) + rb'"\s*:\s*')
+
+def raw_member(data, key):
+
+    # Decoded value of the member `key` of the JSON object in the bytes data, or None if it has
+    # none. Only that value is decoded; members of the same name in nested objects are skipped,
+    # by checking the depth of each candidate. Only the bytes up to a candidate are scanned, so
+    # a member near the start of a large feature (like its "id") is found cheaply.
+    for match in _member_pattern(key).finditer(data):
+        p = match.start()
+        if not _is_top_level(data, p):
+            continue
+        scalar = _SCALAR.match(data, match.end())
+        if scalar:
+            return json.loads(scalar.group())
+        return json.JSONDecoder().raw_decode(data[match.end():].decode('utf-8'))[0]
+    return None
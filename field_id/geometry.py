@@ -0,0 +1,652 @@
+import hashlib
+import json
+import numpy as np
+
+# Helpers for working with GeoJSON geometries locally, without calling the API.
+
+# Mean Earth radius in metres
+EARTH_RADIUS = 6371008.8
+
+# WGS84 ellipsoid, used for the geodesic measurements below
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+WGS84_E2 = WGS84_F * (2 - WGS84_F)
+
+# Maximum number of pairs of edges tested at once when looking for self-intersections, bounding
+# the size of the intermediate arrays
+INTERSECTION_CHUNK_SIZE = 100000
+
+# Number of decimal places coordinates are rounded to before hashing: 6 places is roughly 0.1m,
+# so geometries differing only by floating point noise or re-projection jitter hash the same.
+HASH_PRECISION = 6
+
+def get_geometry(obj):
+
+    # Returns the geometry of a Feature, or the object itself if it is already a geometry
+    if obj.get('type') == 'Feature':
+        return obj.get('geometry')
+    return obj
+
+def canonical_hash(obj, precision=HASH_PRECISION):
+
+    # Hash identifying a (Multi)Polygon regardless of how it happens to be written down: with
+    # coordinates rounded to `precision` decimal places, rings starting at their lowest vertex
+    # and wound consistently (exterior counter-clockwise, holes clockwise), holes and polygons in
+    # a fixed order, and a Polygon treated as a single-part MultiPolygon. Other geometry types
+    # are hashed on their rounded coordinates.
+    geometry = get_geometry(obj)
+    if not geometry:
+        return None
+
+    if geometry['type'] == 'Polygon':
+        canonical = ['MultiPolygon', [_canonical_polygon(geometry['coordinates'], precision)]]
+    elif geometry['type'] == 'MultiPolygon':
+        canonical = ['MultiPolygon', sorted(_canonical_polygon(p, precision) for p in geometry['coordinates'])]
+    else:
+        canonical = [geometry['type'], _round(geometry.get('coordinates'), precision)]
+
+    return hashlib.sha1(json.dumps(canonical, separators=(',', ':')).encode('utf-8')).hexdigest()
+
+def _canonical_polygon(rings, precision):
+    if not rings:
+        return []
+    exterior = _canonical_ring(rings[0], precision, ccw=True)
+    holes = sorted(_canonical_ring(ring, precision, ccw=False) for ring in rings[1:])
+    return [exterior] + holes
+
+def _canonical_ring(ring, precision, ccw):
+    points = [tuple(round(float(c), precision) for c in point[:2]) for point in ring]
+
+    # Drop the closing point and any consecutive duplicates introduced by rounding
+    deduped = []
+    for point in points:
+        if not deduped or deduped[-1] != point:
+            deduped.append(point)
+    while len(deduped) > 1 and deduped[0] == deduped[-1]:
+        deduped.pop()
+
+    if (signed_ring_area(deduped) > 0) != ccw:
+        deduped.reverse()
+
+    # Start at the lowest vertex, then close the ring again
+    start = deduped.index(min(deduped)) if deduped else 0
+    deduped = deduped[start:] + deduped[:start]
+    return [list(p) for p in deduped + deduped[:1]]
+
+def signed_ring_area(ring):
+
+    # Shoelace formula in coordinate units; positive for counter-clockwise rings. The ring may
+    # or may not repeat its first point at the end.
+    area = 0.0
+    n = len(ring)
+    for i in range(n):
+        x1, y1 = ring[i][0], ring[i][1]
+        x2, y2 = ring[(i + 1) % n][0], ring[(i + 1) % n][1]
+        area += x1 * y2 - x2 * y1
+    return area / 2.0
+
+def _round(coordinates, precision):
+    if isinstance(coordinates, (list, tuple)):
+        return [_round(c, precision) for c in coordinates]
+    if isinstance(coordinates, (int, float)):
+        return round(float(coordinates), precision)
+    return coordinates
+
+def iter_polygons(geometry):
+
+    # Yields the rings of each polygon of a Polygon or MultiPolygon
+    if geometry['type'] == 'Polygon':
+        yield geometry['coordinates']
+    elif geometry['type'] == 'MultiPolygon':
+        yield from geometry['coordinates']
+
+def validate_geometry(obj, check_winding=False):
+
+    # Checks a (Multi)Polygon, or the geometry of a Feature, for problems the API would reject.
+    # Returns a list of descriptions, empty if the geometry is valid. Each ring must have at
+    # least 4 positions, be closed, stay within longitude/latitude bounds, enclose a non-zero
+    # area and not intersect or touch itself. With check_winding, rings must also follow the
+    # RFC 7946 right-hand rule (see orient_geometry).
+    geometry = get_geometry(obj)
+    if not geometry:
+        return ["missing geometry"]
+    if geometry.get('type') not in ['Polygon', 'MultiPolygon']:
+        return ["unsupported geometry type {}".format(geometry.get('type'))]
+
+    problems = []
+    for p, rings in enumerate(iter_polygons(geometry)):
+        if not rings:
+            problems.append("polygon {} has no rings".format(p))
+        for r, ring in enumerate(rings):
+            label = "polygon {} ring {}".format(p, r)
+            coords = _ring_array(ring)
+            if coords is None:
+                problems.append(label+": malformed coordinates")
+                continue
+            if len(coords) < 4:
+                problems.append(label+": fewer than 4 positions")
+                continue
+            if not np.isfinite(coords).all():
+                problems.append(label+": non-finite coordinates")
+                continue
+            if (np.abs(coords[:, 0]) > 180).any() or (np.abs(coords[:, 1]) > 90).any():
+                problems.append(label+": coordinates out of bounds")
+            if not (coords[0] == coords[-1]).all():
+                problems.append(label+": not closed")
+                continue
+
+            area = _signed_area(coords)
+            if area == 0:
+                problems.append(label+": zero area")
+            elif check_winding and (area > 0) != (r == 0):
+                problems.append(label+": wrong winding order")
+            if ring_self_intersects(coords):
+                problems.append(label+": self-intersection")
+
+    return problems
+
+def orient_geometry(geometry):
+
+    # Returns a copy of a (Multi)Polygon with rings wound according to the RFC 7946 right-hand
+    # rule: exterior rings counter-clockwise, holes clockwise
+    polygons = []
+    for rings in iter_polygons(geometry):
+        oriented = []
+        for r, ring in enumerate(rings):
+            if (_signed_area(np.asarray(ring, dtype=float)[:, :2]) > 0) != (r == 0):
+                ring = ring[::-1]
+            oriented.append([list(point) for point in ring])
+        polygons.append(oriented)
+    return _with_polygons(geometry, polygons)
+
+def simplify_geometry(geometry, tolerance):
+
+    # Returns a copy of a (Multi)Polygon with each ring simplified by Douglas-Peucker, removing
+    # vertices that lie within `tolerance` metres of the simplified outline. Rings that would
+    # collapse to fewer than 4 positions are left as they are.
+    polygons = []
+    for rings in iter_polygons(geometry):
+        polygons.append([simplify_ring(ring, tolerance) for ring in rings])
+    return _with_polygons(geometry, polygons)
+
+def simplify_ring(ring, tolerance):
+    coords = np.asarray(ring, dtype=float)
+    if len(coords) <= 4:
+        return [list(point) for point in ring]
+
+    keep = _douglas_peucker(_to_local_metres(coords[:, :2]), tolerance)
+    if keep.sum() < 4:
+        return [list(point) for point in ring]
+    return coords[keep].tolist()
+
+def ring_self_intersects(coords):
+
+    # Tests whether any two non-adjacent edges of a closed ring (an (n, 2) array) cross or touch.
+    # Candidate pairs of edges are found by a sweep over the edges sorted by their minimum x,
+    # pairing each edge only with those whose x extent overlaps it, then tested with NumPy in
+    # chunks of at most INTERSECTION_CHUNK_SIZE pairs.
+    coords = _drop_repeated_points(coords)
+    a = coords[:-1]
+    b = coords[1:]
+    n = len(a)
+    if n < 4:
+        return False
+
+    min_x = np.minimum(a[:, 0], b[:, 0])
+    max_x = np.maximum(a[:, 0], b[:, 0])
+    min_y = np.minimum(a[:, 1], b[:, 1])
+    max_y = np.maximum(a[:, 1], b[:, 1])
+
+    order = np.argsort(min_x, kind='stable')
+    sorted_min_x = min_x[order]
+    ends = np.searchsorted(sorted_min_x, max_x[order], side='right')
+    counts = np.maximum(ends - np.arange(n) - 1, 0)
+    totals = np.cumsum(counts)
+
+    start = 0
+    while start < n:
+        # Take as many edges as fit in one chunk of pairs (at least one)
+        done = totals[start - 1] if start else 0
+        end = max(int(np.searchsorted(totals, done + INTERSECTION_CHUNK_SIZE, side='right')), start + 1)
+        end = min(end, n)
+
+        chunk_counts = counts[start:end]
+        p = np.repeat(np.arange(start, end), chunk_counts)
+        first = np.repeat(np.cumsum(chunk_counts) - chunk_counts, chunk_counts)
+        q = p + 1 + np.arange(len(p)) - first
+        i = order[p]
+        j = order[q]
+
+        # Skip pairs whose y extents don't overlap, and neighbouring edges (including the last
+        # and first edges, which meet at the closing point) which legitimately share an endpoint
+        low = np.minimum(i, j)
+        high = np.maximum(i, j)
+        keep = ((min_y[i] <= max_y[j]) & (min_y[j] <= max_y[i]) &
+                (high - low > 1) & ~((low == 0) & (high == n - 1)))
+        i = i[keep]
+        j = j[keep]
+
+        if len(i) and _segments_intersect(a[i], b[i], a[j], b[j]).any():
+            return True
+        start = end
+    return False
+
+def _segments_intersect(ai, bi, aj, bj):
+    d1 = _cross(bi - ai, aj - ai)
+    d2 = _cross(bi - ai, bj - ai)
+    d3 = _cross(bj - aj, ai - aj)
+    d4 = _cross(bj - aj, bi - aj)
+
+    crossing = (d1 * d2 < 0) & (d3 * d4 < 0)
+    touching = (((d1 == 0) & _within_box(aj, ai, bi)) |
+                ((d2 == 0) & _within_box(bj, ai, bi)) |
+                ((d3 == 0) & _within_box(ai, aj, bj)) |
+                ((d4 == 0) & _within_box(bi, aj, bj)))
+    return crossing | touching
+
+def geometries_intersect(a, b, touching=False):
+
+    # Tests whether two (Multi)Polygons (or Features) overlap; see rings_intersect
+    return rings_intersect(polygon_rings(a), polygon_rings(b), touching)
+
+def polygon_rings(obj):
+
+    # All rings of a (Multi)Polygon or Feature, as a list of (n, 2) arrays
+    geometry = get_geometry(obj)
+    if not geometry:
+        return []
+    rings = (_ring_array(ring) for polygon in iter_polygons(geometry) for ring in polygon)
+    return [ring for ring in rings if ring is not None and len(ring) >= 2]
+
+def rings_intersect(rings_a, rings_b, touching=False):
+
+    # Tests whether the areas bounded by two sets of rings overlap, i.e. their interiors
+    # intersect. Areas which only touch, sharing some edges or vertices but no area (such as
+    # neighbouring fields), do not, unless touching is set.
+    if not rings_a or not rings_b:
+        return False
+
+    a_box = _extent(np.concatenate(rings_a))
+    b_box = _extent(np.concatenate(rings_b))
+    if not _boxes_overlap(a_box, b_box):
+        return False
+    if not touching:
+        return _interiors_intersect(rings_a, rings_b, a_box, b_box)
+
+    # Either some pair of edges crosses or touches, or a part of one lies entirely inside the
+    # other. With no edges crossing, each ring is wholly inside or outside the other area, so
+    # one vertex of every ring is tested: every polygon of a MultiPolygon must be, not just the
+    # first, and a vertex of a hole is on the boundary of its geometry so is as good a test as
+    # any.
+    a0, a1 = _ring_edges(rings_a)
+    b0, b1 = _ring_edges(rings_b)
+
+    # Only edges within the other geometry's bounding box can intersect it
+    in_b = _edges_in_box(a0, a1, b_box)
+    in_a = _edges_in_box(b0, b1, a_box)
+    a0, a1, b0, b1 = a0[in_b], a1[in_b], b0[in_a], b1[in_a]
+
+    for start in range(0, len(a0), INTERSECTION_CHUNK_SIZE // max(len(b0), 1) + 1):
+        end = start + INTERSECTION_CHUNK_SIZE // max(len(b0), 1) + 1
+        if _segments_intersect(a0[start:end, None, :], a1[start:end, None, :], b0[None, :, :], b1[None, :, :]).any():
+            return True
+
+    return bool(points_in_rings(_first_vertices(rings_a), rings_b).any() or points_in_rings(_first_vertices(rings_b), rings_a).any())
+
+def _interiors_intersect(rings_a, rings_b, a_box, b_box):
+
+    # The interiors intersect if a pair of edges properly crosses, or a part of either boundary
+    # lies strictly inside the other area, or the two share a stretch of boundary with both
+    # areas on the same side of it (as identical boundaries do). Each edge is split where the
+    # other boundary touches it; the open pieces between are then either wholly inside, wholly
+    # outside or wholly on the other boundary, so the midpoint of a piece not on it is tested.
+    rings_a = [ring for ring in map(_drop_repeated_points, rings_a) if len(ring) >= 2]
+    rings_b = [ring for ring in map(_drop_repeated_points, rings_b) if len(ring) >= 2]
+    if not rings_a or not rings_b:
+        return False
+    a0, a1 = _ring_edges(rings_a)
+    b0, b1 = _ring_edges(rings_b)
+    a_left = _interior_on_left(rings_a)
+    b_left = _interior_on_left(rings_b)
+
+    # Only edges within the other geometry's bounding box can meet it
+    a_edges = np.flatnonzero(_edges_in_box(a0, a1, b_box))
+    b_edges = np.flatnonzero(_edges_in_box(b0, b1, a_box))
+
+    for p0, p1, q0, q1, p_edges, q_edges, rings_q, shared in ((a0, a1, b0, b1, a_edges, b_edges, rings_b, True),
+                                                              (b0, b1, a0, a1, b_edges, a_edges, rings_a, False)):
+        contacts = _edge_contacts(p0[p_edges], p1[p_edges], q0[q_edges], q1[q_edges])
+        if contacts is None:
+            return True
+        splits, overlaps = contacts
+        overlap_edges = p_edges[overlaps[0]]
+
+        # Stretches shared with the other boundary are found from both sides, so only checked once
+        if shared and len(overlap_edges):
+            other_edges = q_edges[overlaps[3]]
+            same_direction = np.einsum('ij,ij->i', p1[overlap_edges] - p0[overlap_edges], q1[other_edges] - q0[other_edges]) > 0
+            if ((a_left[overlap_edges] == b_left[other_edges]) == same_direction).any():
+                return True
+
+        # Pieces of each edge between its ends and the points the other boundary touches it,
+        # sorted by edge and position along it
+        edges = np.concatenate([p_edges, p_edges, p_edges[splits[0]]])
+        t = np.concatenate([np.zeros(len(p_edges)), np.ones(len(p_edges)), splits[1]])
+        order = np.lexsort((t, edges))
+        edges, t = edges[order], t[order]
+        piece = (edges[1:] == edges[:-1]) & (t[1:] > t[:-1])
+        piece_edges = edges[:-1][piece]
+        t_mid = (t[:-1][piece] + t[1:][piece]) / 2
+
+        # Skip those on the other boundary: the ends of a shared stretch are split points, so a
+        # piece is either within one or clear of it
+        keys = piece_edges * 2.0 + t_mid
+        covered = np.zeros(len(keys) + 1, dtype=np.int64)
+        np.add.at(covered, np.searchsorted(keys, overlap_edges * 2.0 + overlaps[1], side='left'), 1)
+        np.add.at(covered, np.searchsorted(keys, overlap_edges * 2.0 + overlaps[2], side='right'), -1)
+        clear = np.cumsum(covered)[:-1] == 0
+
+        piece_edges, t_mid = piece_edges[clear], t_mid[clear][:, None]
+        midpoints = p0[piece_edges] + t_mid * (p1[piece_edges] - p0[piece_edges])
+        chunk = INTERSECTION_CHUNK_SIZE // len(q0) + 1
+        for start in range(0, len(midpoints), chunk):
+            if points_in_rings(midpoints[start:start + chunk], rings_q).any():
+                return True
+
+    return False
+
+def _edge_contacts(p0, p1, q0, q1):
+
+    # Where the edges q0-q1 meet the edges p0-p1 without properly crossing them. Returns the
+    # (edge, t) positions p0 + t * (p1 - p0) at which an end of a q edge lies on a p edge, and the
+    # (edge, t_start, t_end, q edge) stretches of p edges lying along a q edge; or None if some
+    # pair of edges properly crosses.
+    split_edges, split_t = [], []
+    overlap_edges, overlap_start, overlap_end, overlap_others = [], [], [], []
+
+    step = INTERSECTION_CHUNK_SIZE // max(len(q0), 1) + 1
+    for start in range(0, len(p0), step):
+        i0 = p0[start:start + step, None, :]
+        i1 = p1[start:start + step, None, :]
+        j0 = q0[None, :, :]
+        j1 = q1[None, :, :]
+        d1 = _cross(i1 - i0, j0 - i0)
+        d2 = _cross(i1 - i0, j1 - i0)
+        d3 = _cross(j1 - j0, i0 - j0)
+        d4 = _cross(j1 - j0, i1 - j0)
+        if ((d1 * d2 < 0) & (d3 * d4 < 0)).any():
+            return None
+
+        direction = i1 - i0
+        length = _dot(direction, direction)
+        t0 = _dot(j0 - i0, direction) / length
+        t1 = _dot(j1 - i0, direction) / length
+        on0 = (d1 == 0) & _within_box(j0, i0, i1)
+        on1 = (d2 == 0) & _within_box(j1, i0, i1)
+        for on, t in ((on0, t0), (on1, t1)):
+            i, j = np.nonzero(on)
+            split_edges.append(start + i)
+            split_t.append(t[i, j])
+
+        lo = np.maximum(np.minimum(t0, t1), 0)
+        hi = np.minimum(np.maximum(t0, t1), 1)
+        i, j = np.nonzero((d1 == 0) & (d2 == 0) & (lo < hi))
+        overlap_edges.append(start + i)
+        overlap_start.append(lo[i, j])
+        overlap_end.append(hi[i, j])
+        overlap_others.append(j)
+
+    def joined(parts, dtype):
+        return np.concatenate(parts) if parts else np.empty(0, dtype=dtype)
+
+    splits = (joined(split_edges, np.int64), joined(split_t, np.float64))
+    overlaps = (joined(overlap_edges, np.int64), joined(overlap_start, np.float64),
+                joined(overlap_end, np.float64), joined(overlap_others, np.int64))
+    return splits, overlaps
+
+def _interior_on_left(rings):
+
+    # For each edge of a set of rings, whether the area they bound lies to its left. A ring
+    # bounds area on its enclosed side when it is inside an even number of the others (an outer
+    # ring rather than a hole), and encloses its left side when it runs anticlockwise.
+    enclosed_left = []
+    for r, ring in enumerate(rings):
+        others = rings[:r] + rings[r + 1:]
+        point = (ring[:1] + ring[1:2]) / 2
+        hole = bool(others) and bool(points_in_rings(point, others)[0])
+        enclosed_left.append(np.full(len(ring) - 1, (_signed_area(ring) > 0) != hole))
+    return np.concatenate(enclosed_left)
+
+def points_in_rings(points, rings):
+
+    # Even-odd test of each of an (n, 2) array of points against a set of rings, so points in
+    # holes are outside. Casts a ray in the +x direction and counts the edges it crosses.
+    e0, e1 = _ring_edges(rings)
+    px = points[:, 0, None]
+    py = points[:, 1, None]
+    straddles = (e0[None, :, 1] > py) != (e1[None, :, 1] > py)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        crossing_x = e0[None, :, 0] + (py - e0[None, :, 1]) * (e1[None, :, 0] - e0[None, :, 0]) / (e1[None, :, 1] - e0[None, :, 1])
+    crossings = straddles & (px < crossing_x)
+    return crossings.sum(axis=1) % 2 == 1
+
+def _first_vertices(rings):
+    return np.array([ring[0] for ring in rings], dtype=np.float64)
+
+def _ring_edges(rings):
+    starts = np.concatenate([ring[:-1] for ring in rings])
+    ends = np.concatenate([ring[1:] for ring in rings])
+    return starts, ends
+
+def _extent(coords):
+    return (coords[:, 0].min(), coords[:, 1].min(), coords[:, 0].max(), coords[:, 1].max())
+
+def _boxes_overlap(a, b):
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+def _edges_in_box(e0, e1, box):
+    return ((np.minimum(e0[:, 0], e1[:, 0]) <= box[2]) & (np.maximum(e0[:, 0], e1[:, 0]) >= box[0]) &
+            (np.minimum(e0[:, 1], e1[:, 1]) <= box[3]) & (np.maximum(e0[:, 1], e1[:, 1]) >= box[1]))
+
+def _ring_array(ring):
+    try:
+        coords = np.asarray(ring, dtype=float)
+    except (TypeError, ValueError):
+        return None
+    if coords.ndim != 2 or coords.shape[1] < 2:
+        return None
+    return coords[:, :2]
+
+def _with_polygons(geometry, polygons):
+    if geometry['type'] == 'Polygon':
+        return dict(geometry, coordinates=polygons[0])
+    return dict(geometry, coordinates=polygons)
+
+def _signed_area(coords):
+
+    # Shoelace formula over an (n, 2) array; positive for counter-clockwise rings
+    x = coords[:, 0]
+    y = coords[:, 1]
+    return (np.dot(x, np.roll(y, -1)) - np.dot(np.roll(x, -1), y)) / 2.0
+
+def _cross(u, v):
+    return u[..., 0] * v[..., 1] - u[..., 1] * v[..., 0]
+
+def _dot(u, v):
+    return u[..., 0] * v[..., 0] + u[..., 1] * v[..., 1]
+
+def _within_box(p, a, b):
+    return ((np.minimum(a[..., 0], b[..., 0]) <= p[..., 0]) & (p[..., 0] <= np.maximum(a[..., 0], b[..., 0])) &
+            (np.minimum(a[..., 1], b[..., 1]) <= p[..., 1]) & (p[..., 1] <= np.maximum(a[..., 1], b[..., 1])))
+
+def _drop_repeated_points(coords):
+    if len(coords) < 2:
+        return coords
+    keep = np.ones(len(coords), dtype=bool)
+    keep[1:] = (coords[1:] != coords[:-1]).any(axis=1)
+    return coords[keep]
+
+def _to_local_metres(coords):
+
+    # Equirectangular projection centred on the ring, accurate enough for distances of the
+    # order of a field's size
+    lat0 = np.radians(coords[:, 1].mean())
+    x = np.radians(coords[:, 0]) * EARTH_RADIUS * np.cos(lat0)
+    y = np.radians(coords[:, 1]) * EARTH_RADIUS
+    return np.column_stack((x, y))
+
+def _douglas_peucker(points, tolerance):
+
+    # Returns a mask of the points to keep. Uses an explicit stack rather than recursion; the
+    # distances of each span's points to its chord are computed in one vectorized step.
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end <= start + 1:
+            continue
+
+        chord = points[end] - points[start]
+        offsets = points[start + 1:end] - points[start]
+        length = np.hypot(chord[0], chord[1])
+        if length == 0:
+            # A closed ring's first chord has zero length: use the distance from its start
+            distances = np.hypot(offsets[:, 0], offsets[:, 1])
+        else:
+            distances = np.abs(_cross(chord, offsets)) / length
+
+        k = int(np.argmax(distances))
+        if distances[k] > tolerance:
+            middle = start + 1 + k
+            keep[middle] = True
+            stack.append((start, middle))
+            stack.append((middle, end))
+    return keep
+
+def measure_geometries(geometries):
+
+    # Computes, for a batch of (Multi)Polygons (or Features), the same measurements the API
+    # reports for a boundary, in one vectorized pass over all of their coordinates:
+    #   area       geodesic area in m2 on the WGS84 ellipsoid, holes excluded
+    #   perimeter  geodesic length in m of all rings, holes included
+    #   centroid   (lon, lat) centroid computed in longitude/latitude, as the API does
+    #   bbox       (min lon, min lat, max lon, max lat)
+    # Returns a dict of NumPy arrays with one row per input; rows for inputs without a polygon
+    # are NaN. Area is the spherical excess on the authalic sphere, which has the ellipsoid's
+    # area; edge lengths use the ellipsoid's radii of curvature at each edge's mid-latitude,
+    # which is exact to well under a millimetre for field-sized edges.
+    coords, ring_geometry, ring_sign, ring_sizes = _flatten_rings(geometries)
+    count = len(geometries)
+
+    results = {
+        'area': np.full(count, np.nan),
+        'perimeter': np.full(count, np.nan),
+        'centroid': np.full((count, 2), np.nan),
+        'bbox': np.full((count, 4), np.nan),
+    }
+    if not len(coords):
+        return results
+
+    # Edges run from each position to the next one in the same ring
+    ring_of_position = np.repeat(np.arange(len(ring_sizes)), ring_sizes)
+    ring_ends = np.cumsum(ring_sizes) - 1
+    starts = np.setdiff1d(np.arange(len(coords)), ring_ends, assume_unique=True)
+    ends = starts + 1
+    edge_ring = ring_of_position[starts]
+    rings = len(ring_sizes)
+
+    x0, y0 = coords[starts, 0], coords[starts, 1]
+    x1, y1 = coords[ends, 0], coords[ends, 1]
+    lam0, lam1 = np.radians(x0), np.radians(x1)
+    phi0, phi1 = np.radians(y0), np.radians(y1)
+
+    # Geodesic area: spherical excess of each edge on the authalic sphere
+    beta0 = np.tan(_authalic_latitude(phi0) / 2)
+    beta1 = np.tan(_authalic_latitude(phi1) / 2)
+    excess = 2 * np.arctan(np.tan((lam1 - lam0) / 2) * (beta0 + beta1) / (1 + beta0 * beta1))
+    ring_area = np.abs(np.bincount(edge_ring, excess, rings)) * _authalic_radius() ** 2
+
+    # Geodesic length of each edge from the meridional (M) and prime vertical (N) radii of
+    # curvature at its mid-latitude
+    mid = (phi0 + phi1) / 2
+    w = np.sqrt(1 - WGS84_E2 * np.sin(mid) ** 2)
+    m = WGS84_A * (1 - WGS84_E2) / w ** 3
+    n = WGS84_A / w
+    lengths = np.hypot(m * (phi1 - phi0), n * np.cos(mid) * (lam1 - lam0))
+    ring_length = np.bincount(edge_ring, lengths, rings)
+
+    # Planar centroid of each ring (shoelace), weighted by area with holes subtracted
+    cross = x0 * y1 - x1 * y0
+    planar = np.bincount(edge_ring, cross, rings) / 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ring_cx = np.bincount(edge_ring, (x0 + x1) * cross, rings) / (6 * planar)
+        ring_cy = np.bincount(edge_ring, (y0 + y1) * cross, rings) / (6 * planar)
+    weight = np.abs(planar) * ring_sign
+    weight_sum = np.bincount(ring_geometry, weight, count)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cx = np.bincount(ring_geometry, np.nan_to_num(ring_cx) * weight, count) / weight_sum
+        cy = np.bincount(ring_geometry, np.nan_to_num(ring_cy) * weight, count) / weight_sum
+
+    measured = np.unique(ring_geometry)
+    results['area'][measured] = np.bincount(ring_geometry, ring_area * ring_sign, count)[measured]
+    results['perimeter'][measured] = np.bincount(ring_geometry, ring_length, count)[measured]
+    results['centroid'][measured] = np.column_stack((cx, cy))[measured]
+
+    # Positions are grouped by geometry, so each geometry's extent is one reduceat segment
+    geometry_of_position = ring_geometry[ring_of_position]
+    offsets = np.searchsorted(geometry_of_position, measured)
+    results['bbox'][measured] = np.column_stack((np.minimum.reduceat(coords[:, 0], offsets),
+                                                 np.minimum.reduceat(coords[:, 1], offsets),
+                                                 np.maximum.reduceat(coords[:, 0], offsets),
+                                                 np.maximum.reduceat(coords[:, 1], offsets)))
+    return results
+
+def measure_geometry(obj):
+
+    # Measurements of a single (Multi)Polygon or Feature, in the form of the API's boundary
+    # properties
+    measured = measure_geometries([obj])
+    return {
+        'centroid': measured['centroid'][0].tolist(),
+        'area': {'value': float(measured['area'][0]), 'unit': 'm2'},
+        'perimeter': {'value': float(measured['perimeter'][0]), 'unit': 'm'},
+        'bbox': measured['bbox'][0].tolist(),
+    }
+
+def _flatten_rings(geometries):
+
+    # Concatenates the rings of every polygon into one (n, 2) array, returning it with the
+    # input index of each ring, +1/-1 for exterior rings/holes, and the size of each ring
+    arrays = []
+    ring_geometry = []
+    ring_sign = []
+    for index, obj in enumerate(geometries):
+        geometry = get_geometry(obj) if obj else None
+        if not geometry:
+            continue
+        for rings in iter_polygons(geometry):
+            for r, ring in enumerate(rings):
+                coords = _ring_array(ring)
+                if coords is None or len(coords) < 2:
+                    continue
+                arrays.append(coords)
+                ring_geometry.append(index)
+                ring_sign.append(1.0 if r == 0 else -1.0)
+
+    if not arrays:
+        return np.empty((0, 2)), np.empty(0, dtype=int), np.empty(0), np.empty(0, dtype=int)
+    return (np.concatenate(arrays), np.array(ring_geometry), np.array(ring_sign),
+            np.array([len(a) for a in arrays]))
+
+def _authalic_latitude(phi):
+    return np.arcsin(_authalic_q(phi) / _authalic_q(np.pi / 2))
+
+def _authalic_radius():
+    return WGS84_A * np.sqrt(_authalic_q(np.pi / 2) / 2)
+
+def _authalic_q(phi):
+    e = np.sqrt(WGS84_E2)
+    sin_phi = np.sin(phi)
+    return (1 - WGS84_E2) * (sin_phi / (1 - WGS84_E2 * sin_phi ** 2) -
+                             np.log((1 - e * sin_phi) / (1 + e * sin_phi)) / (2 * e))
@@ -0,0 +1,104 @@
+import re
+
+from urllib.parse import quote
+
+# Reading and batching lists of Global FieldIDs and Global BoundaryIDs.
+#
+# ID lists are comma and/or whitespace separated. They are read a chunk at a time, so even a list
+# on a single line of many megabytes is never held in memory as one string, and each ID is
+# validated, normalised (GFIDs upper case, UUIDs lower case) and de-duplicated as it is read.
+
+GFID_PATTERN = re.compile(r'^[0-9A-Z]{4}\.[0-9A-Z]{4}$')
+UUID_PATTERN = re.compile(r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$')
+
+# Pattern and normalisation of each ID format
+ID_FORMATS = {
+    'gfid': (GFID_PATTERN, str.upper),
+    'uuid': (UUID_PATTERN, str.lower),
+}
+
+SEPARATORS = re.compile(r'[\s,]+')
+
+READ_SIZE = 65536
+
+# Number of invalid IDs kept as examples for reporting
+MAX_INVALID_EXAMPLES = 10
+
+class IDReader(object):
+
+    # Yields the valid, distinct IDs of a stream of tokens in input order, counting what was
+    # dropped:
+    #   reader = IDReader('gfid')
+    #   gfids = list(reader.read(file_tokens('local/fieldid-list.txt')))
+    #   reader.count, reader.duplicates, reader.invalid_count, reader.invalid (first few)
+
+    def __init__(self, format='gfid'):
+        if format not in ID_FORMATS:
+            raise ValueError("ID format "+format+" should be one of "+", ".join(ID_FORMATS))
+        self.pattern, self.normalise = ID_FORMATS[format]
+        self.format = format
+        self.count = 0
+        self.duplicates = 0
+        self.invalid_count = 0
+        self.invalid = []
+        self._seen = set()
+
+    def read(self, tokens):
+        for token in tokens:
+            value = self.normalise(token)
+            if not self.pattern.match(value):
+                self.invalid_count += 1
+                if len(self.invalid) < MAX_INVALID_EXAMPLES:
+                    self.invalid.append(token)
+                continue
+            if value in self._seen:
+                self.duplicates += 1
+                continue
+            self._seen.add(value)
+            self.count += 1
+            yield value
+
+    def summary(self):
+        return "{} distinct {}s, {} duplicates and {} invalid skipped{}".format(
+            self.count, self.format.upper(), self.duplicates, self.invalid_count,
+            " (e.g. {})".format(", ".join(self.invalid)) if self.invalid else "")
+
+def file_tokens(file_path):
+
+    # Yields the tokens of a comma and/or whitespace separated file, reading it a chunk at a time
+    with open(file_path, 'r') as f:
+        partial = ''
+        while True:
+            chunk = f.read(READ_SIZE)
+            if not chunk:
+                break
+            tokens = SEPARATORS.split(partial + chunk)
+            # The last token may continue in the next chunk
+            partial = tokens.pop()
+            for token in tokens:
+                if token:
+                    yield token
+        if partial:
+            yield partial
+
+def string_tokens(text):
+    return (token for token in SEPARATORS.split(text) if token)
+
+def batch_ids(ids, max_length, max_count=None):
+
+    # Groups IDs into tuples whose comma-separated, URL-encoded form is at most max_length
+    # characters (and which hold at most max_count IDs), for filters passed in a query string. An
+    # ID too long to fit on its own gets a batch of its own.
+    separator = len(quote(','))
+    batch = []
+    length = 0
+    for value in ids:
+        size = len(quote(value, safe=''))
+        if batch and (length + separator + size > max_length or (max_count and len(batch) >= max_count)):
+            yield tuple(batch)
+            batch = []
+            length = 0
+        length += size + (separator if batch else 0)
+        batch.append(value)
+    if batch:
+        yield tuple(batch)
@@ -0,0 +1,69 @@
+import json
+import os
+import threading
+
+class Journal(object):
+
+    # Append-only checkpoint file for bulk jobs: one JSON object per line, recording a key (an
+    # input ID or feature index) and any data worth keeping about the completed item, e.g.
+    #   {"key": "17", "status": "success", "id": "<boundary id>"}
+    # Each record is flushed to disk as it is written, so after a crash or interruption a job
+    # opened with resume=True can skip every item already recorded. Without resume, an existing
+    # journal with records in it is only discarded with overwrite=True; otherwise opening it
+    # raises ValueError, as rerunning a job from scratch by mistake could, for example,
+    # register every boundary a second time.
+
+    def __init__(self, path, resume=False, overwrite=False):
+        self.path = path
+        self._lock = threading.Lock()
+        self._records = {}
+
+        if not resume and not overwrite and os.path.exists(path) and os.path.getsize(path) > 0:
+            raise ValueError("Journal {} already has records; resume from it or overwrite it".format(path))
+
+        if resume and os.path.exists(path):
+            with open(path, 'r') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A line cut short by a crash mid-write; the item will simply be redone
+                        continue
+                    self._records[str(record['key'])] = record
+
+        self._fh = open(path, 'a' if resume else 'w')
+
+    def done(self, key):
+        return str(key) in self._records
+
+    def get(self, key):
+        return self._records.get(str(key))
+
+    def records(self):
+        return list(self._records.values())
+
+    def count(self):
+        return len(self._records)
+
+    def record(self, key, **data):
+        self.record_many([dict(data, key=key)])
+
+    def record_many(self, records):
+
+        # Records a batch of {'key': ..., ...} dicts with a single flush
+        with self._lock:
+            for record in records:
+                record = dict(record, key=str(record['key']))
+                self._records[record['key']] = record
+                self._fh.write(json.dumps(record, separators=(',', ':'))+'\n')
+            self._fh.flush()
+            os.fsync(self._fh.fileno())
+
+    def close(self):
+        self._fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
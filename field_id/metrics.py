@@ -0,0 +1,261 @@
+import bisect
+import collections
+import json
+import logging
+import threading
+import time
+
+# Instrumentation for the API clients. Each client has a Hooks registry, to which any number of
+# functions can be added per event; each is called with a dict describing the event:
+#
+#   request   {'method', 'url', 'endpoint', 'attempt'}, before each attempt is sent
+#   response  {'method', 'url', 'endpoint', 'attempt', 'status_code', 'elapsed', 'bytes_sent', 'bytes_received'}
+#   error     {'method', 'url', 'endpoint', 'attempt', 'elapsed', 'error'}, when an attempt raises
+#   retry     {'method', 'url', 'endpoint', 'attempt', 'delay'}, before sleeping between attempts
+#   token     {'url', 'elapsed', 'status_code'}, after each access token request
+#   cache     {'url', 'result'}, result being 'hit', 'revalidated' or 'miss'
+#
+# Endpoints are URL paths relative to the API base URL with resource IDs replaced by {id}, e.g.
+# "boundaries/{id}". Every client records its own ClientMetrics through these hooks, along with
+# the counters of its rate limiter and concurrency controller (see ClientMetrics.track).
+
+logger = logging.getLogger(__name__)
+
+EVENTS = ('request', 'response', 'error', 'retry', 'token', 'cache')
+
+# Upper bounds, in seconds, of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class Hooks(object):
+
+    def __init__(self):
+        self._hooks = {event: [] for event in EVENTS}
+
+    def add(self, event, fn):
+        if event not in self._hooks:
+            raise ValueError("Unknown hook event "+event+"; should be one of "+", ".join(EVENTS))
+        self._hooks[event].append(fn)
+
+    def remove(self, event, fn):
+        self._hooks[event].remove(fn)
+
+    def emit(self, event, **info):
+        for fn in self._hooks[event]:
+            fn(info)
+
+class Histogram(object):
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+
+        # Estimated by linear interpolation within the bucket holding the q-th observation
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[i - 1] if i else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean': self.sum / self.count if self.count else None,
+            'p50': self.quantile(0.5),
+            'p90': self.quantile(0.9),
+            'p99': self.quantile(0.99),
+        }
+
+class ClientMetrics(object):
+
+    # Aggregates the events of one client: latency histograms, status codes and retries per
+    # endpoint, bytes sent and received, errors, cache results and token requests
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.latency = collections.defaultdict(Histogram)
+        self.overall = Histogram()
+        self.status_codes = collections.defaultdict(collections.Counter)
+        self.retries = collections.Counter()
+        self.errors = collections.Counter()
+        self.cache = collections.Counter()
+        self.token = Histogram()
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.tracked = {}
+
+    def track(self, name, stats):
+
+        # Includes the dict returned by stats() under `name` in every summary, e.g. the current
+        # limits and counters of a component adapting to the API
+        self.tracked[name] = stats
+
+    def attach(self, hooks):
+        hooks.add('response', self.on_response)
+        hooks.add('error', self.on_error)
+        hooks.add('retry', self.on_retry)
+        hooks.add('token', self.on_token)
+        hooks.add('cache', self.on_cache)
+
+    def on_response(self, event):
+        with self._lock:
+            self.latency[event['endpoint']].observe(event['elapsed'])
+            self.overall.observe(event['elapsed'])
+            self.status_codes[event['endpoint']][event['status_code']] += 1
+            self.bytes_sent += event['bytes_sent']
+            self.bytes_received += event['bytes_received']
+
+    def on_error(self, event):
+        with self._lock:
+            self.latency[event['endpoint']].observe(event['elapsed'])
+            self.overall.observe(event['elapsed'])
+            self.errors[type(event['error']).__name__] += 1
+
+    def on_retry(self, event):
+        with self._lock:
+            self.retries[event['endpoint']] += 1
+
+    def on_token(self, event):
+        with self._lock:
+            self.token.observe(event['elapsed'])
+
+    def on_cache(self, event):
+        with self._lock:
+            self.cache[event['result']] += 1
+
+    def summary(self):
+
+        # Totals for the run so far. 'request_time' is the time spent waiting on the API summed
+        # over all requests; compared with 'elapsed' (wall-clock time since the client was
+        # created) it shows how much of a run is spent elsewhere, e.g. decoding or writing output.
+        tracked = {name: stats() for name, stats in self.tracked.items()}
+        with self._lock:
+            return dict(tracked, **{
+                'elapsed': time.time() - self.started,
+                'requests': self.overall.count,
+                'request_time': self.overall.sum,
+                'latency': self.overall.summary(),
+                'bytes_sent': self.bytes_sent,
+                'bytes_received': self.bytes_received,
+                'endpoints': {
+                    endpoint: dict(histogram.summary(),
+                                   status_codes={str(code): n for code, n in sorted(self.status_codes[endpoint].items())},
+                                   retries=self.retries[endpoint])
+                    for endpoint, histogram in sorted(self.latency.items())
+                },
+                'errors': dict(self.errors),
+                'cache': dict(self.cache),
+                'token': self.token.summary(),
+            })
+
+    def describe(self):
+
+        # One-line summary for the end of a script run
+        summary = self.summary()
+        statuses = collections.Counter()
+        for endpoint in summary['endpoints'].values():
+            statuses.update(endpoint['status_codes'])
+        return "{} requests in {:.1f}s ({:.1f}s waiting on the API), {} bytes sent, {} received, status codes {}, {} retries, {} errors, cache {}".format(
+            summary['requests'], summary['elapsed'], summary['request_time'], summary['bytes_sent'], summary['bytes_received'],
+            dict(statuses), sum(e['retries'] for e in summary['endpoints'].values()), sum(summary['errors'].values()), summary['cache']) + "".join(
+            ", {} {}".format(name, summary[name]) for name in self.tracked)
+
+    def to_json(self):
+        return json.dumps(self.summary(), indent=2)
+
+    def to_prometheus(self, prefix='field_id'):
+
+        # Prometheus text exposition format
+        lines = []
+        for name, stats in self.tracked.items():
+            lines.extend(_gauge_lines('{}_{}'.format(prefix, name), stats()))
+        with self._lock:
+            lines.append('# TYPE {}_request_duration_seconds histogram'.format(prefix))
+            for endpoint, histogram in sorted(self.latency.items()):
+                labels = 'endpoint="{}"'.format(endpoint)
+                lines.extend(_histogram_lines(prefix + '_request_duration_seconds', labels, histogram))
+
+            lines.append('# TYPE {}_responses_total counter'.format(prefix))
+            for endpoint, codes in sorted(self.status_codes.items()):
+                for code, n in sorted(codes.items()):
+                    lines.append('{}_responses_total{{endpoint="{}",code="{}"}} {}'.format(prefix, endpoint, code, n))
+
+            lines.append('# TYPE {}_retries_total counter'.format(prefix))
+            for endpoint, n in sorted(self.retries.items()):
+                lines.append('{}_retries_total{{endpoint="{}"}} {}'.format(prefix, endpoint, n))
+
+            lines.append('# TYPE {}_errors_total counter'.format(prefix))
+            for error, n in sorted(self.errors.items()):
+                lines.append('{}_errors_total{{error="{}"}} {}'.format(prefix, error, n))
+
+            lines.append('# TYPE {}_cache_total counter'.format(prefix))
+            for result, n in sorted(self.cache.items()):
+                lines.append('{}_cache_total{{result="{}"}} {}'.format(prefix, result, n))
+
+            lines.append('# TYPE {}_bytes_sent_total counter'.format(prefix))
+            lines.append('{}_bytes_sent_total {}'.format(prefix, self.bytes_sent))
+            lines.append('# TYPE {}_bytes_received_total counter'.format(prefix))
+            lines.append('{}_bytes_received_total {}'.format(prefix, self.bytes_received))
+
+            lines.append('# TYPE {}_token_duration_seconds histogram'.format(prefix))
+            lines.extend(_histogram_lines(prefix + '_token_duration_seconds', '', self.token))
+
+        return '\n'.join(lines) + '\n'
+
+    def report(self, file_path=None):
+
+        # Logs the one-line summary and, given a path, writes the full metrics there
+        logger.info("Request metrics: %s", self.describe())
+        if file_path:
+            self.write(file_path)
+
+    def write(self, file_path):
+
+        # Prometheus text for paths ending .prom, otherwise JSON
+        with open(file_path, 'w') as f:
+            f.write(self.to_prometheus() if file_path.endswith('.prom') else self.to_json())
+
+def endpoint_name(base_url, url):
+    path = url[len(base_url):] if url.startswith(base_url) else url
+    parts = path.split('?')[0].strip('/').split('/')
+    return '/'.join(parts[:1] + ['{id}'] * (len(parts) > 1))
+
+def _gauge_lines(name, stats):
+
+    # One gauge per number in stats; a dict of numbers becomes one gauge labelled by its keys
+    lines = []
+    for key, value in sorted(stats.items()):
+        if isinstance(value, dict):
+            lines.append('# TYPE {}_{} gauge'.format(name, key))
+            lines.extend('{}_{}{{type="{}"}} {}'.format(name, key, k, v) for k, v in sorted(value.items()))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            lines.append('# TYPE {}_{} gauge'.format(name, key))
+            lines.append('{}_{} {}'.format(name, key, value))
+    return lines
+
+def _histogram_lines(name, labels, histogram):
+    lines = []
+    cumulative = 0
+    for bound, count in zip(list(histogram.buckets) + ['+Inf'], histogram.counts):
+        cumulative += count
+        le = 'le="{}"'.format(bound)
+        lines.append('{}_bucket{{{}}} {}'.format(name, ','.join(filter(None, [labels, le])), cumulative))
+    suffix = '{' + labels + '}' if labels else ''
+    lines.append('{}_sum{} {}'.format(name, suffix, histogram.sum))
+    lines.append('{}_count{} {}'.format(name, suffix, histogram.count))
+    return lines
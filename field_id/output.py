@@ -0,0 +1,160 @@
+import gzip
+import json
+import sys
+
+from field_id.fast_json import RawJSON, dumps
+
+# Streaming writers for script output. Each item is encoded and written as soon as it is passed
+# to write(), so output uses constant memory and an interrupted run still leaves the items
+# written so far (closing the writer completes the enclosing document).
+#
+# Formats:
+#   geojson     a GeoJSON FeatureCollection
+#   json        a JSON array of items
+#   ndjson      newline-delimited JSON, one item per line
+#   geojsonseq  GeoJSON text sequence (RFC 8142): as ndjson, with each record prefixed by RS
+#
+# Boundary features can also be written in a columnar format (see field_id.columnar, which
+# requires pyarrow):
+#   parquet     GeoParquet, with WKB geometry
+#   arrow       Arrow IPC file, with WKB geometry
+#
+# Compact output is encoded with field_id.fast_json (orjson when installed). Items passed as
+# RawJSON, e.g. boundaries streamed from the API, are copied to text formats as received.
+
+FORMATS = ['geojson', 'json', 'ndjson', 'geojsonseq']
+
+COLUMNAR_FORMATS = ['parquet', 'arrow']
+
+# Formats available to scripts writing boundary features
+FEATURE_FORMATS = FORMATS + COLUMNAR_FORMATS
+
+# Formats whose files remain valid when appended to, e.g. when resuming a job
+APPENDABLE_FORMATS = ['ndjson', 'geojsonseq']
+
+RECORD_SEPARATOR = '\x1e'
+
+def open_output(file_path=None, compress=None, append=False):
+
+    # Opens a text stream for writing; STDOUT when no path is given. Output is gzip-compressed
+    # when compress is set or, by default, when the path ends with .gz. With append, output is
+    # added to the end of an existing file (only meaningful for the ndjson/geojsonseq formats).
+    # Files are UTF-8, as JSON requires; non-ASCII text may be written unescaped.
+    mode = 'at' if append else 'wt'
+    if compress is None:
+        compress = bool(file_path) and file_path.endswith('.gz')
+
+    if not file_path:
+        if compress:
+            return gzip.open(sys.stdout.buffer, 'wt', encoding='utf-8')
+        return _Unclosable(sys.stdout)
+
+    if compress:
+        return gzip.open(file_path, mode, encoding='utf-8')
+    return open(file_path, mode, encoding='utf-8')
+
+def open_writer(file_path=None, format='geojson', indent=None, compress=None, append=False):
+
+    # Opens the output and creates a writer for it in one go, for text or columnar formats
+    if format in COLUMNAR_FORMATS:
+        if not file_path:
+            raise ValueError("The "+format+" format can only be written to a file")
+        if compress or append:
+            raise ValueError("The "+format+" format is compressed internally and cannot be gzipped or appended to")
+        try:
+            from field_id.columnar import ColumnarWriter
+        except ImportError as e:
+            raise ImportError("The "+format+" format requires pyarrow: pip install pyarrow") from e
+        return ColumnarWriter(file_path, format)
+
+    return create_writer(open_output(file_path, compress, append), format, indent)
+
+def create_writer(fh, format='geojson', indent=None):
+    if format == 'geojson':
+        return ArrayWriter(fh, indent=indent, header='{"type":"FeatureCollection","features":[', footer=']}')
+    elif format == 'json':
+        return ArrayWriter(fh, indent=indent)
+    elif format == 'ndjson':
+        return SequenceWriter(fh)
+    elif format == 'geojsonseq':
+        return SequenceWriter(fh, prefix=RECORD_SEPARATOR)
+    raise ValueError("Output format "+format+" should be one of "+", ".join(FORMATS))
+
+class ArrayWriter(object):
+
+    def __init__(self, fh, indent=None, header='[', footer=']'):
+        self.fh = fh
+        self.indent = indent
+        self.footer = footer
+        self.count = 0
+        self.fh.write(header)
+
+    def write(self, item):
+        if self.count:
+            self.fh.write(',')
+        if self.indent:
+            self.fh.write('\n')
+            self.fh.write(json.dumps(_value(item), indent=self.indent))
+        else:
+            self.fh.write(_encode(item))
+        self.count += 1
+
+    def flush(self):
+        self.fh.flush()
+
+    def close(self):
+        if self.indent and self.count:
+            self.fh.write('\n')
+        self.fh.write(self.footer+'\n')
+        self.fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class SequenceWriter(object):
+
+    def __init__(self, fh, prefix=''):
+        self.fh = fh
+        self.prefix = prefix
+        self.count = 0
+
+    def write(self, item):
+        self.fh.write(self.prefix+_encode(item)+'\n')
+        self.count += 1
+
+    def flush(self):
+        self.fh.flush()
+
+    def close(self):
+        self.fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def _encode(item):
+    return item.text() if isinstance(item, RawJSON) else dumps(item)
+
+def _value(item):
+    return item.value if isinstance(item, RawJSON) else item
+
+class _Unclosable(object):
+
+    # Wraps STDOUT so that closing a writer flushes it rather than closing it
+
+    def __init__(self, fh):
+        self.fh = fh
+
+    def write(self, s):
+        return self.fh.write(s)
+
+    def flush(self):
+        self.fh.flush()
+
+    def close(self):
+        self.fh.flush()
@@ -0,0 +1,314 @@
+import asyncio
+import collections
+import datetime
+import email.utils
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+class RateLimiter(object):
+
+    # Spaces calls evenly so that no more than `rate` calls start per second, across all threads.
+    # A rate of None or 0 disables limiting.
+
+    def __init__(self, rate=None):
+        self.rate = rate
+        self._lock = threading.Lock()
+        self._next_slot = time.monotonic()
+
+    def acquire(self):
+        if not self.rate:
+            return
+
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next_slot, now)
+            self._next_slot = slot + 1.0 / self.rate
+
+        if slot > now:
+            time.sleep(slot - now)
+
+    def feedback(self, status_code, headers):
+
+        # A fixed rate ignores the API's responses; see AdaptiveRateLimiter
+        pass
+
+class AsyncRateLimiter(object):
+
+    # asyncio equivalent of RateLimiter, for use within a single event loop
+
+    def __init__(self, rate=None):
+        self.rate = rate
+        self._next_slot = time.monotonic()
+
+    async def acquire(self):
+        if not self.rate:
+            return
+
+        now = time.monotonic()
+        slot = max(self._next_slot, now)
+        self._next_slot = slot + 1.0 / self.rate
+
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+# Adaptive flow control, used by APIClient when APIConfiguration.adaptive is set. Both are shared
+# by every request the client makes, whatever the endpoint:
+#
+# - AdaptiveRateLimiter is a token bucket whose rate halves on each 429 response (holding back
+#   every request until any Retry-After has passed), follows the RateLimit-Remaining/-Reset
+#   headers when the API sends them, and otherwise creeps back up by RATE_INCREASE requests per
+#   second each second.
+# - ConcurrencyController bounds the number of requests in flight (AIMD). Its limit grows by one
+#   per successful response until the first sign of congestion (slow start), then by one per round
+#   trip, halves on 429/503 responses, timeouts and connection errors, and shrinks by a tenth when
+#   an endpoint's latency rises well above the best seen for it.
+#
+# Each is reduced at most once per round trip, as the other responses to requests sent before a
+# reduction say nothing about the new limit.
+
+DECREASE_FACTOR = 0.5
+LATENCY_DECREASE_FACTOR = 0.9
+
+# Latency above LATENCY_TOLERANCE times the best seen for an endpoint, plus LATENCY_SLACK seconds,
+# counts as congestion. The best latency drifts towards recent ones by BASELINE_DRIFT per response.
+LATENCY_TOLERANCE = 2.0
+LATENCY_SLACK = 0.05
+BASELINE_DRIFT = 0.01
+
+# Requests per second added to the rate each second without a 429, and the lowest rate
+RATE_INCREASE = 5.0
+MIN_RATE = 0.5
+
+# Seconds over which the rate of requests sent is measured, and the longest pause on Retry-After
+RATE_WINDOW = 2.0
+MAX_PAUSE = 300
+
+class AdaptiveRateLimiter(object):
+
+    # Token bucket of up to one second of requests. Starts at `rate`, or unlimited until the
+    # first 429 when None; never exceeds max_rate.
+
+    def __init__(self, rate=None, max_rate=None):
+        self.rate = rate
+        self.max_rate = max_rate
+        self._lock = threading.Lock()
+        self._tokens = 1.0
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._sent = collections.deque()
+
+        self.requests = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.throttled = 0
+        self.decreases = 0
+        self.header_limits = 0
+
+    def acquire(self):
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                delay = self._take(now)
+                if delay <= 0:
+                    self._sent.append(now)
+                    self.requests += 1
+                    if waited:
+                        self.waits += 1
+                        self.wait_time += waited
+                    return
+            time.sleep(delay)
+            waited += delay
+
+    def _take(self, now):
+
+        # Seconds to wait before a request may be sent, or 0 having taken a token for it
+        if self.rate:
+            self._tokens = min(max(self.rate, 1.0), self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if now < self._paused_until:
+            return self._paused_until - now
+        if not self.rate:
+            return 0
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0
+        return (1 - self._tokens) / self.rate
+
+    def feedback(self, status_code, headers):
+        with self._lock:
+            now = time.monotonic()
+            if status_code == 429:
+                self.throttled += 1
+                delay = parse_retry_after(headers.get('Retry-After'), MAX_PAUSE)
+                if delay:
+                    self._paused_until = max(self._paused_until, now + delay)
+                if now - self._last_decrease >= RATE_WINDOW / 2:
+                    self._set_rate(max((self.rate or self._sent_rate(now)) * DECREASE_FACTOR, MIN_RATE), now)
+                    logger.info("Reducing request rate to %.1f/s after a 429 response", self.rate)
+                return
+
+            remaining, reset = _rate_limit_headers(headers)
+            if remaining is not None and reset is not None:
+                if remaining <= 0:
+                    self._paused_until = max(self._paused_until, now + min(reset, MAX_PAUSE))
+                    return
+                allowed = max(remaining / max(reset, 0.001), MIN_RATE)
+                if not self.rate or allowed < self.rate:
+                    self.header_limits += 1
+                    self.rate = allowed
+                    return
+
+            # Sending at the current rate for 1/rate seconds earns RATE_INCREASE/rate more; the
+            # rate never runs far ahead of the requests actually being sent
+            if self.rate:
+                ceiling = self.max_rate or max(2 * self._sent_rate(now), MIN_RATE)
+                self.rate = min(self.rate + RATE_INCREASE / self.rate, max(ceiling, self.rate))
+
+    def _set_rate(self, rate, now):
+        self.rate = rate
+        self._tokens = min(self._tokens, 1.0)
+        self._last_decrease = now
+        self.decreases += 1
+
+    def _sent_rate(self, now):
+        while self._sent and self._sent[0] < now - RATE_WINDOW:
+            self._sent.popleft()
+        return max(len(self._sent) / RATE_WINDOW, MIN_RATE)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'rate': self.rate,
+                'requests': self.requests,
+                'waits': self.waits,
+                'wait_time': self.wait_time,
+                'throttled': self.throttled,
+                'decreases': self.decreases,
+                'header_limits': self.header_limits,
+            }
+
+class ConcurrencyController(object):
+
+    # Bounds the requests in flight across all threads. With max_limit the limit adapts between
+    # min_limit and max_limit, starting from `limit`; without, `limit` is fixed (None for no
+    # limit) and only the counts are kept.
+
+    def __init__(self, limit=None, max_limit=None, min_limit=1):
+        self.adaptive = max_limit is not None
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = limit
+        if self.adaptive:
+            self.limit = float(min(max(limit or min_limit, min_limit), max_limit))
+
+        self._cond = threading.Condition()
+        self._slow_start = True
+        self._last_decrease = 0.0
+        self._baseline = {}
+
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.decreases = 0
+        self.signals = collections.Counter()
+
+    def acquire(self):
+        with self._cond:
+            if self.limit and self.in_flight >= int(self.limit):
+                start = time.monotonic()
+                self.waits += 1
+                while self.in_flight >= int(self.limit):
+                    self._cond.wait()
+                self.wait_time += time.monotonic() - start
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def release(self, endpoint=None, elapsed=None, status_code=None, error=None):
+
+        # Called once per acquire(), with the outcome of the request: its latency and status code,
+        # or the error it raised. Without an elapsed time the outcome is not taken into account.
+        with self._cond:
+            self.in_flight -= 1
+            if self.adaptive and elapsed is not None:
+                self._adapt(endpoint, elapsed, status_code, error)
+            self._cond.notify_all()
+
+    def _adapt(self, endpoint, elapsed, status_code, error):
+        if error is not None:
+            signal = 'error'
+        elif status_code == 429:
+            signal = 'throttled'
+        elif status_code == 503:
+            signal = 'unavailable'
+        else:
+            signal = None
+            baseline = self._baseline.get(endpoint)
+            if baseline is None or elapsed < baseline:
+                self._baseline[endpoint] = elapsed
+            else:
+                self._baseline[endpoint] = baseline + (elapsed - baseline) * BASELINE_DRIFT
+                if elapsed > baseline * LATENCY_TOLERANCE + LATENCY_SLACK:
+                    signal = 'latency'
+
+        if not signal:
+            self.limit = min(self.limit + (1 if self._slow_start else 1 / self.limit), self.max_limit)
+            return
+
+        self.signals[signal] += 1
+        now = time.monotonic()
+        if now - elapsed < self._last_decrease:
+            return
+        factor = LATENCY_DECREASE_FACTOR if signal == 'latency' else DECREASE_FACTOR
+        self.limit = max(self.limit * factor, self.min_limit)
+        self._slow_start = False
+        self._last_decrease = now
+        self.decreases += 1
+        logger.info("Reducing concurrency to %d after %s", int(self.limit), signal)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'limit': int(self.limit) if self.limit else None,
+                'in_flight': self.in_flight,
+                'peak_in_flight': self.peak_in_flight,
+                'waits': self.waits,
+                'wait_time': self.wait_time,
+                'decreases': self.decreases,
+                'signals': dict(self.signals),
+            }
+
+def _rate_limit_headers(headers):
+
+    # Requests remaining and seconds until the allowance resets, from the RateLimit-* headers or
+    # their X-RateLimit-* predecessors (whose reset may be a Unix time)
+    remaining = headers.get('RateLimit-Remaining', headers.get('X-RateLimit-Remaining'))
+    reset = headers.get('RateLimit-Reset', headers.get('X-RateLimit-Reset'))
+    try:
+        remaining = float(remaining) if remaining is not None else None
+        reset = float(reset) if reset is not None else None
+    except ValueError:
+        return None, None
+    if reset is not None and reset > 1e9:
+        reset = max(reset - time.time(), 0)
+    return remaining, reset
+
+def parse_retry_after(value, max_delay):
+
+    # Retry-After is either a number of seconds or an HTTP date
+    if not value:
+        return None
+    try:
+        delay = float(value)
+    except ValueError:
+        try:
+            when = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        delay = (when - datetime.datetime.now(when.tzinfo)).total_seconds()
+    return min(max(delay, 0), max_delay)
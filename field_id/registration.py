@@ -0,0 +1,175 @@
+import json
+import logging
+import time
+
+import requests
+import urllib3
+
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+logger = logging.getLogger(__name__)
+
+# Statuses rejecting a chunk for the content of some of its features; only these are worth
+# splitting the chunk to isolate them. Any other failure (authentication, server errors, rate
+# limiting beyond the client's retries) would fail every part of the chunk just the same.
+REJECTED_STATUS_CODES = (400, 422)
+
+# Results recorded in the journal: features that must not be sent again without checking
+JOURNALED_STATUSES = ('success', 'unknown')
+
+def chunk_features(features, max_features=100, max_bytes=1000000):
+
+    # Groups features into chunks of at most max_features features and roughly max_bytes of
+    # serialized JSON. Yields lists of (index, feature) tuples, index being the position of the
+    # feature in the input. A single feature larger than max_bytes gets a chunk of its own.
+    return _chunk_indexed(enumerate(features), max_features, max_bytes)
+
+def _chunk_indexed(indexed_features, max_features, max_bytes):
+    chunk = []
+    chunk_bytes = 0
+    for index, feature in indexed_features:
+        size = len(json.dumps(feature, separators=(',', ':')))
+        if chunk and (len(chunk) >= max_features or chunk_bytes + size > max_bytes):
+            yield chunk
+            chunk = []
+            chunk_bytes = 0
+        chunk.append((index, feature))
+        chunk_bytes += size
+    if chunk:
+        yield chunk
+
+def register_in_batches(api_client, features, dry_run=False, max_features=100, max_bytes=1000000, concurrency=None, journal=None, validator=None, retry_unknown=False):
+
+    # Registers features in chunks, posting up to `concurrency` chunks in parallel. Returns one
+    # result per input feature, in input order:
+    #   {'index': 0, 'status': 'success', 'id': '<boundary id>'}
+    #   {'index': 1, 'status': 'failed', 'status_code': 400, 'error': <response body>}
+    #   {'index': 2, 'status': 'failed', 'error': 'ConnectTimeout: ...'}   (never sent)
+    #   {'index': 3, 'status': 'unknown', 'error': 'ReadTimeout: ...'}     (sent, no response)
+    # Chunks rejected as invalid (400/422) are bisected until the offending features are
+    # isolated, so good features are only resent when they shared a rejected chunk with a bad
+    # one. Chunks failing for any other reason have all their features reported failed.
+    #
+    # A chunk is only resent after an error if it cannot have reached the API (the connection
+    # was never made). When it may have (a read timeout, or the connection dropping once sent),
+    # its features may or may not have been registered, so they are reported as 'unknown' and
+    # left for the caller to check rather than risking registering them twice.
+    #
+    # With a journal, each feature registered (with its boundary ID) or left unknown is recorded
+    # as soon as its chunk completes, and features already recorded are skipped, so resuming an
+    # interrupted job never registers a feature twice. With retry_unknown, features recorded as
+    # unknown are sent again instead, for when they are known not to have been registered.
+    #
+    # With a validator (a function returning a list of problems with a feature, such as
+    # field_id.geometry.validate_geometry), features with problems are never sent and are
+    # reported as {'index': 2, 'status': 'invalid', 'errors': [...]}.
+    concurrency = api_client.workers(concurrency)
+    results = []
+
+    indexed_features = enumerate(features)
+    if journal:
+        indexed_features = _skip_journaled(indexed_features, journal, results, retry_unknown)
+    if validator:
+        indexed_features = _reject_invalid(indexed_features, validator, results)
+    chunks = _chunk_indexed(indexed_features, max_features, max_bytes)
+
+    # Warm the token so the workers don't all race to refresh it
+    api_client.access_token()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        pending = set()
+        for chunk in chunks:
+            pending.add(executor.submit(_register_and_record_chunk, api_client, chunk, dry_run, journal))
+
+            # Bound the number of queued chunks so a streamed input is not read ahead in full
+            if len(pending) >= concurrency * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results.extend(future.result())
+
+        for future in pending:
+            results.extend(future.result())
+
+    results.sort(key=lambda r: r['index'])
+    return results
+
+def _skip_journaled(indexed_features, journal, results, retry_unknown=False):
+    for index, feature in indexed_features:
+        record = journal.get(index)
+        if record and not (retry_unknown and record.get('status') == 'unknown'):
+            result = {key: value for key, value in record.items() if key != 'key'}
+            results.append(result)
+        else:
+            yield index, feature
+
+def _reject_invalid(indexed_features, validator, results):
+    for index, feature in indexed_features:
+        problems = validator(feature)
+        if problems:
+            results.append({'index': index, 'status': 'invalid', 'errors': problems})
+        else:
+            yield index, feature
+
+def _register_and_record_chunk(api_client, chunk, dry_run, journal):
+    results = _register_chunk(api_client, chunk, dry_run)
+    if journal:
+        journal.record_many(dict(result, key=result['index']) for result in results if result['status'] in JOURNALED_STATUSES)
+    return results
+
+def _register_chunk(api_client, chunk, dry_run):
+
+    # 429 responses (and 503s with a Retry-After) are retried by the client. Errors before the
+    # chunk was sent are retried here; any other timeout or connection error leaves the outcome
+    # unknown, so the chunk is not resent.
+    attempt = 0
+    while True:
+        try:
+            response = api_client.register_boundaries(payload=[f for _, f in chunk], dry_run=dry_run)
+            break
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error = "%s: %s" % (type(e).__name__, e)
+            if not _never_sent(e):
+                logger.warning("Outcome of registering a chunk of %d features is unknown: %s", len(chunk), e)
+                return [{'index': index, 'status': 'unknown', 'error': error} for index, _ in chunk]
+            if attempt >= api_client.config.max_retries:
+                logger.warning("Giving up on a chunk of %d features after %d attempts: %s", len(chunk), attempt + 1, e)
+                return [{'index': index, 'status': 'failed', 'error': error} for index, _ in chunk]
+            delay = api_client._backoff(attempt)
+            attempt += 1
+            logger.warning("Retrying a chunk of %d features in %.1fs (attempt %d of %d): %s", len(chunk), delay, attempt, api_client.config.max_retries, e)
+            time.sleep(delay)
+
+    if response.ok:
+        registered = []
+        if response.status_code != 204:
+            registered = response.json().get('features', [])
+        results = []
+        for n, (index, _) in enumerate(chunk):
+            result = {'index': index, 'status': 'success'}
+            if n < len(registered) and 'id' in registered[n]:
+                result['id'] = registered[n]['id']
+            results.append(result)
+        return results
+
+    if len(chunk) > 1 and response.status_code in REJECTED_STATUS_CODES:
+        middle = len(chunk) // 2
+        return _register_chunk(api_client, chunk[:middle], dry_run) + _register_chunk(api_client, chunk[middle:], dry_run)
+
+    try:
+        error = response.json()
+    except ValueError:
+        error = response.text
+    return [{'index': index, 'status': 'failed', 'status_code': response.status_code, 'error': error} for index, _ in chunk]
+
+def _never_sent(error):
+
+    # Whether a requests exception shows the request never reached the server: the connection
+    # could not be made (refused, unresolvable, or timing out while connecting)
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    if not isinstance(error, requests.ConnectionError):
+        return False
+    reason = error.args[0] if error.args else None
+    if isinstance(reason, urllib3.exceptions.MaxRetryError):
+        reason = reason.reason
+    return isinstance(reason, (urllib3.exceptions.NewConnectionError, urllib3.exceptions.ConnectTimeoutError))
@@ -0,0 +1,83 @@
+import collections
+import requests
+
+from concurrent.futures import ThreadPoolExecutor
+
+from field_id.geometry import HASH_PRECISION, canonical_hash
+from field_id.rate_limit import RateLimiter
+
+def search_in_batches(api_client, features, limit=5, concurrency=None, precision=HASH_PRECISION, dedupe_size=10000, rate_limit=None):
+
+    # Runs a field search for each input feature or geometry, with up to `concurrency` searches
+    # in flight (subject to the client's rate limit), and yields one result row per input, in
+    # input order:
+    #   {'index': 0, 'id': <input feature id>, 'geometry_hash': '...', 'status_code': 200, 'results': {...}}
+    # A failed search has 'error' in place of 'results', and a null status_code if no response
+    # was received at all.
+    # Inputs whose geometry has the same canonical hash as one of the last `dedupe_size` distinct
+    # geometries reuse that search rather than calling the API again; their row also carries
+    # 'duplicate_of', the index of the first input with that geometry.
+    #
+    # rate_limit caps the searches started per second by this call alone, on top of the client's
+    # own limit, so that it does not affect other users of a shared client.
+    concurrency = api_client.workers(concurrency)
+    rate_limiter = RateLimiter(rate_limit)
+    searches = collections.OrderedDict()
+
+    # Fetch the token up front so the workers don't all race to refresh it
+    api_client.access_token()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        window = collections.deque()
+        for index, feature in enumerate(features):
+            geometry_hash = canonical_hash(feature, precision)
+
+            search = searches.get(geometry_hash) if geometry_hash else None
+            if search:
+                searches.move_to_end(geometry_hash)
+            else:
+                search = (index, executor.submit(_search, api_client, rate_limiter, feature, limit))
+                if geometry_hash:
+                    searches[geometry_hash] = search
+                    if len(searches) > dedupe_size:
+                        searches.popitem(last=False)
+
+            window.append((index, feature, geometry_hash, search))
+            if len(window) >= concurrency * 2:
+                yield _result_row(*window.popleft())
+
+        while window:
+            yield _result_row(*window.popleft())
+
+def _search(api_client, rate_limiter, feature, limit):
+
+    # A search that fails without a response (once the client's retries are used up) gives an
+    # error row with no status code rather than ending the whole run
+    rate_limiter.acquire()
+    try:
+        response = api_client.field_search(payload=feature, limit=limit)
+    except (requests.ConnectionError, requests.Timeout) as e:
+        return None, "%s: %s" % (type(e).__name__, e)
+    try:
+        body = response.json()
+    except ValueError:
+        body = response.text
+    return response.status_code, body
+
+def _result_row(index, feature, geometry_hash, search):
+    first_index, future = search
+    status_code, body = future.result()
+
+    row = {
+        'index': index,
+        'id': feature.get('id'),
+        'geometry_hash': geometry_hash,
+        'status_code': status_code,
+    }
+    if first_index != index:
+        row['duplicate_of'] = first_index
+    if status_code is not None and 200 <= status_code < 300:
+        row['results'] = body
+    else:
+        row['error'] = body
+    return row
@@ -0,0 +1,187 @@
+import json
+import math
+import os
+
+import numpy as np
+
+from field_id.geometry import polygon_rings, rings_intersect
+
+# Number of children per node of the R-tree
+NODE_CAPACITY = 16
+
+INDEX_VERSION = 1
+
+class SpatialIndex(object):
+
+    # Static R-tree over the bounding boxes of a set of boundaries, for answering "which
+    # boundaries overlap this geometry" without calling the API. The tree is bulk-loaded with
+    # Sort-Tile-Recursive packing: boundaries are sorted into vertical slices by the x of their
+    # box centre, each slice is sorted by y, and consecutive runs of NODE_CAPACITY boxes form
+    # the leaves. Each level above packs consecutive runs of the level below, so the children of
+    # node j are always entries j * capacity to (j + 1) * capacity - 1 of the level below and no
+    # pointers need storing.
+    #
+    # An index is a directory of .npy arrays (tree boxes, IDs and the ring coordinates of every
+    # boundary) which are memory-mapped on load, so opening even a very large index is instant
+    # and only the pages a query touches are read. Queries filter candidates by bounding box,
+    # then test each candidate's polygons exactly.
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'index.json'), 'r') as f:
+            meta = json.load(f)
+        if meta.get('version') != INDEX_VERSION:
+            raise ValueError("Unsupported spatial index version in {}: {}".format(path, meta.get('version')))
+
+        self.node_capacity = meta['node_capacity']
+        load = lambda name: np.load(os.path.join(path, name + '.npy'), mmap_mode='r')
+        self.boxes = load('boxes')                  # boxes of every level, leaves (boundaries) first
+        self.level_offsets = np.array(load('level_offsets'))
+        self.ids = load('ids')                      # boundary IDs, in tree order
+        self.sorted_ids = load('sorted_ids')        # the same IDs sorted, for lookup by ID
+        self.sorted_positions = load('sorted_positions')
+        self.coords = load('coords')                # (n, 2) vertices of every ring
+        self.ring_offsets = load('ring_offsets')    # ring i is coords[ring_offsets[i]:ring_offsets[i + 1]]
+        self.feature_rings = load('feature_rings')  # boundary i has rings feature_rings[i] to feature_rings[i + 1] - 1
+
+    @classmethod
+    def build(cls, features, path, node_capacity=NODE_CAPACITY):
+
+        # Builds an index of the (Multi)Polygon features in `features` (any iterable, such as
+        # field_id.geojson_stream.iter_features over a boundary export) in the directory `path`,
+        # and returns it opened. Features without an ID or a polygon geometry are skipped, as are
+        # repeats of an ID already indexed.
+        ids = []
+        seen = set()
+        boxes = []
+        rings = []
+        ring_counts = []
+        for feature in features:
+            boundary_id = feature.get('id') if isinstance(feature, dict) else None
+            if boundary_id is None or str(boundary_id) in seen:
+                continue
+            feature_rings = polygon_rings(feature)
+            if not feature_rings:
+                continue
+
+            vertices = np.concatenate(feature_rings)
+            seen.add(str(boundary_id))
+            ids.append(str(boundary_id))
+            boxes.append((vertices[:, 0].min(), vertices[:, 1].min(), vertices[:, 0].max(), vertices[:, 1].max()))
+            rings.append(feature_rings)
+            ring_counts.append(len(feature_rings))
+
+        boxes = np.array(boxes, dtype=np.float64).reshape(-1, 4)
+        order = _str_order(boxes, node_capacity)
+
+        # Leaves are the boundaries themselves, in STR order; each level above is packed from the one below
+        levels = [boxes[order]]
+        while len(levels[-1]) > 1:
+            levels.append(_parent_boxes(levels[-1], node_capacity))
+
+        ordered_rings = [rings[i] for i in order]
+        ring_lengths = [len(ring) for feature_rings in ordered_rings for ring in feature_rings]
+        ids = np.array([ids[i] for i in order], dtype=str)
+
+        os.makedirs(path, exist_ok=True)
+        save = lambda name, array: np.save(os.path.join(path, name + '.npy'), array)
+        save('boxes', np.concatenate(levels) if levels[0].size else np.empty((0, 4)))
+        save('level_offsets', np.cumsum([0] + [len(level) for level in levels]))
+        save('ids', ids)
+        sorted_positions = np.argsort(ids, kind='stable')
+        save('sorted_ids', ids[sorted_positions])
+        save('sorted_positions', sorted_positions)
+        save('coords', np.concatenate([ring for feature_rings in ordered_rings for ring in feature_rings]) if ring_lengths else np.empty((0, 2)))
+        save('ring_offsets', np.cumsum([0] + ring_lengths))
+        save('feature_rings', np.cumsum([0] + [ring_counts[i] for i in order]))
+
+        with open(os.path.join(path, 'index.json'), 'w') as f:
+            json.dump({'version': INDEX_VERSION, 'node_capacity': node_capacity, 'count': len(ids)}, f)
+
+        return cls(path)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def query_bbox(self, box):
+
+        # Positions of the boundaries whose bounding box intersects `box` (min x, min y, max x, max y)
+        levels = len(self.level_offsets) - 1
+        if not levels:
+            return np.empty(0, dtype=np.int64)
+
+        candidates = np.arange(self.level_offsets[levels] - self.level_offsets[levels - 1])
+        for level in range(levels - 1, -1, -1):
+            boxes = self.boxes[self.level_offsets[level] + candidates]
+            candidates = candidates[(boxes[:, 0] <= box[2]) & (boxes[:, 2] >= box[0]) & (boxes[:, 1] <= box[3]) & (boxes[:, 3] >= box[1])]
+            if level:
+                children = (candidates[:, None] * self.node_capacity + np.arange(self.node_capacity)).ravel()
+                candidates = children[children < self.level_offsets[level] - self.level_offsets[level - 1]]
+        return candidates
+
+    def query(self, geometry, exact=True, touching=False):
+
+        # IDs of the indexed boundaries overlapping a (Multi)Polygon geometry or Feature, i.e.
+        # sharing some area with it. With touching=True, boundaries which only share edges or
+        # vertices with it are included too; with exact=False, so is every boundary whose
+        # bounding box intersects that of the geometry.
+        rings = polygon_rings(geometry)
+        if not rings:
+            return []
+        return [str(self.ids[i]) for i in self._query_rings(rings, exact, touching)]
+
+    def overlapping(self, boundary_id, exact=True, touching=False):
+
+        # IDs of the other indexed boundaries overlapping the boundary with the given ID, or
+        # None if that boundary is not in the index
+        position = self.position(boundary_id)
+        if position is None:
+            return None
+        return [str(self.ids[i]) for i in self._query_rings(self.rings(position), exact, touching) if i != position]
+
+    def position(self, boundary_id):
+        i = np.searchsorted(self.sorted_ids, str(boundary_id))
+        if i < len(self.sorted_ids) and self.sorted_ids[i] == str(boundary_id):
+            return int(self.sorted_positions[i])
+        return None
+
+    def rings(self, position):
+        first, last = self.feature_rings[position], self.feature_rings[position + 1]
+        offsets = self.ring_offsets[first:last + 1]
+        return [self.coords[offsets[r]:offsets[r + 1]] for r in range(len(offsets) - 1)]
+
+    def _query_rings(self, rings, exact, touching):
+        vertices = np.concatenate(rings)
+        box = (vertices[:, 0].min(), vertices[:, 1].min(), vertices[:, 0].max(), vertices[:, 1].max())
+        candidates = np.sort(self.query_bbox(box))
+        if not exact:
+            return candidates
+        return [i for i in candidates if rings_intersect(rings, self.rings(i), touching)]
+
+def _str_order(boxes, node_capacity):
+
+    # Sort-Tile-Recursive ordering of boxes: sorted into vertical slices by centre x, then
+    # by centre y within each slice. Slices hold a whole number of nodes' worth of boxes.
+    if len(boxes) == 0:
+        return np.empty(0, dtype=np.int64)
+    x = (boxes[:, 0] + boxes[:, 2]) / 2
+    y = (boxes[:, 1] + boxes[:, 3]) / 2
+
+    nodes = math.ceil(len(boxes) / node_capacity)
+    slice_size = math.ceil(math.sqrt(nodes)) * node_capacity
+
+    by_x = np.argsort(x, kind='stable')
+    order = []
+    for start in range(0, len(boxes), slice_size):
+        tile = by_x[start:start + slice_size]
+        order.append(tile[np.argsort(y[tile], kind='stable')])
+    return np.concatenate(order)
+
+def _parent_boxes(boxes, node_capacity):
+    starts = np.arange(0, len(boxes), node_capacity)
+    return np.stack([
+        np.minimum.reduceat(boxes[:, 0], starts),
+        np.minimum.reduceat(boxes[:, 1], starts),
+        np.maximum.reduceat(boxes[:, 2], starts),
+        np.maximum.reduceat(boxes[:, 3], starts),
+    ], axis=1)
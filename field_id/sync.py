@@ -0,0 +1,195 @@
+import datetime
+import itertools
+import json
+import sqlite3
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+# Local mirror of the boundaries and boundary references visible to a client, refreshed
+# incrementally. Each sync run requests only the records modified since the high-water mark of
+# the previous run (the latest modification time seen), so a refresh costs in proportion to the
+# number of changes rather than the size of the registry.
+#
+# The listing can be split into partitions, each a set of extra query parameters (e.g. a list
+# of field IDs) paged through in parallel and with its own high-water mark. Partitions should
+# not overlap, but a record listed in two partitions is simply stored once.
+#
+# Listings only return records that currently exist, so records deleted or retired since they
+# were mirrored are kept in the store.
+
+# Query parameter restricting a listing to records modified at or after a time
+UPDATED_SINCE_PARAM = 'updated_since'
+
+# Feature properties holding a record's modification time, in order of preference
+UPDATED_AT_PROPERTIES = ('updated_at', 'created_at')
+
+# Seconds subtracted from the high-water mark when requesting changes, to pick up records
+# committed out of order or modified while the previous run was paging
+SYNC_OVERLAP = 300
+
+RESOURCES = ('boundaries', 'boundary_references')
+
+class BoundaryStore(object):
+
+    # SQLite database holding one row per boundary or boundary reference (its ID, modification
+    # time and the feature as JSON), plus the high-water mark of each synced partition
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        for resource in RESOURCES:
+            self._db.execute("CREATE TABLE IF NOT EXISTS {} (id TEXT PRIMARY KEY, updated_at TEXT, content TEXT)".format(resource))
+        self._db.execute("CREATE TABLE IF NOT EXISTS sync_state (resource TEXT, partition TEXT, high_water_mark TEXT, synced_at REAL, PRIMARY KEY (resource, partition))")
+        self._db.commit()
+
+    def upsert_many(self, resource, features):
+
+        # Stores a batch of features in one transaction. Returns the number of (new, changed)
+        # records; features identical to the stored copy are left alone.
+        _check_resource(resource)
+        added = changed = 0
+        with self._lock:
+            for feature in features:
+                content = json.dumps(feature, separators=(',', ':'), sort_keys=True)
+                row = self._db.execute("SELECT content FROM {} WHERE id = ?".format(resource), (feature['id'],)).fetchone()
+                if row and row[0] == content:
+                    continue
+                self._db.execute("INSERT OR REPLACE INTO {} (id, updated_at, content) VALUES (?, ?, ?)".format(resource),
+                                 (feature['id'], updated_at(feature), content))
+                if row:
+                    changed += 1
+                else:
+                    added += 1
+            self._db.commit()
+        return added, changed
+
+    def get(self, resource, record_id):
+        _check_resource(resource)
+        with self._lock:
+            row = self._db.execute("SELECT content FROM {} WHERE id = ?".format(resource), (record_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def iter_features(self, resource='boundaries'):
+
+        # Yields every stored feature, ordered by ID, reading a page of rows at a time
+        _check_resource(resource)
+        last_id = ''
+        while True:
+            with self._lock:
+                rows = self._db.execute("SELECT id, content FROM {} WHERE id > ? ORDER BY id LIMIT 1000".format(resource), (last_id,)).fetchall()
+            if not rows:
+                return
+            for last_id, content in rows:
+                yield json.loads(content)
+
+    def count(self, resource='boundaries'):
+        _check_resource(resource)
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM {}".format(resource)).fetchone()[0]
+
+    def high_water_mark(self, resource, partition):
+        with self._lock:
+            row = self._db.execute("SELECT high_water_mark FROM sync_state WHERE resource = ? AND partition = ?",
+                                   (resource, _partition_key(partition))).fetchone()
+        return row[0] if row else None
+
+    def set_high_water_mark(self, resource, partition, mark):
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO sync_state (resource, partition, high_water_mark, synced_at) VALUES (?, ?, ?, ?)",
+                             (resource, _partition_key(partition), mark, time.time()))
+            self._db.commit()
+
+    def close(self):
+        if self._db:
+            self._db.close()
+            self._db = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def sync(api_client, store, partitions=None, resources=RESOURCES, concurrency=None, page_size=100, full=False, since_param=UPDATED_SINCE_PARAM):
+
+    # Brings the store up to date with the registry, paging through each resource and partition
+    # in parallel (up to `concurrency` listings at once, sharing the client's rate limit). With
+    # full=True, high-water marks are ignored and everything is listed again. Returns one
+    # summary per resource and partition:
+    #   {'resource': 'boundaries', 'partition': {...}, 'since': '...', 'fetched': 120, 'added': 3, 'changed': 5, 'high_water_mark': '...'}
+    # A partition's high-water mark only advances once it has been listed in full, so an
+    # interrupted sync is simply redone from the previous mark.
+    concurrency = api_client.workers(concurrency)
+    partitions = partitions or [{}]
+    tasks = [(resource, partition) for resource in resources for partition in partitions]
+
+    # Fetch the token up front so the workers don't all race to refresh it
+    api_client.access_token()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(_sync_partition, api_client, store, resource, partition, page_size, full, since_param)
+                   for resource, partition in tasks]
+        return [future.result() for future in futures]
+
+def _sync_partition(api_client, store, resource, partition, page_size, full, since_param):
+    started = _format_time(datetime.datetime.now(datetime.timezone.utc))
+    mark = None if full else store.high_water_mark(resource, partition)
+
+    args = dict(partition)
+    since = None
+    if mark:
+        since = _format_time(_parse_time(mark) - datetime.timedelta(seconds=SYNC_OVERLAP))
+        args[since_param] = since
+
+    listing = api_client.iter_boundaries if resource == 'boundaries' else api_client.iter_boundary_references
+    features = listing(args=args, page_size=page_size)
+
+    summary = {'resource': resource, 'partition': partition, 'since': since, 'fetched': 0, 'added': 0, 'changed': 0}
+    latest = None
+    while True:
+        page = list(itertools.islice(features, page_size))
+        if not page:
+            break
+        added, changed = store.upsert_many(resource, page)
+        summary['fetched'] += len(page)
+        summary['added'] += added
+        summary['changed'] += changed
+        for feature in page:
+            modified = updated_at(feature)
+            if modified and (latest is None or _parse_time(modified) > _parse_time(latest)):
+                latest = modified
+
+    # Without modification times on the records, the start of this run is the best mark available
+    if latest is None:
+        latest = started
+    elif mark and _parse_time(mark) > _parse_time(latest):
+        latest = mark
+    store.set_high_water_mark(resource, partition, latest)
+    summary['high_water_mark'] = latest
+    return summary
+
+def updated_at(feature):
+    properties = feature.get('properties') or {}
+    for name in UPDATED_AT_PROPERTIES:
+        if properties.get(name):
+            return properties[name]
+    return None
+
+def _check_resource(resource):
+    if resource not in RESOURCES:
+        raise ValueError("Unknown resource: {}".format(resource))
+
+def _partition_key(partition):
+    return json.dumps(partition or {}, sort_keys=True)
+
+def _parse_time(value):
+    parsed = datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return parsed
+
+def _format_time(value):
+    return value.astimezone(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
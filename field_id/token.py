@@ -0,0 +1,195 @@
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    # No advisory file locks (e.g. on Windows): processes may then occasionally both fetch a token
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+class TokenManager(object):
+
+    # Supplies OAuth client-credentials access tokens to an APIClient and all its threads.
+    #
+    # - Only one thread fetches a token at a time; the others wait for it rather than fetching
+    #   their own.
+    # - Once a token has been fetched, a background timer fetches its successor shortly before it
+    #   expires (token_refresh_ahead seconds, or half its lifetime if that is shorter), so
+    #   requests don't wait on the token endpoint after the first one.
+    # - With a token_cache_path, tokens are shared between processes using the same credentials
+    #   through a local file, locked while it is read and updated. A process starting up, or
+    #   finding its token due for refresh, first checks the file, so a pool of workers makes
+    #   roughly one token request per token lifetime between them.
+
+    def __init__(self, config, session, tls_verify=True, hooks=None):
+        self.config = config
+        self.session = session
+        self.tls_verify = tls_verify
+        self.hooks = hooks
+
+        self._lock = threading.Lock()
+        self._token = None
+        self._expires_at = None   # wall-clock time after which the token is no longer used
+        self._refresh_at = None   # wall-clock time after which a replacement is fetched
+        self._timer = None
+        self._closed = False
+
+        self._shared = None
+        if config.token_cache_path:
+            self._shared = SharedTokenFile(config.token_cache_path)
+
+    def get(self):
+
+        # Fast path: no locking while the cached token is valid
+        token, expires_at = self._token, self._expires_at
+        if token and expires_at > time.time():
+            return token
+
+        with self._lock:
+            if not (self._token and self._expires_at > time.time()):
+                self._refresh()
+            return self._token
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+
+    def _refresh(self):
+
+        # Called with the lock held. Takes a token from the shared file if another process has
+        # already fetched one that is not yet due for refresh, otherwise fetches and shares one.
+        if not self._shared:
+            self._set(*self._fetch())
+            return
+
+        key = self._shared_key()
+        with self._shared.locked():
+            shared = self._shared.load(key)
+            if shared and shared['refresh_at'] > time.time():
+                logger.debug("Using access token shared through %s", self._shared.path)
+                self._set(shared['access_token'], shared['expires_at'], shared['refresh_at'])
+                return
+            self._set(*self._fetch())
+            self._shared.store(key, {'access_token': self._token, 'expires_at': self._expires_at, 'refresh_at': self._refresh_at})
+
+    def _fetch(self):
+        payload = {
+            'grant_type': 'client_credentials',
+            'client_id': self.config.client_id,
+            'client_secret': self.config.client_secret,
+            'audience': self.config.audience,
+        }
+
+        logger.info("Fetching token from %s using client ID %s", self.config.token_url, self.config.client_id)
+        start = time.time()
+        res = self.session.post(self.config.token_url, data=payload, timeout=self.config.timeout, verify=self.tls_verify)
+        if self.hooks:
+            self.hooks.emit('token', url=self.config.token_url, elapsed=time.time() - start, status_code=res.status_code)
+        res.raise_for_status()
+
+        # Imported here as api_client imports this module
+        from field_id.api_client import APIException
+        try:
+            data = res.json()
+            expires_seconds = int(data['expires_in'])
+            token = data['access_token']
+        except (ValueError, KeyError, TypeError):
+            raise APIException(status=401, reason="Malformed token response")
+
+        lifetime = max(expires_seconds - self.config.token_expiry_buffer, 0)
+        expires_at = start + lifetime
+        refresh_at = expires_at - min(self.config.token_refresh_ahead or 0, lifetime / 2)
+        return token, expires_at, refresh_at
+
+    def _set(self, token, expires_at, refresh_at):
+        self._token = token
+        self._expires_at = expires_at
+        self._refresh_at = refresh_at
+        self._schedule(refresh_at)
+
+    def _schedule(self, when):
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        if self._closed or not self.config.token_refresh_ahead:
+            return
+        self._timer = threading.Timer(max(when - time.time(), 0), self._background_refresh)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _background_refresh(self):
+        with self._lock:
+            if self._closed:
+                return
+            try:
+                self._refresh()
+            except Exception as e:
+                # The current token remains usable until it expires; try again in a while, and if
+                # it does expire, the next request fetches a token itself
+                retry_in = max(min(30, (self._expires_at - time.time()) / 2), 1)
+                logger.warning("Background token refresh failed, retrying in %.0fs: %s", retry_in, e)
+                self._schedule(time.time() + retry_in)
+
+    def _shared_key(self):
+
+        # Tokens are only shared between clients with the same credentials and audience
+        identity = "\n".join([self.config.token_url, self.config.client_id, self.config.client_secret, self.config.audience])
+        return hashlib.sha256(identity.encode('utf-8')).hexdigest()
+
+class SharedTokenFile(object):
+
+    # JSON file mapping a hash of each set of credentials to its current token, readable only by
+    # its owner. Updates are made under an exclusive lock on a companion .lock file and written
+    # atomically, so readers never see a partial file.
+
+    def __init__(self, path):
+        self.path = path
+        self.lock_path = path + '.lock'
+
+    @contextlib.contextmanager
+    def locked(self):
+        with open(self.lock_path, 'a') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def load(self, key):
+        try:
+            with open(self.path, 'r') as f:
+                entry = json.load(f).get(key)
+        except (OSError, ValueError):
+            return None
+        if entry and entry.get('expires_at', 0) > time.time():
+            return entry
+        return None
+
+    def store(self, key, entry):
+        try:
+            with open(self.path, 'r') as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            entries = {}
+
+        now = time.time()
+        entries = {k: e for k, e in entries.items() if e.get('expires_at', 0) > now}
+        entries[key] = entry
+
+        tmp_path = "{}.{}.tmp".format(self.path, os.getpid())
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, self.path)
@@ -1,63 +1,64 @@
 import sys
 import argparse
-import yaml
-import json
-import re
+import logging
 
-from field_id.api_client import APIClient, APIConfiguration
+from field_id import cli
+from field_id.ids import IDReader, file_tokens, string_tokens
+from field_id.output import FEATURE_FORMATS, COLUMNAR_FORMATS, open_writer
 
 def main(argv):
 
     argParser = argparse.ArgumentParser()
+    add_arguments(argParser)
+    cli.add_common_arguments(argParser)
+
+    args = argParser.parse_args()
+    print("args=%s" % args, file=sys.stderr)
+    cli.configure_logging(args.log_level)
+
+    api_client = cli.create_client(args.configfile, args.metrics)
+    return run(argParser, args, api_client)
+
+def add_arguments(argParser):
     argParser.add_argument("-o", "--outputfile", required=False, help="Output path; defaults to STDOUT")
-    argParser.add_argument("-c", "--configfile", required=True, help="Path to config YAML file containing credentials")
     group = argParser.add_mutually_exclusive_group(required=True)
     group.add_argument("-i", "--inputfile", help="Path to a comma or line-separated list of Global FieldIDs")
     group.add_argument("-f", "--gfid", help="Comma-separated list of Global FieldIDs")
+    argParser.add_argument("--format", choices=FEATURE_FORMATS, default="geojson", help="Output format: GeoJSON FeatureCollection, JSON array, NDJSON, GeoJSONSeq, GeoParquet or Arrow IPC (the last two require pyarrow and --outputfile); defaults to geojson")
+    argParser.add_argument("--indent", type=int, required=False, help="Pretty-print geojson/json output with this indent; output is compact by default")
+    argParser.add_argument("--gzip", action="store_true", default=None, help="Gzip-compress the output (implied by an output path ending in .gz)")
+    argParser.add_argument("--page-size", type=int, default=50, help="Number of boundaries to request per page")
+    argParser.add_argument("--stream", action="store_true", help="Parse each page of boundaries as it arrives and copy each boundary to the output as received, without re-encoding it; batches are then looked up one at a time and boundaries written in API order")
+    argParser.add_argument("-n", "--concurrency", type=int, required=False, help="Number of batches of field IDs to look up in parallel; defaults to the `concurrency` config setting (1)")
 
-    args = argParser.parse_args()
-    print("args=%s" % args)
+def run(argParser, args, api_client):
+
+    if args.format in COLUMNAR_FORMATS and not args.outputfile:
+        argParser.error("--format %s requires --outputfile" % args.format)
 
     input_fn = args.inputfile
-    gfid_string = args.gfid
     output_fn = args.outputfile
-    config_fn = args.configfile
-
-    conf = read_yaml(config_fn)
-    if input_fn:
-        gfid_string = open(input_fn, 'r').read().strip()
-        gfid_string = re.sub("[\s,]+", ',', gfid_string)
-    gfids = gfid_string.split(',')
-
-    output_fh = None
-    if output_fn:
-        output_fh = open(output_fn, 'w')
-   
-    api_config = APIConfiguration.from_dict(conf)
-
-    query_params = {
-        'field_relationships.field_id': gfid_string,
-    }
-
-    api_client = APIClient(config=api_config)
-    response = api_client.get_boundaries(args=query_params, limit=len(gfids))
-    results = response.json()
-
-    if (output_fh):
-        print("--- Printing response to %s ---" % output_fn)
-        print(json.dumps(results, indent=2), file=output_fh)
+
+    # Field IDs are validated and de-duplicated as they are read
+    id_reader = IDReader('gfid')
+    gfids = id_reader.read(file_tokens(input_fn) if input_fn else string_tokens(args.gfid))
+
+    if (output_fn):
+        print("--- Printing response to %s ---" % output_fn, file=sys.stderr)
     else:
-        print("--- Response ---")
-        print(json.dumps(results, indent=2))
-        print("---")
+        print("--- Response ---", file=sys.stderr)
+
+    # Looked up in batches small enough for the request URL, merged back in input order (or, with
+    # --stream, written in the order they arrive)
+    features = api_client.iter_boundaries_by_field_ids(gfids, page_size=args.page_size, concurrency=args.concurrency, stream=args.stream)
+    with open_writer(output_fn, args.format, args.indent, args.gzip) as writer:
+        for feature in features:
+            writer.write(feature)
 
-def read_yaml(file_path):
-    with open(file_path, "r") as f:
-        return yaml.safe_load(f)
+    logging.info("Read %s", id_reader.summary())
 
-def read_json(file_path):
-    with open(file_path, "r") as f:
-        return json.load(f)
+    if not output_fn:
+        print("---", file=sys.stderr)
 
 if __name__ == "__main__":
    main(sys.argv[1:])
\ No newline at end of file
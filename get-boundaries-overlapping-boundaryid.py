@@ -1,73 +1,70 @@
 import sys
 import argparse
-import yaml
-import json
-import re
+import logging
 
-from field_id.api_client import APIClient, APIConfiguration
+from field_id import cli
+from field_id.api_client import batches
+from field_id.ids import IDReader, file_tokens, string_tokens
+from field_id.output import FEATURE_FORMATS, COLUMNAR_FORMATS, open_writer
 
 def main(argv):
 
     argParser = argparse.ArgumentParser()
+    add_arguments(argParser)
+    cli.add_common_arguments(argParser)
+
+    args = argParser.parse_args()
+    print("args=%s" % args, file=sys.stderr)
+    cli.configure_logging(args.log_level)
+
+    api_client = cli.create_client(args.configfile, args.metrics)
+    return run(argParser, args, api_client)
+
+def add_arguments(argParser):
     argParser.add_argument("-o", "--outputfile", required=False, help="Output path; defaults to STDOUT")
-    argParser.add_argument("-c", "--configfile", required=True, help="Path to config YAML file containing credentials")
     group = argParser.add_mutually_exclusive_group(required=True)
     group.add_argument("-i", "--inputfile", help="Path to a comma or line-separated list of Global BoundaryIDs")
     group.add_argument("-b", "--gbid", help="Comma-separated list of Global BoundaryIDs")
+    argParser.add_argument("--page-size", type=int, default=50, help="Number of boundaries to request per page")
+    argParser.add_argument("--format", choices=FEATURE_FORMATS, default="geojson", help="Output format: GeoJSON FeatureCollection, JSON array, NDJSON, GeoJSONSeq, GeoParquet or Arrow IPC (the last two require pyarrow and --outputfile); defaults to geojson")
+    argParser.add_argument("--indent", type=int, required=False, help="Pretty-print geojson/json output with this indent; output is compact by default")
+    argParser.add_argument("--gzip", action="store_true", default=None, help="Gzip-compress the output (implied by an output path ending in .gz)")
+    argParser.add_argument("-n", "--concurrency", type=int, required=False, help="Number of requests to run in parallel; defaults to the `concurrency` config setting (1)")
 
-    args = argParser.parse_args()
-    print("args=%s" % args)
+def run(argParser, args, api_client):
+
+    if args.format in COLUMNAR_FORMATS and not args.outputfile:
+        argParser.error("--format %s requires --outputfile" % args.format)
 
     input_fn = args.inputfile
-    gbid_string = args.gbid
     output_fn = args.outputfile
-    config_fn = args.configfile
-
-    conf = read_yaml(config_fn)
-    if input_fn:
-        gbid_string = open(input_fn, 'r').read().strip()
-        gbid_string = re.sub("[\s,]+", ',', gbid_string)
-
-    output_fh = None
-    if output_fn:
-        output_fh = open(output_fn, 'w')
-   
-    api_config = APIConfiguration.from_dict(conf)
-    api_client = APIClient(config=api_config)
-
-    query_params = {
-        'boundary_relationships.boundary_id': gbid_string,
-    }
-    response = api_client.get_boundaries(args=query_params, limit=50)
-    results = response.json()
-    print(results)
-
-    boundaries = results['features']
-
-    for result in boundaries:
-        
-        for ref in result['properties']['boundary_references']:
-            # expand to ALL the properties of the reference, not only the Varda-defined ones
-            response = api_client.get_boundary_reference(boundary_reference_id=ref['id'])
-            ref_feature = response.json()
-            for key in ref_feature['properties']:
-                ref[key] = ref_feature['properties'][key]
-
-    if (output_fh):
-        print("--- Printing response to %s ---" % output_fn)
-        print(json.dumps(results, indent=2), file=output_fh)
+
+    # Boundary IDs are validated and de-duplicated as they are read
+    id_reader = IDReader('uuid')
+    gbids = id_reader.read(file_tokens(input_fn) if input_fn else string_tokens(args.gbid))
+
+    if (output_fn):
+        print("--- Printing response to %s ---" % output_fn, file=sys.stderr)
     else:
-        print("--- Response ---")
-        print(json.dumps(results, indent=2))
-        print("---")
+        print("--- Response ---", file=sys.stderr)
+
+    # Boundaries are written out as soon as their references have been expanded, a batch at a time
+    features = api_client.iter_boundaries_by_related_boundary_ids(gbids, page_size=args.page_size, concurrency=args.concurrency)
+    with open_writer(output_fn, args.format, args.indent, args.gzip) as writer:
+        for boundaries in batches(features, args.page_size):
+            api_client.expand_references(boundaries, args.concurrency)
+
+            for boundary in boundaries:
+                writer.write(boundary)
+
+    logging.info("Read %s", id_reader.summary())
 
-def read_yaml(file_path):
-    with open(file_path, "r") as f:
-        return yaml.safe_load(f)
+    if not output_fn:
+        print("---", file=sys.stderr)
 
-def read_json(file_path):
-    with open(file_path, "r") as f:
-        return json.load(f)
+    print("Requests saved by de-duplication: %s" % api_client.saved_calls, file=sys.stderr)
+    if api_client.cache:
+        print("Cache statistics: %s" % api_client.cache.stats(), file=sys.stderr)
 
 if __name__ == "__main__":
    main(sys.argv[1:])
\ No newline at end of file
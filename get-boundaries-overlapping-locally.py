@@ -0,0 +1,54 @@
+import sys
+import argparse
+import time
+
+from field_id.geojson_stream import iter_features
+from field_id.ids import IDReader, file_tokens, string_tokens
+from field_id.output import FORMATS, create_writer, open_output
+from field_id.spatial_index import SpatialIndex
+
+def main(argv):
+
+    argParser = argparse.ArgumentParser()
+    argParser.add_argument("-x", "--index", required=True, help="Spatial index directory, as written by build-boundary-index.py")
+    argParser.add_argument("-o", "--outputfile", required=False, help="Output path; defaults to STDOUT")
+    group = argParser.add_mutually_exclusive_group(required=True)
+    group.add_argument("-i", "--inputfile", help="Path to a comma or line-separated list of Global BoundaryIDs in the index")
+    group.add_argument("-b", "--gbid", help="Comma-separated list of Global BoundaryIDs in the index")
+    group.add_argument("-g", "--geometryfile", help="Path to a GeoJSON geometry, feature, FeatureCollection or newline-delimited GeoJSON (one query per feature)")
+    argParser.add_argument("--bbox-only", action="store_true", help="Skip the exact polygon test, returning every boundary whose bounding box overlaps")
+    argParser.add_argument("--include-touching", action="store_true", help="Also return boundaries which only share edges or vertices with the query, without overlapping it")
+    argParser.add_argument("--format", choices=FORMATS, default="ndjson", help="Output format; defaults to ndjson")
+
+    args = argParser.parse_args()
+    print("args=%s" % args, file=sys.stderr)
+
+    index = SpatialIndex(args.index)
+    exact = not args.bbox_only
+
+    # Boundary IDs are validated and de-duplicated as they are read
+    id_reader = None
+    if args.inputfile or args.gbid:
+        id_reader = IDReader('uuid')
+        gbids = id_reader.read(file_tokens(args.inputfile) if args.inputfile else string_tokens(args.gbid))
+
+    # One row per query: {"query": <boundary ID or input index>, "overlaps": [<boundary IDs>]}
+    start = time.time()
+    with create_writer(open_output(args.outputfile), args.format) as writer:
+        if id_reader:
+            for gbid in gbids:
+                overlaps = index.overlapping(gbid, exact=exact, touching=args.include_touching)
+                if overlaps is None:
+                    writer.write({'query': gbid, 'error': 'Boundary not in index'})
+                else:
+                    writer.write({'query': gbid, 'overlaps': overlaps})
+        else:
+            for n, feature in enumerate(iter_features(args.geometryfile)):
+                writer.write({'query': feature.get('id', n), 'overlaps': index.query(feature, exact=exact, touching=args.include_touching)})
+
+    if id_reader:
+        print("Read %s" % id_reader.summary(), file=sys.stderr)
+    print("Answered %d queries against %d boundaries in %.3fs" % (writer.count, len(index), time.time() - start), file=sys.stderr)
+
+if __name__ == "__main__":
+   main(sys.argv[1:])
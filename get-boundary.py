@@ -1,73 +1,120 @@
 import sys
 import argparse
-import yaml
-import json
-import re
+import logging
 
-from field_id.api_client import APIClient, APIConfiguration
+from field_id import cli
+from field_id.api_client import batches
+from field_id.ids import IDReader, file_tokens, string_tokens
+from field_id.output import FEATURE_FORMATS, COLUMNAR_FORMATS, APPENDABLE_FORMATS, open_writer
+from field_id.journal import Journal
+
+# Number of boundaries whose references are expanded together
+EXPAND_BATCH_SIZE = 100
 
 def main(argv):
 
     argParser = argparse.ArgumentParser()
+    add_arguments(argParser)
+    cli.add_common_arguments(argParser)
+
+    args = argParser.parse_args()
+    print("args=%s" % args, file=sys.stderr)
+    cli.configure_logging(args.log_level)
+
+    api_client = cli.create_client(args.configfile, args.metrics)
+    return run(argParser, args, api_client)
+
+def add_arguments(argParser):
     argParser.add_argument("-o", "--outputfile", required=False, help="Output path; defaults to STDOUT")
-    argParser.add_argument("-c", "--configfile", required=True, help="Path to config YAML file containing credentials")
     group = argParser.add_mutually_exclusive_group(required=True)
     group.add_argument("-i", "--inputfile", help="Path to a comma or line-separated list of Global BoundaryIDs")
     group.add_argument("-b", "--gbid", help="Comma-separated list of Global BoundaryIDs")
+    argParser.add_argument("--format", choices=FEATURE_FORMATS, default="json", help="Output format: GeoJSON FeatureCollection, JSON array, NDJSON, GeoJSONSeq, GeoParquet or Arrow IPC (the last two require pyarrow and --outputfile); defaults to json")
+    argParser.add_argument("--indent", type=int, required=False, help="Pretty-print geojson/json output with this indent; output is compact by default")
+    argParser.add_argument("--gzip", action="store_true", default=None, help="Gzip-compress the output (implied by an output path ending in .gz)")
+    argParser.add_argument("-n", "--concurrency", type=int, required=False, help="Number of requests to run in parallel; defaults to the `concurrency` config setting (1)")
+    argParser.add_argument("-j", "--journal", required=False, help="Path to a checkpoint file recording each boundary ID once it has been written to the output")
+    argParser.add_argument("--overwrite-journal", action="store_true", help="Start again with an empty --journal, discarding the boundary IDs already fetched it records; otherwise an existing journal requires --resume")
+    argParser.add_argument("--resume", action="store_true", help="Skip boundary IDs already recorded in the --journal, appending to the existing output file (ndjson or geojsonseq format only)")
+    argParser.add_argument("--retry-failed", action="store_true", help="With --resume, fetch again the boundary IDs the --journal records as failed (the API returned an error for them)")
 
-    args = argParser.parse_args()
-    print("args=%s" % args)
+def run(argParser, args, api_client):
+
+    if args.format in COLUMNAR_FORMATS and not args.outputfile:
+        argParser.error("--format %s requires --outputfile" % args.format)
+
+    if args.resume and not (args.journal and args.outputfile and args.format in APPENDABLE_FORMATS):
+        argParser.error("--resume requires --journal, --outputfile and an appendable --format (%s)" % ", ".join(APPENDABLE_FORMATS))
+    if args.resume and args.overwrite_journal:
+        argParser.error("--resume and --overwrite-journal are mutually exclusive")
+    if args.retry_failed and not args.resume:
+        argParser.error("--retry-failed requires --resume")
 
     input_fn = args.inputfile
-    gbid_string = args.gbid
     output_fn = args.outputfile
-    config_fn = args.configfile
-
-    conf = read_yaml(config_fn)
-    if input_fn:
-        gbid_string = open(input_fn, 'r').read().strip()
-        gbid_string = re.sub("[\s,]+", ',', gbid_string)
-    gbids = gbid_string.split(',')
-
-    output_fh = None
-    if output_fn:
-        output_fh = open(output_fn, 'w')
-   
-    api_config = APIConfiguration.from_dict(conf)
-    api_client = APIClient(config=api_config)
-
-    results = []
-    for gbid in gbids:
-        response = api_client.get_boundary(boundary_id=gbid)
-        print(response.status_code)
-        response.raise_for_status
-        result = response.json()
-
-        for ref in result['properties']['boundary_references']:
-            # expand to ALL the properties of the reference, not only the Varda-defined ones
-            response = api_client.get_boundary_reference(boundary_reference_id=ref['id'])
-            ref_feature = response.json()
-            for key in ref_feature['properties']:
-                ref[key] = ref_feature['properties'][key]
-
-
-        results.append(result)
-
-    if (output_fh):
-        print("--- Printing response to %s ---" % output_fn)
-        print(json.dumps(results, indent=2), file=output_fh)
+
+    id_reader = IDReader('uuid')
+    gbids = list(id_reader.read(file_tokens(input_fn) if input_fn else string_tokens(args.gbid)))
+    logging.info("Read %s", id_reader.summary())
+
+    journal = None
+    if args.journal:
+        try:
+            journal = Journal(args.journal, resume=args.resume, overwrite=args.overwrite_journal)
+        except ValueError:
+            argParser.error("journal %s already records fetched boundaries: use --resume to skip them, or --overwrite-journal to fetch everything again" % args.journal)
+        gbids = [gbid for gbid in gbids if not _journaled(journal, gbid, args.retry_failed)]
+        print("%d boundaries already in journal, %d to fetch" % (journal.count(), len(gbids)), file=sys.stderr)
+
+    if (output_fn):
+        print("--- Printing response to %s ---" % output_fn, file=sys.stderr)
     else:
-        print("--- Response ---")
-        print(json.dumps(results, indent=2))
-        print("---")
+        print("--- Response ---", file=sys.stderr)
+
+    # Boundaries are written out as soon as their references have been expanded, a batch at a time.
+    # A boundary the API returns an error for (e.g. 404 for an unknown or 410 for a retired ID)
+    # is logged and journalled as failed, and the run carries on with the rest.
+    failed = 0
+    responses = api_client.iter_boundaries_by_ids(gbids, concurrency=args.concurrency)
+    with open_writer(output_fn, args.format, args.indent, args.gzip, append=args.resume) as writer:
+        for batch in batches(zip(gbids, responses), EXPAND_BATCH_SIZE):
+            results = []
+            records = []
+            for gbid, response in batch:
+                logging.debug("%s: %s", gbid, response.status_code)
+                if response.ok:
+                    results.append(response.json())
+                    records.append({'key': gbid, 'status': 'success'})
+                else:
+                    logging.warning("Failed to fetch boundary %s: %s %s", gbid, response.status_code, response.reason)
+                    records.append({'key': gbid, 'status': 'failed', 'status_code': response.status_code})
+                    failed += 1
+
+            api_client.expand_references(results, args.concurrency)
+
+            for result in results:
+                writer.write(result)
+
+            # Only checkpoint boundaries once they are safely in the output
+            if journal:
+                writer.flush()
+                journal.record_many(records)
+
+    if journal:
+        journal.close()
+
+    if not output_fn:
+        print("---", file=sys.stderr)
+
+    print("Fetched %d of %d boundaries, %d failed" % (len(gbids) - failed, len(gbids), failed), file=sys.stderr)
 
-def read_yaml(file_path):
-    with open(file_path, "r") as f:
-        return yaml.safe_load(f)
+    print("Requests saved by de-duplication: %s" % api_client.saved_calls, file=sys.stderr)
+    if api_client.cache:
+        print("Cache statistics: %s" % api_client.cache.stats(), file=sys.stderr)
 
-def read_json(file_path):
-    with open(file_path, "r") as f:
-        return json.load(f)
+def _journaled(journal, gbid, retry_failed):
+    record = journal.get(gbid)
+    return record is not None and not (retry_failed and record.get('status') == 'failed')
 
 if __name__ == "__main__":
    main(sys.argv[1:])
\ No newline at end of file
@@ -1,59 +1,144 @@
 import sys
 import argparse
-import yaml
 import json
 import geojson
 
-from field_id.api_client import APIClient, APIConfiguration
+from field_id import cli
+from field_id.registration import register_in_batches
+from field_id.geojson_stream import iter_features
+from field_id.journal import Journal
+from field_id.geometry import simplify_geometry, validate_geometry
 
 def main(argv):
 
     argParser = argparse.ArgumentParser()
+    add_arguments(argParser)
+    cli.add_common_arguments(argParser)
+
+    args = argParser.parse_args()
+    print("args=%s" % args, file=sys.stderr)
+    cli.configure_logging(args.log_level)
+
+    api_client = cli.create_client(args.configfile, args.metrics)
+    return run(argParser, args, api_client)
+
+def add_arguments(argParser):
     argParser.add_argument("-i", "--inputfile", required=True, help="Boundaries to be registered: a GeoJSON FeatureCollection, Feature, Polygon or MultiPolygon")
     #argParser.add_argument("-o", "--outputfile", required=False, help="Output path; defaults to STDOUT")
-    argParser.add_argument("-c", "--configfile", required=True, help="Path to config YAML file containing credentials")
     argParser.add_argument("-s", "--source", required=False, help="Name of the source to use when registering boundaries. If not specified as an argument, the source MUST be specified as a `varda:source_name` property within each GeoJSON Feature")
     argParser.add_argument("-p", "--permissions", required=False, help="Comma-separated list of permissions, e.g. `org_1234:view,all:discover`. Overrides any permissions specified with the `varda:permissions` property of each GeoJSON Feature")
     argParser.add_argument("-n", "--dry-run", action="store_true", help="Simulate the registration, performing validity checks without persisting the data in the registry")
+    argParser.add_argument("-b", "--batch-size", type=int, required=False, help="Register features in batches of at most this many features, rather than in a single request")
+    argParser.add_argument("--batch-bytes", type=int, default=1000000, help="Maximum size of each batch in bytes of serialized JSON (batch mode only)")
+    argParser.add_argument("--concurrency", type=int, required=False, help="Number of batches to register in parallel; defaults to the `concurrency` config setting (1)")
+    argParser.add_argument("-j", "--journal", required=False, help="Path to a checkpoint file recording each registered feature and its boundary ID (batch mode only)")
+    argParser.add_argument("--overwrite-journal", action="store_true", help="Start again with an empty --journal, discarding the features already registered it records; otherwise an existing journal requires --resume")
+    argParser.add_argument("--resume", action="store_true", help="Skip features already registered according to the --journal")
+    argParser.add_argument("--retry-unknown", action="store_true", help="With --resume, send again the features the --journal records as unknown (their request timed out after being sent), once you have checked they were not registered")
+    argParser.add_argument("-v", "--validate", action="store_true", help="Check geometries locally before sending them: invalid features are reported and not sent")
+    argParser.add_argument("--validate-only", action="store_true", help="Check geometries locally and report the invalid features, without calling the API")
+    argParser.add_argument("--simplify", type=float, required=False, help="Simplify geometries before sending them, removing vertices within this many metres of the simplified outline")
+    argParser.add_argument("-r", "--report", required=False, help="Path to write the per-feature results report to (batch mode only); defaults to STDOUT")
 
-    args = argParser.parse_args()
-    print("args=%s" % args)
+def run(argParser, args, api_client):
+
+    if args.journal and not args.batch_size:
+        argParser.error("--journal requires --batch-size")
+    if args.resume and not args.journal:
+        argParser.error("--resume requires --journal")
+    if args.retry_unknown and not args.resume:
+        argParser.error("--retry-unknown requires --resume")
+    if args.resume and args.overwrite_journal:
+        argParser.error("--resume and --overwrite-journal are mutually exclusive")
 
     input_fn = args.inputfile
     #output_fn = args.outputfile
-    config_fn = args.configfile
+    # Stream the input so that only the features being worked on are held in memory
+    features = (_prepare_feature(f, args.source, args.permissions, args.simplify)
+                for f in iter_features(input_fn, object_hook=geojson.GeoJSON.to_instance))
+
+    if args.validate_only:
+        results = []
+        count = 0
+        for index, feature in enumerate(features):
+            count += 1
+            problems = validate_geometry(feature)
+            if problems:
+                results.append({'index': index, 'status': 'invalid', 'errors': problems})
+        print("%d of %d features are invalid" % (len(results), count), file=sys.stderr)
+        _print_report(results, args.report)
+        sys.exit(1 if results else 0)
+
+    if args.batch_size:
+
+        # A dry run registers nothing, so must not be checkpointed
+        journal = None
+        if args.journal and not args.dry_run:
+            try:
+                journal = Journal(args.journal, resume=args.resume, overwrite=args.overwrite_journal)
+            except ValueError:
+                argParser.error("journal %s already records registered features: use --resume to skip them, or --overwrite-journal to register everything again" % args.journal)
+
+        try:
+            results = register_in_batches(api_client, features, dry_run=args.dry_run,
+                                          max_features=args.batch_size, max_bytes=args.batch_bytes,
+                                          concurrency=args.concurrency, journal=journal,
+                                          validator=validate_geometry if args.validate else None,
+                                          retry_unknown=args.retry_unknown)
+        finally:
+            if journal:
+                journal.close()
+
+        registered = sum(1 for r in results if r['status'] == 'success')
+        unknown = sum(1 for r in results if r['status'] == 'unknown')
+        print("Registered %d of %d features, %d failed, %d unknown" % (registered, len(results), len(results) - registered - unknown, unknown), file=sys.stderr)
+        _print_report(results, args.report)
+        return
 
-    conf = read_yaml(config_fn)
     input_json = read_geojson(input_fn)
-   
-    api_config = APIConfiguration.from_dict(conf)
-    api_config.client_id = conf['client_id']
-    api_config.client_secret = conf['client_secret']
-    if 'token_url' in conf:
-        api_config.token_url = conf['token_url']
 
     if input_json.type == 'FeatureCollection':
         input_json = input_json.features # array of features
-        for f in input_json:
-            _set_source(f, args.source)
-            _set_permissions(f, args.permissions)
-    elif input_json.type in ['Polygon', 'MultiPolygon']:
-        input_json = geojson.Feature(geometry=input_json)
-        _set_source(input_json, args.source)
-        _set_permissions(input_json, args.permissions)
-    elif input_json.type == 'Feature':
-        _set_source(input_json, args.source)
-        _set_permissions(input_json, args.permissions)
-
-    api_client = APIClient(config=api_config)
+        for i, f in enumerate(input_json):
+            input_json[i] = _prepare_feature(f, args.source, args.permissions, args.simplify)
+    elif input_json.type in ['Polygon', 'MultiPolygon', 'Feature']:
+        input_json = _prepare_feature(input_json, args.source, args.permissions, args.simplify)
+
+    if args.validate:
+        features = input_json if isinstance(input_json, list) else [input_json]
+        results = [{'index': index, 'status': 'invalid', 'errors': problems}
+                   for index, problems in enumerate(map(validate_geometry, features)) if problems]
+        if results:
+            print("%d of %d features are invalid, nothing was sent" % (len(results), len(features)), file=sys.stderr)
+            _print_report(results, args.report)
+            sys.exit(1)
+
     response = api_client.register_boundaries(payload=input_json, dry_run=args.dry_run)
-    print("--- Response ---")
+    print("--- Response ---", file=sys.stderr)
     if (response.status_code == 204):
-        print("Success - empty response")
+        print("Success - empty response", file=sys.stderr)
     else:
         results = response.json()
         print(json.dumps(results, indent=2))
-    print("---")
+    print("---", file=sys.stderr)
+
+def _prepare_feature(feature, source_name, permissions, simplify=None):
+    if feature.type in ['Polygon', 'MultiPolygon']:
+        feature = geojson.Feature(geometry=feature)
+    if simplify and feature.geometry and feature.geometry.get('type') in ['Polygon', 'MultiPolygon']:
+        feature.geometry = simplify_geometry(feature.geometry, simplify)
+    _set_source(feature, source_name)
+    _set_permissions(feature, permissions)
+    return feature
+
+def _print_report(results, report_fn):
+    if report_fn:
+        with open(report_fn, 'w') as report_fh:
+            print(json.dumps(results, indent=2), file=report_fh)
+    else:
+        print("--- Results ---", file=sys.stderr)
+        print(json.dumps(results, indent=2))
+        print("---", file=sys.stderr)
 
 def _set_source(payload, source_name):
     if source_name:
@@ -66,25 +151,17 @@ def _set_permissions(payload, permissions):
     if permissions:
         p_arr = [x.strip() for x in permissions.split(',')]
         p_map = dict(x.split(':') for x in p_arr)
-        print(p_map)
+        print(p_map, file=sys.stderr)
         payload.properties['varda:permissions'] = p_map
     
     if 'varda:permissions' in payload.properties and payload.properties['varda:permissions']:
         for tenant in payload.properties['varda:permissions']:
-            print("Checking permissions for "+tenant)
+            print("Checking permissions for "+tenant, file=sys.stderr)
             perm = payload.properties['varda:permissions'][tenant]
             if (not perm in ['discover', 'view', 'manage']):
                 raise ValueError("Permission type "+perm+" should be one of discover, view or manage")
         
 
-def read_yaml(file_path):
-    with open(file_path, "r") as f:
-        return yaml.safe_load(f)
-
-def read_json(file_path):
-    with open(file_path, "r") as f:
-        return json.load(f)
-
 def read_geojson(file_path):
     with open(file_path, "r") as f:
         return geojson.load(f)
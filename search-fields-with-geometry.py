@@ -1,45 +1,66 @@
 import sys
 import argparse
-import yaml
 import json
 
-from field_id.api_client import APIClient, APIConfiguration
+from field_id import cli
+from field_id.geojson_stream import iter_features
+from field_id.output import FORMATS, create_writer, open_output
+from field_id.rate_limit import RateLimiter
+from field_id.search import search_in_batches
 
 def main(argv):
 
     argParser = argparse.ArgumentParser()
-    argParser.add_argument("-i", "--inputfile", required=True, help="Search input, a path to GeoJSON geometry or feature")
-    #argParser.add_argument("-o", "--outputfile", required=False, help="Output path; defaults to STDOUT")
-    argParser.add_argument("-c", "--configfile", required=True, help="Path to config YAML file containing credentials")
+    add_arguments(argParser)
+    cli.add_common_arguments(argParser)
 
     args = argParser.parse_args()
-    print("args=%s" % args)
+    print("args=%s" % args, file=sys.stderr)
+    cli.configure_logging(args.log_level)
 
+    api_client = cli.create_client(args.configfile, args.metrics)
+    return run(argParser, args, api_client)
+
+def add_arguments(argParser):
+    argParser.add_argument("-i", "--inputfile", required=True, help="Search input, a path to a GeoJSON geometry, feature, FeatureCollection or newline-delimited GeoJSON (one search per feature)")
+    argParser.add_argument("-o", "--outputfile", required=False, help="Output path for batch mode results; defaults to STDOUT")
+    argParser.add_argument("-b", "--batch", action="store_true", help="Batch mode: run searches concurrently and write one result row per input feature, skipping searches for repeated geometries")
+    argParser.add_argument("-l", "--limit", type=int, default=5, help="Maximum number of matching fields to return per search")
+    argParser.add_argument("-n", "--concurrency", type=int, required=False, help="Number of searches to run in parallel in batch mode; defaults to the `concurrency` config setting (1)")
+    argParser.add_argument("--rate-limit", type=float, required=False, help="Maximum number of searches started per second by this run, within the `rate_limit` config setting")
+    argParser.add_argument("--precision", type=int, default=6, help="Decimal places coordinates are rounded to when detecting repeated geometries in batch mode")
+    argParser.add_argument("--format", choices=FORMATS, default="ndjson", help="Batch mode output format; defaults to ndjson")
+
+def run(argParser, args, api_client):
     input_fn = args.inputfile
-    #output_fn = args.outputfile
-    config_fn = args.configfile
-
-    conf = read_yaml(config_fn)
-    input_json = read_json(input_fn)
-   
-    api_config = APIConfiguration.from_dict(conf)
-
-    api_client = APIClient(config=api_config)
-    response = api_client.field_search(payload=input_json)
-    results = response.json()
-    
-    print("--- Response ---")
-    #print(results)
-    print(json.dumps(results, indent=2))
-    print("---")
-
-def read_yaml(file_path):
-    with open(file_path, "r") as f:
-        return yaml.safe_load(f)
-
-def read_json(file_path):
-    with open(file_path, "r") as f:
-        return json.load(f)
+    output_fn = args.outputfile
+
+    if args.batch:
+        searched = 0
+        rows = search_in_batches(api_client, iter_features(input_fn), limit=args.limit,
+                                 concurrency=args.concurrency, precision=args.precision,
+                                 rate_limit=args.rate_limit)
+        with create_writer(open_output(output_fn), args.format) as writer:
+            for row in rows:
+                if 'duplicate_of' not in row:
+                    searched += 1
+                writer.write(row)
+        print("Searched %d geometries for %d inputs" % (searched, writer.count), file=sys.stderr)
+        return
+
+    # Features are read from the input one at a time, so large inputs are never loaded in full.
+    # --rate-limit applies to this run only, on top of the client's rate limit, as the client
+    # may be shared with other commands.
+    rate_limiter = RateLimiter(args.rate_limit)
+    for input_json in iter_features(input_fn):
+        rate_limiter.acquire()
+        response = api_client.field_search(payload=input_json, limit=args.limit)
+        results = response.json()
+
+        print("--- Response ---", file=sys.stderr)
+        #print(results)
+        print(json.dumps(results, indent=2))
+        print("---", file=sys.stderr)
 
 if __name__ == "__main__":
    main(sys.argv[1:])
\ No newline at end of file
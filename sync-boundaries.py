@@ -0,0 +1,58 @@
+import sys
+import argparse
+import json
+import time
+
+from urllib.parse import parse_qsl
+
+from field_id import cli
+from field_id.output import FEATURE_FORMATS, open_writer
+from field_id.sync import RESOURCES, UPDATED_SINCE_PARAM, BoundaryStore, sync
+
+def main(argv):
+
+    argParser = argparse.ArgumentParser()
+    add_arguments(argParser)
+    cli.add_common_arguments(argParser)
+
+    args = argParser.parse_args()
+    print("args=%s" % args, file=sys.stderr)
+    cli.configure_logging(args.log_level)
+
+    api_client = cli.create_client(args.configfile, args.metrics)
+    return run(argParser, args, api_client)
+
+def add_arguments(argParser):
+    argParser.add_argument("-d", "--database", required=True, help="Path to the local SQLite mirror; created if it does not exist")
+    argParser.add_argument("-p", "--partition", action="append", help="Query parameters of one partition of the listing, e.g. 'field_relationships.field_id=...'; may be repeated")
+    argParser.add_argument("--resource", choices=RESOURCES, action="append", help="Resource to sync; may be repeated; defaults to both")
+    argParser.add_argument("--since-param", default=UPDATED_SINCE_PARAM, help="Query parameter filtering by modification time; defaults to %s" % UPDATED_SINCE_PARAM)
+    argParser.add_argument("--full", action="store_true", help="Ignore the high-water marks of previous runs and list everything again")
+    argParser.add_argument("--page-size", type=int, default=100, help="Number of records to request per page")
+    argParser.add_argument("-n", "--concurrency", type=int, required=False, help="Number of partitions to page through in parallel; defaults to the `concurrency` config setting (1)")
+    argParser.add_argument("-o", "--outputfile", required=False, help="After syncing, export every mirrored boundary to this path")
+    argParser.add_argument("--format", choices=FEATURE_FORMATS, default="ndjson", help="Export format, including parquet (GeoParquet) and arrow (Arrow IPC); defaults to ndjson")
+
+def run(argParser, args, api_client):
+
+    partitions = [dict(parse_qsl(partition)) for partition in args.partition or []]
+
+    start = time.time()
+    with BoundaryStore(args.database) as store:
+        summaries = sync(api_client, store, partitions=partitions, resources=args.resource or RESOURCES,
+                         concurrency=args.concurrency, page_size=args.page_size, full=args.full, since_param=args.since_param)
+        for summary in summaries:
+            print(json.dumps(summary), file=sys.stderr)
+
+        print("Synced in %.1fs: fetched %d records, %d new, %d changed; mirror holds %d boundaries and %d boundary references" % (
+            time.time() - start,
+            sum(s['fetched'] for s in summaries), sum(s['added'] for s in summaries), sum(s['changed'] for s in summaries),
+            store.count('boundaries'), store.count('boundary_references')), file=sys.stderr)
+
+        if args.outputfile:
+            with open_writer(args.outputfile, args.format) as writer:
+                for feature in store.iter_features('boundaries'):
+                    writer.write(feature)
+
+if __name__ == "__main__":
+   main(sys.argv[1:])
@@ -0,0 +1,118 @@
+import os
+import sys
+import threading
+import time
+import uuid
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from benchmarks.mock_api import MockServer, MockSettings
+
+from field_id.api_client import APIClient, APIConfiguration
+
+# APIClient against the local stub of the Field ID API and its token endpoint in
+# benchmarks/mock_api.py. Run with `python -m pytest tests`.
+
+def _config(server, **settings):
+    return APIConfiguration(base_url=server.url, token_url=server.url + "oauth/token",
+                            client_id="client", client_secret="secret", **settings)
+
+def _ids(count):
+    return [str(uuid.UUID(int=n)) for n in range(count)]
+
+def test_failed_requests_are_retried():
+
+    # A third of the API's responses are 503s with a Retry-After of 0
+    with MockServer(('127.0.0.1', 0), MockSettings(error_rate=0.3, seed=2)) as server:
+        with APIClient(_config(server, max_retries=10, retry_backoff_factor=0, cache_size=0)) as client:
+            responses = client.get_boundaries_by_ids(_ids(40), concurrency=4)
+
+        assert [response.status_code for response in responses] == [200] * 40
+        stats = server.stats.summary()
+        assert stats['status_codes']['503'] > 0
+        assert stats['requests']['boundaries/{id}'] == 40 + stats['status_codes']['503']
+
+def test_backoff_grows_exponentially_up_to_the_maximum():
+    with MockServer(('127.0.0.1', 0)) as server:
+        with APIClient(_config(server, retry_backoff_factor=0.5, retry_backoff_max=3)) as client:
+            assert [client._backoff(attempt) for attempt in range(5)] == [0.5, 1, 2, 3, 3]
+
+def test_cached_boundaries_are_revalidated_with_their_etag():
+
+    # The entry is stale by the second lookup, which sends If-None-Match
+    with MockServer(('127.0.0.1', 0)) as server:
+        with APIClient(_config(server, cache_ttl=0.05)) as client:
+            first = client.get_boundary(_ids(1)[0])
+            time.sleep(0.1)
+            second = client.get_boundary(_ids(1)[0])
+            stats = client.cache.stats()
+
+        assert second.status_code == 200
+        assert second.json() == first.json()
+        assert server.stats.summary()['status_codes'] == {'200': 2, '304': 1}
+        assert stats['misses'] == 1
+        assert stats['revalidations'] == 1
+
+def test_fresh_cached_boundaries_are_not_requested_again():
+    with MockServer(('127.0.0.1', 0)) as server:
+        with APIClient(_config(server)) as client:
+            first = client.get_boundaries_by_ids(_ids(5))
+            second = client.get_boundaries_by_ids(_ids(5))
+
+        assert [response.json() for response in second] == [response.json() for response in first]
+        assert server.stats.summary()['requests']['boundaries/{id}'] == 5
+
+def test_concurrent_requests_for_the_same_boundary_are_coalesced():
+
+    # The first request is still in flight when the others are made
+    with MockServer(('127.0.0.1', 0), MockSettings(latency=0.2)) as server:
+        with APIClient(_config(server, cache_size=0)) as client:
+            responses = []
+            threads = [threading.Thread(target=lambda: responses.append(client.get_boundary(_ids(1)[0]))) for _ in range(5)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            assert client.saved_calls['in_flight'] == 4
+
+        assert [response.status_code for response in responses] == [200] * 5
+        assert server.stats.summary()['requests']['boundaries/{id}'] == 1
+
+def test_duplicate_ids_are_requested_once():
+    ids = _ids(10) + _ids(3)
+    with MockServer(('127.0.0.1', 0)) as server:
+        with APIClient(_config(server, cache_size=0)) as client:
+            responses = client.get_boundaries_by_ids(ids, concurrency=4)
+
+            assert client.saved_calls['duplicates'] == 3
+
+        assert [response.json()['id'] for response in responses] == ids
+        assert server.stats.summary()['requests']['boundaries/{id}'] == 10
+
+def test_pagination_yields_every_record_once():
+    for stream in (False, True):
+        with MockServer(('127.0.0.1', 0), MockSettings(boundaries=125)) as server:
+            with APIClient(_config(server)) as client:
+                ids = [feature.get('id') for feature in client.iter_boundaries(page_size=50, stream=stream)]
+
+            assert ids == _ids(125)
+            assert server.stats.summary()['requests']['boundaries'] == 3
+
+def test_pagination_continues_past_pages_capped_by_the_api():
+
+    # The API returns at most 20 records per page whatever the limit requested
+    for stream in (False, True):
+        with MockServer(('127.0.0.1', 0), MockSettings(boundaries=125, max_page_size=20)) as server:
+            with APIClient(_config(server)) as client:
+                ids = [feature.get('id') for feature in client.iter_boundaries(page_size=50, stream=stream)]
+
+            assert ids == _ids(125)
+
+def test_connection_pool_grows_to_the_number_of_workers():
+    with MockServer(('127.0.0.1', 0)) as server:
+        with APIClient(_config(server, pool_maxsize=4)) as client:
+            client.get_boundaries_by_ids(_ids(10), concurrency=16)
+
+            assert client.session.get_adapter(server.url)._pool_maxsize == 16
@@ -0,0 +1,55 @@
+import asyncio
+import datetime
+import os
+import sys
+import uuid
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from benchmarks.mock_api import MockServer, MockSettings
+
+from field_id.api_client import APIConfiguration
+from field_id.async_api_client import AsyncAPIClient
+
+# AsyncAPIClient against the local stub of the Field ID API and its token endpoint in
+# benchmarks/mock_api.py. Run with `python -m pytest tests`.
+
+def _config(server, **settings):
+    return APIConfiguration(base_url=server.url, token_url=server.url + "oauth/token",
+                            client_id="client", client_secret="secret", **settings)
+
+def test_expired_token_is_refreshed_once_for_concurrent_requests():
+
+    # The token endpoint is slow enough that every coroutine finds the token expired before the
+    # first refresh completes
+    with MockServer(('127.0.0.1', 0), MockSettings(token_latency=0.2)) as server:
+
+        async def run():
+            async with AsyncAPIClient(_config(server)) as client:
+                client._access_token = 'expired'
+                client._access_token_expiry = datetime.datetime.now() - datetime.timedelta(seconds=1)
+                return await asyncio.gather(*[client.access_token() for _ in range(20)])
+
+        tokens = asyncio.run(run())
+
+        assert server.stats.summary()['requests'] == {'oauth/token': 1}
+        assert len(set(tokens)) == 1
+        assert tokens[0] != 'expired'
+
+def test_bulk_returns_responses_in_input_order():
+
+    # Random latency makes the requests complete out of order; duplicates are included too
+    ids = [str(uuid.UUID(int=n)) for n in range(30)]
+    ids += [ids[3], ids[0]]
+    with MockServer(('127.0.0.1', 0), MockSettings(jitter=0.05, seed=1)) as server:
+
+        async def run():
+            async with AsyncAPIClient(_config(server)) as client:
+                responses = await client.get_boundaries_by_ids(ids, concurrency=8)
+                return [response.status for response in responses], [(await response.json(content_type=None))['id'] for response in responses]
+
+        statuses, returned_ids = asyncio.run(run())
+
+        assert statuses == [200] * len(ids)
+        assert returned_ids == ids
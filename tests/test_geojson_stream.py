@@ -0,0 +1,69 @@
+import gzip
+import json
+import os
+import sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from field_id.geojson_stream import iter_features, iter_raw_features, raw_member
+
+# Features chosen to trip up a splitter that does not track strings and escapes: brackets,
+# quotes and backslashes inside strings, a nested "features" array and "id" members at other
+# depths, and non-ASCII text.
+FEATURES = [
+    {'type': 'Feature', 'id': 'plain', 'properties': {}, 'geometry': {'type': 'Polygon', 'coordinates': [[[0, 0], [1, 0], [1, 1], [0, 0]]]}},
+    {'type': 'Feature', 'properties': {'id': 'nested', 'name': 'a "quoted" {name} [x]'}, 'id': 7, 'geometry': None},
+    {'type': 'Feature', 'id': 'escapes', 'properties': {'path': 'C:\\fields\\', 'note': '\\"}]'}, 'geometry': None},
+    {'type': 'Feature', 'properties': {'features': [{'id': 'inner'}], 'label': 'Château – "Süd"'}, 'geometry': None},
+    {'type': 'Feature', 'id': None, 'properties': {'boundary_references': [{'id': 'ref'}]}, 'geometry': None},
+]
+
+def _chunks(data, size):
+    return [data[start:start + size] for start in range(0, len(data), size)]
+
+def test_raw_features_round_trip_whatever_the_chunk_size():
+    for document in ({'type': 'FeatureCollection', 'features': FEATURES}, FEATURES,
+                     {'type': 'FeatureCollection', 'bbox': [0, 0, 1, 1], 'features': FEATURES, 'links': [{'rel': 'next'}]}):
+        for indent in (None, 2):
+            data = json.dumps(document, indent=indent, ensure_ascii=False).encode('utf-8')
+            for size in (1, 2, 3, 7, 64, len(data)):
+                raw = list(iter_raw_features(_chunks(data, size)))
+                assert [json.loads(feature) for feature in raw] == FEATURES
+
+def test_raw_features_of_an_empty_collection():
+    assert list(iter_raw_features([b'{"type": "FeatureCollection", "features": []}'])) == []
+
+def test_raw_features_reject_incomplete_documents():
+    data = json.dumps({'type': 'FeatureCollection', 'features': FEATURES}).encode()
+    with pytest.raises(ValueError):
+        list(iter_raw_features(_chunks(data[:-20], 16)))
+    with pytest.raises(ValueError):
+        list(iter_raw_features([b'{"type": "Feature", "properties": {}}']))
+
+def test_raw_member_reads_only_top_level_members():
+    for feature in FEATURES:
+        for indent in (None, 2):
+            data = json.dumps(feature, indent=indent, ensure_ascii=False).encode('utf-8')
+            assert raw_member(data, 'id') == feature.get('id')
+            assert raw_member(data, 'properties') == feature['properties']
+            assert raw_member(data, 'missing') is None
+
+def test_features_are_read_from_each_file_format(tmp_path):
+    collection = tmp_path / "features.geojson"
+    collection.write_text(json.dumps({'type': 'FeatureCollection', 'features': FEATURES}))
+    array = tmp_path / "features.json"
+    array.write_text(json.dumps(FEATURES))
+    seq = tmp_path / "features.geojsonseq"
+    seq.write_text(''.join('\x1e' + json.dumps(feature) + '\n' for feature in FEATURES))
+    ndjson = tmp_path / "features.ndjson.gz"
+    with gzip.open(ndjson, 'wt') as f:
+        f.write(''.join(json.dumps(feature) + '\n' for feature in FEATURES))
+    single = tmp_path / "feature.geojson"
+    single.write_text(json.dumps(FEATURES[0]))
+
+    for path in (collection, array, seq, ndjson):
+        assert list(iter_features(str(path))) == FEATURES
+    assert list(iter_features(str(single))) == [FEATURES[0]]
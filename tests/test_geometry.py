@@ -0,0 +1,83 @@
+import os
+import sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from field_id.geometry import canonical_hash, geometries_intersect, measure_geometry, orient_geometry, validate_geometry
+
+def _square(x, y, size=1):
+    return {'type': 'Polygon', 'coordinates': [[[x, y], [x + size, y], [x + size, y + size], [x, y + size], [x, y]]]}
+
+def _polygon(*rings):
+    return {'type': 'Polygon', 'coordinates': [list(ring) for ring in rings]}
+
+def test_valid_geometries_have_no_problems():
+    assert validate_geometry(_square(0, 0)) == []
+    assert validate_geometry({'type': 'Feature', 'properties': {}, 'geometry': _square(0, 0)}) == []
+    assert validate_geometry({'type': 'MultiPolygon', 'coordinates': [_square(0, 0)['coordinates'], _square(2, 0)['coordinates']]}) == []
+
+def test_invalid_geometries_are_described():
+    assert validate_geometry({'type': 'Feature', 'geometry': None}) == ["missing geometry"]
+    assert validate_geometry({'type': 'Point', 'coordinates': [0, 0]}) == ["unsupported geometry type Point"]
+    assert validate_geometry(_polygon([[0, 0], [1, 0], [1, 1], [0, 1]])) == ["polygon 0 ring 0: not closed"]
+    assert validate_geometry(_polygon([[0, 0], [1, 0], [0, 0]])) == ["polygon 0 ring 0: fewer than 4 positions"]
+    assert validate_geometry(_polygon([[0, 0], [200, 0], [1, 1], [0, 0]])) == ["polygon 0 ring 0: coordinates out of bounds"]
+    assert validate_geometry(_polygon([[0, 0], [1, 0], [2, 0], [0, 0]])) == ["polygon 0 ring 0: zero area"]
+    assert validate_geometry(_polygon([[0, 0], [3, 2], [3, 0], [0, 1], [0, 0]])) == ["polygon 0 ring 0: self-intersection"]
+
+def test_winding_order_is_only_checked_on_request():
+    clockwise = _polygon([[0, 0], [0, 1], [1, 1], [1, 0], [0, 0]])
+    assert validate_geometry(clockwise) == []
+    assert validate_geometry(clockwise, check_winding=True) == ["polygon 0 ring 0: wrong winding order"]
+    assert validate_geometry(orient_geometry(clockwise), check_winding=True) == []
+
+def test_canonical_hash_ignores_ring_start_and_orientation():
+    square = _square(0, 0)
+    rotated = _polygon([[1, 0], [1, 1], [0, 1], [0, 0], [1, 0]])
+    reversed_ring = _polygon(square['coordinates'][0][::-1])
+    assert canonical_hash(square) == canonical_hash(rotated) == canonical_hash(reversed_ring)
+    assert canonical_hash(square) != canonical_hash(_square(0, 0, 2))
+
+def test_measurements_match_the_ellipsoid():
+
+    # 0.01 degrees at the equator: 1113.19m along the equator by 1105.74m along the meridian
+    width, height = 1113.19, 1105.74
+    measured = measure_geometry(_square(0, 0, 0.01))
+    assert measured['area'] == {'value': pytest.approx(width * height, rel=1e-4), 'unit': 'm2'}
+    assert measured['perimeter'] == {'value': pytest.approx(2 * (width + height), rel=1e-4), 'unit': 'm'}
+    assert measured['centroid'] == pytest.approx([0.005, 0.005])
+    assert measured['bbox'] == pytest.approx([0, 0, 0.01, 0.01])
+
+    # A hole is subtracted from the area but adds to the perimeter
+    outer = _square(0, 0, 0.02)['coordinates'][0]
+    hole = [[0.005, 0.005], [0.005, 0.015], [0.015, 0.015], [0.015, 0.005], [0.005, 0.005]]
+    measured = measure_geometry(_polygon(outer, hole))
+    assert measured['area']['value'] == pytest.approx(3 * width * height, rel=1e-3)
+    assert measured['perimeter']['value'] == pytest.approx(6 * (width + height), rel=1e-3)
+
+def test_overlapping_geometries_intersect():
+    assert geometries_intersect(_square(0, 0), _square(0.5, 0.5))
+    assert geometries_intersect(_square(0, 0), _square(0, 0))
+    assert geometries_intersect(_square(0, 0, 3), _square(1, 1))
+    assert geometries_intersect(_square(1, 1), _square(0, 0, 3))
+
+    # Containment touching the boundary, and a shared edge with both areas on the same side
+    assert geometries_intersect(_square(0, 0, 2), _square(0, 0))
+    assert geometries_intersect(_polygon([[0, 0], [2, 0], [1, 2], [0, 0]]), _square(0, 0, 2))
+
+def test_touching_geometries_only_intersect_when_asked():
+    for other in (_square(1, 0), _square(1, 1), _square(1, 0.5)):
+        assert not geometries_intersect(_square(0, 0), other)
+        assert geometries_intersect(_square(0, 0), other, touching=True)
+    assert not geometries_intersect(_square(0, 0), _square(2, 0), touching=True)
+
+def test_holes_are_outside():
+    outer = _square(0, 0, 4)['coordinates'][0]
+    hole = [[1, 1], [1, 3], [3, 3], [3, 1], [1, 1]]
+    with_hole = _polygon(outer, hole)
+    assert not geometries_intersect(with_hole, _square(1.5, 1.5))
+    assert not geometries_intersect(with_hole, _square(1, 1, 2))
+    assert geometries_intersect(with_hole, _square(0.5, 0.5, 3))
@@ -0,0 +1,54 @@
+import os
+import sys
+import threading
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from field_id.rate_limit import AdaptiveRateLimiter, RateLimiter, parse_retry_after
+
+def test_calls_are_spaced_to_the_rate_across_threads():
+    limiter = RateLimiter(50)
+    starts = []
+    lock = threading.Lock()
+
+    def call():
+        for _ in range(5):
+            limiter.acquire()
+            with lock:
+                starts.append(time.monotonic())
+
+    threads = [threading.Thread(target=call) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # 20 calls at 50 per second: the first starts at once, the rest 20ms apart
+    starts.sort()
+    assert 19 / 50 - 0.01 <= starts[-1] - starts[0] < 19 / 50 + 0.2
+
+def test_no_rate_means_no_limit():
+    limiter = RateLimiter(None)
+    start = time.monotonic()
+    for _ in range(1000):
+        limiter.acquire()
+    assert time.monotonic() - start < 0.1
+
+def test_adaptive_rate_backs_off_on_429():
+    limiter = AdaptiveRateLimiter(rate=100, max_rate=100)
+    limiter.feedback(429, {})
+    assert limiter.stats()['rate'] < 100
+    assert limiter.stats()['decreases'] == 1
+
+def test_adaptive_rate_follows_rate_limit_headers():
+    limiter = AdaptiveRateLimiter()
+    limiter.feedback(200, {'RateLimit-Remaining': '10', 'RateLimit-Reset': '2'})
+    assert limiter.stats()['rate'] == 5
+
+def test_retry_after_is_read_in_seconds_or_as_a_date():
+    assert parse_retry_after('2', 60) == 2
+    assert parse_retry_after('120', 60) == 60
+    assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT', 60) == 0
+    assert parse_retry_after(None, 60) is None
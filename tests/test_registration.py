@@ -0,0 +1,94 @@
+import os
+import sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from benchmarks.mock_api import MockServer, MockSettings
+
+from field_id.api_client import APIClient, APIConfiguration
+from field_id.journal import Journal
+from field_id.registration import chunk_features, register_in_batches
+
+# Registration in batches against the local stub of the Field ID API in benchmarks/mock_api.py,
+# which rejects any batch including a feature without a geometry with 422.
+
+def _config(server, **settings):
+    return APIConfiguration(base_url=server.url, token_url=server.url + "oauth/token",
+                            client_id="client", client_secret="secret", **settings)
+
+def _features(count, without_geometry=()):
+    features = []
+    for n in range(count):
+        x = n * 0.01
+        ring = [[x, 50], [x + 0.005, 50], [x + 0.005, 50.005], [x, 50.005], [x, 50]]
+        geometry = None if n in without_geometry else {'type': 'Polygon', 'coordinates': [ring]}
+        features.append({'type': 'Feature', 'properties': {'n': n}, 'geometry': geometry})
+    return features
+
+def test_chunks_respect_the_feature_and_byte_limits():
+    features = _features(25)
+    chunks = list(chunk_features(features, max_features=10))
+    assert [len(chunk) for chunk in chunks] == [10, 10, 5]
+    assert [index for chunk in chunks for index, _ in chunk] == list(range(25))
+
+    # A feature larger than max_bytes gets a chunk of its own
+    assert [len(chunk) for chunk in chunk_features(features[:3], max_bytes=10)] == [1, 1, 1]
+
+def test_rejected_batches_are_bisected_to_the_invalid_features():
+    with MockServer(('127.0.0.1', 0)) as server:
+        with APIClient(_config(server)) as client:
+            results = register_in_batches(client, _features(16, without_geometry=(5, 11)), max_features=16)
+
+        assert [r['index'] for r in results] == list(range(16))
+        assert [r['index'] for r in results if r['status'] == 'failed'] == [5, 11]
+        assert all(r['status_code'] == 422 for r in results if r['status'] == 'failed')
+        assert all(r['id'] for r in results if r['status'] == 'success')
+
+        # Each invalid feature is isolated in log2(16) splits, rather than sending all 16 alone
+        assert server.stats.summary()['requests']['boundaries'] < 16
+
+def test_resumed_registration_skips_the_journalled_features(tmp_path):
+    path = str(tmp_path / "register.journal")
+    features = _features(10)
+    with MockServer(('127.0.0.1', 0)) as server:
+        with APIClient(_config(server)) as client:
+            with Journal(path) as journal:
+                first = register_in_batches(client, features[:6], max_features=4, journal=journal)
+
+            # Rerunning without resume would register everything a second time
+            with pytest.raises(ValueError):
+                Journal(path)
+
+            server.stats.reset()
+            with Journal(path, resume=True) as journal:
+                second = register_in_batches(client, features, max_features=4, journal=journal)
+
+        assert [r['status'] for r in second] == ['success'] * 10
+        assert [r['id'] for r in second[:6]] == [r['id'] for r in first]
+        assert server.stats.summary()['requests'] == {'boundaries': 1}
+
+def test_timed_out_batches_are_left_unknown_and_only_resent_on_request(tmp_path):
+    path = str(tmp_path / "register.journal")
+    features = _features(3)
+
+    # The API is slower than the client's timeout, so the batch may or may not have registered
+    with MockServer(('127.0.0.1', 0), MockSettings(latency=0.5)) as server:
+        with APIClient(_config(server, timeout=0.1)) as client:
+            with Journal(path) as journal:
+                results = register_in_batches(client, features, journal=journal)
+
+        assert [r['status'] for r in results] == ['unknown'] * 3
+
+    with MockServer(('127.0.0.1', 0)) as server:
+        with APIClient(_config(server)) as client:
+            with Journal(path, resume=True) as journal:
+                skipped = register_in_batches(client, features, journal=journal)
+            with Journal(path, resume=True) as journal:
+                retried = register_in_batches(client, features, journal=journal, retry_unknown=True)
+
+        assert [r['status'] for r in skipped] == ['unknown'] * 3
+        assert [r['status'] for r in retried] == ['success'] * 3
+        assert server.stats.summary()['requests']['boundaries'] == 1
@@ -0,0 +1,57 @@
+import os
+import sys
+import uuid
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from field_id.spatial_index import SpatialIndex
+
+def _id(n):
+    return str(uuid.UUID(int=n))
+
+def _square(x, y, size=1):
+    return {'type': 'Polygon', 'coordinates': [[[x, y], [x + size, y], [x + size, y + size], [x, y + size], [x, y]]]}
+
+def _grid(columns, rows):
+
+    # Neighbouring unit squares, numbered by column then row, so each shares edges and corners
+    # with its neighbours but overlaps none of them
+    return [{'type': 'Feature', 'id': _id(x * rows + y), 'properties': {}, 'geometry': _square(x, y)}
+            for x in range(columns) for y in range(rows)]
+
+def test_neighbours_only_overlap_when_touching_is_included(tmp_path):
+
+    # A node capacity of 4 gives the 100 boundaries a tree three levels deep
+    index = SpatialIndex.build(_grid(10, 10), str(tmp_path / "index"), node_capacity=4)
+    centre = _id(55)
+    neighbours = [_id(x * 10 + y) for x in (4, 5, 6) for y in (4, 5, 6) if (x, y) != (5, 5)]
+
+    assert len(index) == 100
+    assert index.overlapping(centre) == []
+    assert sorted(index.overlapping(centre, touching=True)) == sorted(neighbours)
+    assert sorted(index.overlapping(centre, exact=False)) == sorted(neighbours)
+    assert index.overlapping(_id(1000)) is None
+
+def test_geometries_are_matched_against_the_index(tmp_path):
+    index = SpatialIndex.build(_grid(10, 10), str(tmp_path / "index"), node_capacity=4)
+
+    # Straddles the corner shared by four squares
+    assert sorted(index.query(_square(2.5, 2.5))) == sorted([_id(22), _id(23), _id(32), _id(33)])
+    assert index.query(_square(20, 20)) == []
+    assert index.query({'type': 'Feature', 'properties': {}, 'geometry': None}) == []
+
+def test_an_index_is_reopened_from_its_directory(tmp_path):
+    path = str(tmp_path / "index")
+    features = _grid(3, 3)
+
+    # Features without an ID or a polygon, and repeated IDs, are skipped
+    features += [{'type': 'Feature', 'properties': {}, 'geometry': _square(0, 0)},
+                 {'type': 'Feature', 'id': _id(100), 'properties': {}, 'geometry': None},
+                 dict(features[0], geometry=_square(50, 50))]
+    SpatialIndex.build(features, path)
+
+    index = SpatialIndex(path)
+    assert len(index) == 9
+    assert index.position(_id(100)) is None
+    assert index.query(_square(0.25, 0.25, 0.5)) == [_id(0)]